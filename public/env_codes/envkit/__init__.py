@@ -0,0 +1,9 @@
+"""
+Shared runtime helpers for the generated long_run tasks.
+
+The task modules in public/env_codes/long_run import from this package, so
+public/env_codes must be on sys.path when they are loaded. Import helpers from
+their submodules (`from envkit.shapes import ShapeFactory`); the package itself
+imports nothing, so a task only loads the helpers it uses and
+`python -m envkit.<module>` runs without the module being imported twice.
+"""
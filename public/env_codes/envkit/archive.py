@@ -0,0 +1,288 @@
+"""
+On-disk index of archived tasks.
+
+`archive.db` (SQLite) holds one row per task (name, path, source, docstring
+description, source hash, success stats) and the parent -> child links of the
+task graph. The description embeddings live in `embeddings.f32`, a float32
+matrix memory-mapped from disk whose row for a task is stored in SQLite, so a
+similarity query is one matrix-vector product over the archive:
+
+    archive = TaskArchive('archive')
+    archive.sync()                      # index new or changed long_run tasks
+    archive.import_graph('public/htmls/long_run.html')
+    archive.similar('carry a ball up a ramp', k=5)
+    python -m envkit.archive archive similar task_84
+
+Tasks are only re-read when their file's size or mtime changes and only
+re-embedded when their source hash changes.
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from envkit.loader import LONG_RUN_DIR, task_name, task_paths
+
+EMBEDDING_DIM = 256
+_WORD = re.compile(r'[a-z][a-z0-9]+')
+_VIS_DATASET = re.compile(r'(nodes|edges) = new vis\.DataSet\((\[.*?\])\);', re.S)
+_TASK_NAME = re.compile(r'(task_\d+)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tasks (
+    name TEXT PRIMARY KEY,
+    path TEXT,
+    source_hash TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    description TEXT,
+    source TEXT,
+    embedding_row INTEGER UNIQUE,
+    episodes INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    added REAL
+);
+CREATE TABLE IF NOT EXISTS links (parent TEXT, child TEXT, PRIMARY KEY (parent, child));
+CREATE INDEX IF NOT EXISTS links_child ON links (child);
+"""
+
+
+def hashed_embedding(text, dim=EMBEDDING_DIM):
+    """
+    Unit-length float32 bag of words and word pairs, hashed into `dim` signed
+    buckets with CRC32 so embeddings are stable across processes.
+    """
+    words = _WORD.findall(text.lower())
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in words + [a + ' ' + b for a, b in zip(words, words[1:])]:
+        bucket = zlib.crc32(token.encode())
+        vector[bucket % dim] += 1.0 if bucket & 0x80000000 else -1.0
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0.0 else vector
+
+
+def read_description(source):
+    """Docstring of the module's Env class (or its first class), without importing it."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return ''
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+    for node in sorted(classes, key=lambda node: node.name != 'Env'):
+        docstring = ast.get_docstring(node)
+        if docstring:
+            return docstring
+    return ast.get_docstring(tree) or ''
+
+
+class TaskArchive:
+    """
+    Task index under `directory`. `embed(text)` must return a float32 vector of
+    length `dim`; the dimension is fixed when the archive is created.
+    """
+
+    def __init__(self, directory, dim=EMBEDDING_DIM, embed=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'archive.db'))
+        self.db.executescript(SCHEMA)
+        stored = self.db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if stored is None:
+            self.db.execute("INSERT INTO meta VALUES ('dim', ?)", (str(dim),))
+            self.db.commit()
+        elif int(stored[0]) != dim:
+            raise ValueError('Archive {} has {}-dimensional embeddings, not {}'.format(directory, stored[0], dim))
+        self.dim = dim
+        self.embed = embed or (lambda text: hashed_embedding(text, dim))
+        self._matrix_path = os.path.join(directory, 'embeddings.f32')
+        self._matrix = None
+        self._open_matrix()
+
+    def _open_matrix(self, min_rows=0):
+        size = os.path.getsize(self._matrix_path) if os.path.exists(self._matrix_path) else 0
+        rows = size // (4 * self.dim)
+        if rows < min_rows:
+            rows = max(min_rows, 2 * rows, 64)
+            with open(self._matrix_path, 'ab') as f:
+                f.truncate(rows * 4 * self.dim)
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(rows, self.dim)) if rows else np.zeros((0, self.dim), dtype=np.float32)
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+
+    def __contains__(self, name):
+        return self.db.execute('SELECT 1 FROM tasks WHERE name = ?', (name,)).fetchone() is not None
+
+    def add(self, path, parents=(), commit=True):
+        """Indexes one task file. Returns True if it was new or changed."""
+        name = task_name(path)
+        stat = os.stat(path)
+        row = self.db.execute('SELECT source_hash, size, mtime_ns FROM tasks WHERE name = ?', (name,)).fetchone()
+        changed = row is None or (row[1], row[2]) != (stat.st_size, stat.st_mtime_ns)
+        if changed:
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if row is not None and row[0] == digest:
+                self.db.execute('UPDATE tasks SET path = ?, size = ?, mtime_ns = ? WHERE name = ?', (path, stat.st_size, stat.st_mtime_ns, name))
+                changed = False
+            else:
+                source = data.decode('utf-8', errors='replace')
+                self._upsert(name, path, digest, stat.st_size, stat.st_mtime_ns, read_description(source), source)
+        for parent in parents:
+            self.db.execute('INSERT OR IGNORE INTO links VALUES (?, ?)', (parent, name))
+        if commit:
+            self.commit()
+        return changed
+
+    def _upsert(self, name, path, digest, size, mtime_ns, description, source):
+        row = self.db.execute('SELECT embedding_row FROM tasks WHERE name = ?', (name,)).fetchone()
+        embedding_row = row[0] if row is not None else self._next_row()
+        if embedding_row >= len(self._matrix):
+            self._open_matrix(embedding_row + 1)
+        self._matrix[embedding_row] = self.embed(description or source or '')
+        self.db.execute('INSERT INTO tasks (name, path, source_hash, size, mtime_ns, description, source, embedding_row, added) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT (name) DO UPDATE SET path = excluded.path, source_hash = excluded.source_hash, size = excluded.size, mtime_ns = excluded.mtime_ns, description = excluded.description, source = excluded.source',
+                        (name, path, digest, size, mtime_ns, description, source, embedding_row, time.time()))
+
+    def _next_row(self):
+        return self.db.execute('SELECT COALESCE(MAX(embedding_row) + 1, 0) FROM tasks').fetchone()[0]
+
+    def commit(self):
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+        self.db.commit()
+
+    def sync(self, paths=None):
+        """Indexes every task file in `paths` (default: long_run) and returns the names of new or changed ones."""
+        changed = [task_name(path) for path in (paths if paths is not None else task_paths(LONG_RUN_DIR)) if self.add(path, commit=False)]
+        self.commit()
+        return changed
+
+    def import_graph(self, html_path):
+        """
+        Adds the parent -> child links of a task graph page such as
+        public/htmls/long_run.html. Tasks of the graph without a task file in
+        the archive are indexed by the description in their node tooltip.
+        """
+        with open(html_path, encoding='utf-8') as f:
+            page = f.read()
+        datasets = {kind: json.loads(data) for kind, data in _VIS_DATASET.findall(page)}
+        for node in datasets.get('nodes', []):
+            match = _TASK_NAME.search(node['id'])
+            description = node.get('title') or ''
+            if match is None or not description:
+                continue
+            row = self.db.execute('SELECT path, description FROM tasks WHERE name = ?', (match.group(1),)).fetchone()
+            if row is None or (row[0] is None and row[1] != description):
+                self._upsert(match.group(1), None, None, None, None, description, None)
+        links = set()
+        for edge in datasets.get('edges', []):
+            parent, child = _TASK_NAME.search(edge['from']), _TASK_NAME.search(edge['to'])
+            if parent and child:
+                links.add((parent.group(1), child.group(1)))
+        self.db.executemany('INSERT OR IGNORE INTO links VALUES (?, ?)', sorted(links))
+        self.commit()
+        return len(links)
+
+    def paths(self):
+        """Task file of every archived task that has one, by name."""
+        return dict(self.db.execute('SELECT name, path FROM tasks WHERE path IS NOT NULL ORDER BY name'))
+
+    def record_result(self, name, success):
+        """Counts one finished episode of `name` towards its success stats."""
+        self.db.execute('UPDATE tasks SET episodes = episodes + 1, successes = successes + ? WHERE name = ?', (int(bool(success)), name))
+        self.db.commit()
+
+    def get(self, name):
+        cursor = self.db.execute('SELECT name, path, source_hash, description, episodes, successes FROM tasks WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row), parents=self.parents(name), children=self.children(name))
+
+    def parents(self, name):
+        return [row[0] for row in self.db.execute('SELECT parent FROM links WHERE child = ? ORDER BY parent', (name,))]
+
+    def children(self, name):
+        return [row[0] for row in self.db.execute('SELECT child FROM links WHERE parent = ? ORDER BY child', (name,))]
+
+    def embedding(self, name):
+        row = self.db.execute('SELECT embedding_row FROM tasks WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return np.array(self._matrix[row[0]])
+
+    def similar(self, query, k=5, exclude_self=True):
+        """
+        The `k` archived tasks most similar to `query` (a task name in the
+        archive or free text) by cosine similarity, as (name, score) pairs.
+        """
+        is_name = query in self
+        vector = self.embedding(query) if is_name else self.embed(query)
+        rows = self.db.execute('SELECT embedding_row, name FROM tasks').fetchall()
+        if not rows:
+            return []
+        indices = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        scores = self._matrix[indices] @ vector
+        if is_name and exclude_self:
+            scores[[row[1] for row in rows].index(query)] = -np.inf
+        k = min(k, len(rows) - (1 if is_name and exclude_self else 0))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(rows[i][1], float(scores[i])) for i in top]
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Index archived tasks and query them by similarity.')
+    parser.add_argument('directory', help='archive directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    sync = commands.add_parser('sync', help='index new or changed task files')
+    sync.add_argument('paths', nargs='*', help='task files (default: every task in long_run)')
+    sync.add_argument('--graph', help='task graph page with parent links, e.g. public/htmls/long_run.html')
+    similar = commands.add_parser('similar', help='most similar archived tasks')
+    similar.add_argument('query', help='task name or free text')
+    similar.add_argument('-k', type=int, default=5)
+    show = commands.add_parser('show', help='one task with its stats and links')
+    show.add_argument('name')
+    args = parser.parse_args(argv)
+    archive = TaskArchive(args.directory)
+    try:
+        if args.command == 'sync':
+            changed = archive.sync(args.paths or None)
+            links = archive.import_graph(args.graph) if args.graph else 0
+            print('{} tasks indexed, {} new or changed, {} links imported'.format(len(archive), len(changed), links))
+        elif args.command == 'similar':
+            for name, score in archive.similar(args.query, args.k):
+                print('{:<12} {:.3f}'.format(name, score))
+        elif args.command == 'show':
+            task = archive.get(args.name)
+            if task is None:
+                print('{} is not in the archive'.format(args.name))
+                return 1
+            print(json.dumps(task, indent=2))
+    finally:
+        archive.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
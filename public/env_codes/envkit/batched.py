@@ -0,0 +1,168 @@
+"""
+Reward, termination and success of many environments as NumPy operations.
+
+A task declares its terms once, as a RewardTerms class attribute: `fields`
+read the per-step state of one environment (positions, velocities, contact
+flags, counters), `constants` read its fixed parameters once, `derived`
+values shared by several terms are computed once per evaluation, and
+`rewards`, `terminated` and `success` compute from a batch whose attributes
+are all of those stacked over the environments:
+
+    reward_terms = RewardTerms(
+        fields={'ball_position': lambda env: env.state.position(env.ball_id)},
+        constants={'goal_x': lambda env: env.goal_position[0]},
+        derived={'goal': lambda b: b.ball_position[:, 0] > b.goal_x},
+        rewards={'goal': lambda b: np.where(b.goal, 10.0, 0.0)},
+        terminated=lambda b: b.goal)
+
+A field or constant given as a string is read as that attribute of the
+environment, without a Python-level call.
+
+BatchedRewards takes over the scalar get_task_rewards/get_terminated/
+get_success of a set of environments: during a step they only record the
+environment's fields at the exact point the scalar terms would have run, and
+the terms are then computed for the whole batch at once, so their Python cost
+does not grow with the number of environments:
+
+    batched = BatchedRewards(envs)
+    for observation, reward, terminated, truncated, info in batched.step(actions):
+        ...
+
+Tasks whose scalar terms update task state cannot be batched: task_103
+counts and removes delivered items and task_122 advances its gate counter and
+reverses target spins inside get_task_rewards, so they keep the scalar path.
+"""
+import operator
+import types
+
+import numpy as np
+
+
+def in_boxes_xy(points, center, size):
+    """Row-wise in_box_xy for an (n, >=2) array of points; `center` and `size` may be per-row arrays."""
+    center = np.asarray(center, dtype=float)
+    half = np.asarray(size, dtype=float) / 2
+    return (center[..., 0] - half[..., 0] < points[:, 0]) & (points[:, 0] < center[..., 0] + half[..., 0]) & (center[..., 1] - half[..., 1] < points[:, 1]) & (points[:, 1] < center[..., 1] + half[..., 1])
+
+
+def up_alignments(orientations):
+    """Row-wise up_alignment for an (n, 4) array of quaternions."""
+    return 1.0 - 2.0 * (orientations[:, 0] * orientations[:, 0] + orientations[:, 1] * orientations[:, 1])
+
+
+def distances_xy(a, b):
+    """Row-wise xy distance between two (n, >=2) arrays of points."""
+    dx, dy = a[:, 0] - b[:, 0], a[:, 1] - b[:, 1]
+    return np.sqrt(dx * dx + dy * dy)
+
+
+def _reader(read):
+    return operator.attrgetter(read) if isinstance(read, str) else read
+
+
+class RewardTerms:
+    """
+    Declaration of a task's reward terms for batched evaluation. `rewards`
+    maps each term name to a function of the batch returning one value per
+    environment, in the order the scalar get_task_rewards reports them.
+    `derived` values are computed in order, so each may use the ones before it.
+    """
+
+    def __init__(self, fields, rewards, terminated=None, success=None, constants=None, derived=None):
+        self.fields = {name: _reader(read) for name, read in fields.items()}
+        self.derived = dict(derived or {})
+        self.rewards = dict(rewards)
+        self.terminated = terminated
+        self.success = success
+        self.constants = {name: _reader(read) for name, read in (constants or {}).items()}
+
+
+class BatchedRewards:
+    """
+    Batched terms for `envs` (default terms: the `reward_terms` attribute of
+    the first environment's class). Attaching replaces each environment's
+    get_task_rewards, which then only records the fields, and its
+    get_terminated and get_success, which report False. An attached
+    environment stepped on its own would return a zero reward and never end,
+    so its `step()` raises RuntimeError; step the batch with `step(actions)`
+    instead, or `detach()` first.
+
+    A step records one row of field values per environment; `evaluate()`
+    turns each field into one array with a single NumPy call over the rows.
+    """
+
+    def __init__(self, envs, terms=None):
+        self.envs = list(envs)
+        self.terms = terms if terms is not None else getattr(type(self.envs[0]), 'reward_terms', None)
+        if self.terms is None:
+            raise ValueError('{} declares no reward_terms to batch'.format(type(self.envs[0]).__module__))
+        self.num_envs = len(self.envs)
+        self.batch = types.SimpleNamespace()
+        for name, read in self.terms.constants.items():
+            setattr(self.batch, name, np.array([read(env) for env in self.envs]))
+        self._names = list(self.terms.fields)
+        self._rows = [None] * self.num_envs
+        self._steps = []
+        for i, env in enumerate(self.envs):
+            self._steps.append(env.step)
+            env.step = _attached
+            env.get_task_rewards = self._recorder(i, env)
+            env.get_terminated = _never
+            env.get_success = _not_yet
+
+    def _recorder(self, index, env):
+        reads = list(self.terms.fields.values())
+        rows = self._rows
+
+        def get_task_rewards(action):
+            rows[index] = [read(env) for read in reads]
+            return {}
+        return get_task_rewards
+
+    def step(self, actions):
+        """Steps every environment with its action; returns their (observation, reward, terminated, truncated, info) with the batched reward, termination and info entries."""
+        results = [step(action) for step, action in zip(self._steps, actions)]
+        reward, terminated, success, terms = self.evaluate()
+        infos = self.infos(success, terms)
+        return [(observation, value, done, truncated, dict(info, **extra)) for (observation, _, _, truncated, info), value, done, extra in zip(results, reward.tolist(), terminated.tolist(), infos)]
+
+    def evaluate(self):
+        """(reward, terminated, success, terms) for the fields recorded by the last step of every environment, each an array over the batch; `terms` maps term names to arrays."""
+        batch = self.batch
+        rows = self._rows
+        for k, name in enumerate(self._names):
+            column = np.array([row[k] for row in rows])
+            setattr(batch, name, column if column.dtype == np.bool_ else column.astype(np.float64, copy=False))
+        for name, compute in self.terms.derived.items():
+            setattr(batch, name, compute(batch))
+        terms = {name: np.broadcast_to(np.asarray(compute(batch), dtype=np.float64), (self.num_envs,)) for name, compute in self.terms.rewards.items()}
+        reward = np.zeros(self.num_envs)
+        for value in terms.values():
+            reward = reward + value
+        terminated = np.broadcast_to(np.asarray(self.terms.terminated(batch), dtype=bool), (self.num_envs,)) if self.terms.terminated is not None else np.zeros(self.num_envs, dtype=bool)
+        success = np.broadcast_to(np.asarray(self.terms.success(batch), dtype=bool), (self.num_envs,)) if self.terms.success is not None else np.zeros(self.num_envs, dtype=bool)
+        return reward, terminated, success, terms
+
+    def infos(self, success, terms):
+        """Per-environment `success` and `rewards` entries matching the info dicts of the scalar step()."""
+        names = list(terms)
+        columns = np.stack([terms[name] for name in names], axis=1).tolist() if names else [[]] * self.num_envs
+        return [{'success': bool(flag), 'rewards': dict(zip(names, row))} for flag, row in zip(success.tolist(), columns)]
+
+    def detach(self):
+        """Gives every environment its scalar methods back."""
+        for env in self.envs:
+            for method in ('step', 'get_task_rewards', 'get_terminated', 'get_success'):
+                env.__dict__.pop(method, None)
+
+
+def _attached(action):
+    raise RuntimeError('This environment is attached to a BatchedRewards: step it with BatchedRewards.step() or detach() it first')
+
+
+def _never(action):
+    return False
+
+
+def _not_yet():
+    return False
@@ -0,0 +1,190 @@
+"""
+Headless step-throughput benchmark for the long_run tasks.
+
+Every task runs in its own process so peak RSS is per task:
+
+    python -m envkit.benchmark --steps 2000 --output bench.json
+    python -m envkit.benchmark --compare bench.json --output bench_new.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import platform
+import resource
+import signal
+import sys
+import time
+import traceback
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from envkit.loader import load_env_class, source_hash, task_name, task_paths
+from envkit.profiling import Profiler
+
+
+def sample_action(action_space, rng):
+    low, high = getattr(action_space, 'low', None), getattr(action_space, 'high', None)
+    if low is not None and high is not None and np.all(np.isfinite(low)) and np.all(np.isfinite(high)):
+        return rng.uniform(low, high).astype(action_space.dtype)
+    return action_space.sample()
+
+
+def run_task(path, steps, episode_steps, seed, count_api_calls=False):
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    env = load_env_class(path)(seed=seed)
+    construction_s = time.perf_counter() - start
+    profiler = Profiler(env, count_api_calls=count_api_calls)
+    reset_times = []
+    step_s = 0.0
+    episodes = 0
+    done = True
+    episode_length = 0
+    for _ in range(steps):
+        if done:
+            start = time.perf_counter()
+            env.reset()
+            reset_times.append(time.perf_counter() - start)
+            episodes += 1
+            episode_length = 0
+        action = sample_action(env.action_space, rng)
+        start = time.perf_counter()
+        _, _, terminated, truncated, _ = env.step(action)
+        step_s += time.perf_counter() - start
+        episode_length += 1
+        done = terminated or truncated or episode_length >= episode_steps
+    profiler.detach()
+    sections = profiler.summary()['sections']
+
+    def seconds(name):
+        return sections.get(name, {}).get('total_ns', 0) / 1e9
+    task_s = seconds('get_task_rewards') + seconds('get_terminated') + seconds('get_success')
+    result = {
+        'task': task_name(path),
+        'source_hash': source_hash(path),
+        'steps': steps,
+        'episodes': episodes,
+        'steps_per_sec': steps / step_s if step_s > 0.0 else float('inf'),
+        'construction_s': construction_s,
+        'reset_s': float(np.mean(reset_times)),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        'time_split_s': {
+            'physics': seconds('stepSimulation'),
+            'rewards': seconds('get_task_rewards'),
+            'terminated': seconds('get_terminated'),
+            'success': seconds('get_success'),
+            'other': step_s - seconds('stepSimulation') - task_s,
+        },
+    }
+    if count_api_calls:
+        result['api_calls_per_step'] = sections.get('step', {}).get('api_calls', 0) / steps
+    return result
+
+
+def exit_reason(code):
+    """Why a child process that never reported a result went away."""
+    if code is not None and code < 0:
+        return 'killed by {}'.format(signal.Signals(-code).name)
+    return 'exited with code {} before reporting'.format(code)
+
+
+def _run_task_in_child(remote, path, steps, episode_steps, seed, count_api_calls):
+    try:
+        result = run_task(path, steps, episode_steps, seed, count_api_calls)
+    except Exception:
+        result = {'task': task_name(path), 'error': traceback.format_exc()}
+    remote.send(result)
+    remote.close()
+
+
+def run_isolated(path, steps, episode_steps, seed, timeout, count_api_calls=False):
+    """Runs `run_task` in a spawned process; a crash or a timeout comes back as an entry with an `error`."""
+    context = mp.get_context('spawn')
+    reader, writer = context.Pipe(duplex=False)
+    process = context.Process(target=_run_task_in_child, args=(writer, path, steps, episode_steps, seed, count_api_calls), daemon=True)
+    process.start()
+    writer.close()
+    try:
+        if not wait([reader, process.sentinel], timeout=timeout):
+            return {'task': task_name(path), 'error': 'timed out after {:.0f} s'.format(timeout)}
+        try:
+            return reader.recv()
+        except (EOFError, OSError):
+            process.join(1.0)
+            return {'task': task_name(path), 'error': exit_reason(process.exitcode)}
+    finally:
+        reader.close()
+        process.join(timeout=1.0)
+        if process.is_alive():
+            process.kill()
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of human-readable regressions of `results` against `baseline`; a task that fails and did not fail in `baseline` is one."""
+    previous = {entry['task']: entry for entry in baseline['results'] if 'error' not in entry}
+    failed_before = {entry['task'] for entry in baseline['results'] if 'error' in entry}
+    regressions = []
+    for entry in results['results']:
+        if 'error' in entry:
+            if entry['task'] not in failed_before:
+                regressions.append('{}: failed: {}'.format(entry['task'], entry['error'].strip().splitlines()[-1]))
+            continue
+        old = previous.get(entry['task'])
+        if old is None:
+            continue
+        if entry['steps_per_sec'] < old['steps_per_sec'] * (1.0 - threshold):
+            regressions.append('{}: steps/sec {:.1f} -> {:.1f}'.format(entry['task'], old['steps_per_sec'], entry['steps_per_sec']))
+        for key in ('reset_s', 'construction_s'):
+            if entry[key] > old[key] * (1.0 + threshold):
+                regressions.append('{}: {} {:.3g} -> {:.3g}'.format(entry['task'], key, old[key], entry[key]))
+    return regressions
+
+
+def format_table(results):
+    lines = ['{:<12} {:>10} {:>10} {:>10} {:>9} {:>8} {:>8} {:>8}'.format('task', 'steps/s', 'build ms', 'reset ms', 'rss MB', 'physics', 'task fn', 'other')]
+    for entry in results['results']:
+        if 'error' in entry:
+            lines.append('{:<12} ERROR {}'.format(entry['task'], entry['error'].strip().splitlines()[-1]))
+            continue
+        split = entry['time_split_s']
+        total = sum(split.values()) or 1.0
+        task_fraction = (split['rewards'] + split['terminated'] + split['success']) / total
+        lines.append('{:<12} {:>10.1f} {:>10.1f} {:>10.2f} {:>9.1f} {:>7.0%} {:>7.0%} {:>7.0%}'.format(entry['task'], entry['steps_per_sec'], entry['construction_s'] * 1e3, entry['reset_s'] * 1e3, entry['peak_rss_mb'], split['physics'] / total, task_fraction, split['other'] / total))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark long_run task environments.')
+    parser.add_argument('paths', nargs='*', help='task files (default: every task in long_run)')
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--episode-steps', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=600.0)
+    parser.add_argument('--count-api-calls', action='store_true', help='also count PyBullet calls per step (adds overhead)')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+    results = {
+        'python': sys.version.split()[0],
+        'machine': platform.machine(),
+        'steps': args.steps,
+        'seed': args.seed,
+        'results': [run_isolated(path, args.steps, args.episode_steps, args.seed, args.timeout, args.count_api_calls) for path in (args.paths or task_paths())],
+    }
+    print(format_table(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Branch points of a running environment for search-based planners.
+
+`clone()` records the physics state with one saveState call plus the task's
+Python-side state, the attributes listed in the task's
+`clone_state_attributes` and its RNG; `restore(handle)` puts both back, so a
+planner can try many continuations from the same mid-episode state without
+rebuilding the environment and replaying actions from reset:
+
+    pool = ClonePool(env, capacity=256)
+    root = pool.clone()
+    for plan in candidates:
+        pool.restore(root)
+        returns.append(sum(env.step(action)[1] for action in plan))
+
+Helpers that keep state of their own (KinematicTracks, BodyPool,
+StateSnapshot) are listed by attribute name like plain values; they provide
+`clone_state()`/`restore_state()`. Arrays, lists, dicts and sets are restored
+in place, so other references to them (such as a task attribute that is a
+view of a track's speeds) stay valid; containers are copied one level deep.
+"""
+import collections
+import copy
+
+import numpy as np
+
+_MISSING = object()
+
+
+def _capture(value):
+    if hasattr(value, 'clone_state'):
+        return value.clone_state()
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, (list, dict, set)):
+        return copy.copy(value)
+    return value
+
+
+def _restore(owner, name, saved):
+    current = getattr(owner, name, _MISSING)
+    if saved is _MISSING:
+        if current is not _MISSING:
+            delattr(owner, name)
+    elif hasattr(current, 'restore_state'):
+        current.restore_state(saved)
+    elif isinstance(saved, np.ndarray) and isinstance(current, np.ndarray) and current.shape == saved.shape and current.dtype == saved.dtype:
+        current[...] = saved
+    elif isinstance(saved, list) and isinstance(current, list):
+        current[:] = saved
+    elif isinstance(saved, (dict, set)) and type(current) is type(saved):
+        current.clear()
+        current.update(saved)
+    else:
+        setattr(owner, name, _capture(saved))
+
+
+class ClonePool:
+    """
+    At most `capacity` clones of `env`, evicting the least recently cloned or
+    restored one; restoring an evicted handle raises KeyError. `attributes`
+    overrides the env's `clone_state_attributes`. A clone is only valid while
+    the set of bodies in the world is the one at clone time; restoring it after
+    bodies were added (a BodyPool grew) raises ValueError.
+
+    The pool turns on the client's deterministicOverlappingPairs. Without it,
+    restoreState leaves the contact manifolds, and the solver warm-start
+    impulses cached in them, from whatever the world was doing before the
+    restore, so two restores of one handle drift apart after a few steps. With
+    it the manifolds are saved and restored too: every continuation from a
+    handle repeats, step for step, the run that continued from the clone
+    without restoring. The setting changes the order contacts are solved in,
+    so an env stepped after the pool is created no longer matches one without
+    a pool bit for bit.
+    """
+
+    def __init__(self, env, capacity=64, attributes=None):
+        self.env = env
+        self._p = env._p
+        self.capacity = capacity
+        self._p.setPhysicsEngineParameter(deterministicOverlappingPairs=1)
+        self.attributes = tuple(attributes if attributes is not None else getattr(env, 'clone_state_attributes', ()))
+        self.evictions = 0
+        self._clones = collections.OrderedDict()
+        self._next_handle = 0
+
+    def __len__(self):
+        return len(self._clones)
+
+    def __contains__(self, handle):
+        return handle in self._clones
+
+    def clone(self):
+        """Records the current state and returns its handle."""
+        env = self.env
+        values = tuple(_capture(getattr(env, name, _MISSING)) for name in self.attributes)
+        rng = getattr(env, 'rng', None)
+        rng_state = rng.bit_generator.state if isinstance(rng, np.random.Generator) else None
+        handle = self._next_handle
+        self._next_handle += 1
+        self._clones[handle] = (self._p.saveState(), values, rng_state, self._p.getNumBodies())
+        while len(self._clones) > self.capacity:
+            self._remove(self._clones.popitem(last=False)[1])
+            self.evictions += 1
+        return handle
+
+    def restore(self, handle):
+        """Puts the environment back into the state recorded under `handle`; the clone stays available."""
+        state_id, values, rng_state, num_bodies = self._clones[handle]
+        if self._p.getNumBodies() != num_bodies:
+            raise ValueError('clone {} was taken with {} bodies in the world, it has {} now'.format(handle, num_bodies, self._p.getNumBodies()))
+        self._clones.move_to_end(handle)
+        env = self.env
+        for name, saved in zip(self.attributes, values):
+            _restore(env, name, saved)
+        self._p.restoreState(stateId=state_id)
+        if rng_state is not None:
+            env.rng.bit_generator.state = rng_state
+        context = getattr(env, 'step_context', None)
+        if context is not None:
+            context.invalidate()
+        for name in ('state', 'contacts', 'spatial'):
+            cache = getattr(env, name, None)
+            if cache is not None and hasattr(cache, 'invalidate'):
+                cache.invalidate()
+
+    def release(self, handle):
+        clone = self._clones.pop(handle, None)
+        if clone is not None:
+            self._remove(clone)
+
+    def clear(self):
+        while self._clones:
+            self._remove(self._clones.popitem()[1])
+
+    def _remove(self, clone):
+        self._p.removeState(clone[0])
+
+
+def with_cloning(env_cls, capacity=64):
+    """
+    Subclass of a task whose instances have `clone()`, `restore(handle)` and
+    `release(handle)`, backed by a ClonePool of `capacity` clones.
+    """
+    class CloningEnv(env_cls):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.clone_pool = ClonePool(self, capacity)
+
+        def clone(self):
+            return self.clone_pool.clone()
+
+        def restore(self, handle):
+            self.clone_pool.restore(handle)
+
+        def release(self, handle):
+            self.clone_pool.release(handle)
+
+    return CloningEnv
@@ -0,0 +1,139 @@
+import numpy as np
+
+# createCollisionShapeArray keeps at most this many child shapes.
+MAX_COMPOUND_CHILDREN = 16
+FIRST_LOGICAL_ID = -2
+# Contact points lie on or slightly inside a child's surface.
+AABB_MARGIN = 0.05
+
+
+class StaticCompound:
+    """
+    One fixed compound body standing in for several static bodies. Contact
+    points on it are attributed to the child whose surface is closest, so they
+    can be reported under that child's logical id. A point inside exactly one
+    child's bounding box is resolved without NumPy.
+    """
+
+    def __init__(self, p, body_id, logical_ids, shape_types, dimensions, positions, orientations):
+        self.body_id = body_id
+        self.logical_ids = list(logical_ids)
+        self.centers = np.array(positions, dtype=float).reshape(-1, 3)
+        self.inverse_rotations = np.array([np.reshape(p.getMatrixFromQuaternion(orientation), (3, 3)).T for orientation in orientations]).reshape(-1, 3, 3)
+        self.is_box = np.array([shape_type == p.GEOM_BOX for shape_type in shape_types])
+        self.is_cylinder = np.array([shape_type == p.GEOM_CYLINDER for shape_type in shape_types])
+        self.half_extents = np.zeros((len(self.logical_ids), 3))
+        self.radii = np.zeros(len(self.logical_ids))
+        self.half_heights = np.zeros(len(self.logical_ids))
+        for i, (shape_type, dims) in enumerate(zip(shape_types, dimensions)):
+            if shape_type == p.GEOM_BOX:
+                self.half_extents[i] = dims
+            elif shape_type == p.GEOM_CYLINDER:
+                self.radii[i], self.half_heights[i] = dims[0], dims[1] / 2
+            else:
+                self.radii[i] = dims[0]
+        half_sizes = np.where(self.is_box[:, None], self.half_extents, np.stack([self.radii, self.radii, np.where(self.is_cylinder, self.half_heights, self.radii)], axis=1))
+        extents = np.einsum('nji,nj->ni', np.abs(self.inverse_rotations), half_sizes) + AABB_MARGIN
+        self.bounds = np.concatenate([self.centers - extents, self.centers + extents], axis=1).tolist()
+
+    def resolve(self, positions):
+        """Logical ids of the children nearest to each world-space contact position."""
+        if len(self.logical_ids) == 1:
+            return [self.logical_ids[0]] * len(positions)
+        resolved = []
+        ambiguous = []
+        for k, (x, y, z) in enumerate(positions):
+            candidates = [i for i, (x0, y0, z0, x1, y1, z1) in enumerate(self.bounds) if x0 <= x <= x1 and y0 <= y <= y1 and z0 <= z <= z1]
+            resolved.append(self.logical_ids[candidates[0]] if len(candidates) == 1 else None)
+            if len(candidates) != 1:
+                ambiguous.append(k)
+        if ambiguous:
+            for k, logical_id in zip(ambiguous, self._nearest([positions[k] for k in ambiguous])):
+                resolved[k] = logical_id
+        return resolved
+
+    def _nearest(self, positions):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        local = np.einsum('nij,knj->kni', self.inverse_rotations, positions[:, None, :] - self.centers[None, :, :])
+        box = np.linalg.norm(np.maximum(np.abs(local) - self.half_extents, 0.0), axis=2)
+        radial = np.maximum(np.linalg.norm(local[:, :, :2], axis=2) - self.radii, 0.0)
+        cylinder = np.hypot(radial, np.maximum(np.abs(local[:, :, 2]) - self.half_heights, 0.0))
+        sphere = np.maximum(np.linalg.norm(local, axis=2) - self.radii, 0.0)
+        distances = np.where(self.is_box, box, np.where(self.is_cylinder, cylinder, sphere))
+        return [self.logical_ids[i] for i in np.argmin(distances, axis=1)]
+
+
+class StaticScenery:
+    """
+    Folds fixed ShapeFactory bodies into a few compound bodies so the
+    broadphase and contact generation see far fewer objects.
+
+    Bodies are grouped by their base dynamics (friction, restitution) and each
+    group is packed into compounds of up to MAX_COMPOUND_CHILDREN shapes; the
+    original bodies are removed. Each original body gets a negative logical id:
+    task code keeps referring to scenery through `remap()`ed ids, and a
+    ContactCache built with this scenery reports contacts under those ids. With
+    `enabled=False` nothing is merged and `remap()` returns ids unchanged.
+    """
+
+    def __init__(self, p, shapes, body_ids, enabled=True):
+        self._p = p
+        self.enabled = enabled
+        self.logical_ids = {}
+        self.compounds = {}
+        if not enabled:
+            return
+        groups = {}
+        for body_id in body_ids:
+            dynamics = p.getDynamicsInfo(body_id, -1)
+            if dynamics[0] != 0.0:
+                raise ValueError('Body {} has mass {} and cannot be merged into static scenery'.format(body_id, dynamics[0]))
+            key = (dynamics[1], dynamics[5], dynamics[6], dynamics[7])
+            groups.setdefault(key, []).append(body_id)
+        for body_id in body_ids:
+            self.logical_ids[body_id] = FIRST_LOGICAL_ID - len(self.logical_ids)
+        for (lateral_friction, restitution, rolling_friction, spinning_friction), group in groups.items():
+            for start in range(0, len(group), MAX_COMPOUND_CHILDREN):
+                compound = self._merge(shapes, group[start:start + MAX_COMPOUND_CHILDREN])
+                p.changeDynamics(compound.body_id, -1, lateralFriction=lateral_friction, restitution=restitution, rollingFriction=rolling_friction, spinningFriction=spinning_friction)
+                self.compounds[compound.body_id] = compound
+
+    def _merge(self, shapes, body_ids):
+        p = self._p
+        shape_types, dimensions, colors, positions, orientations = [], [], [], [], []
+        for body_id in body_ids:
+            shape_type, dims, color = shapes.geometry[body_id]
+            position, orientation = p.getBasePositionAndOrientation(body_id)
+            shape_types.append(shape_type)
+            dimensions.append(dims)
+            colors.append(color)
+            positions.append(list(position))
+            orientations.append(list(orientation))
+        half_extents = [list(dims) if shape_type == p.GEOM_BOX else [0.0, 0.0, 0.0] for shape_type, dims in zip(shape_types, dimensions)]
+        radii = [0.0 if shape_type == p.GEOM_BOX else dims[0] for shape_type, dims in zip(shape_types, dimensions)]
+        lengths = [dims[1] if shape_type == p.GEOM_CYLINDER else 0.0 for shape_type, dims in zip(shape_types, dimensions)]
+        collision_shape_id = p.createCollisionShapeArray(shapeTypes=shape_types, halfExtents=half_extents, radii=radii, lengths=lengths, collisionFramePositions=positions, collisionFrameOrientations=orientations)
+        visual_shape_id = p.createVisualShapeArray(shapeTypes=shape_types, halfExtents=half_extents, radii=radii, lengths=lengths, visualFramePositions=positions, visualFrameOrientations=orientations)
+        for body_id in body_ids:
+            p.removeBody(body_id)
+        body_id = p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id)
+        for i, color in enumerate(colors):
+            p.changeVisualShape(body_id, -1, shapeIndex=i, rgbaColor=color)
+        return StaticCompound(p, body_id, [self.logical_ids[original_id] for original_id in body_ids], shape_types, dimensions, positions, orientations)
+
+    def remap(self, body_ids):
+        return [self.logical_ids.get(body_id, body_id) for body_id in body_ids]
+
+    def logical_id(self, body_id):
+        return self.logical_ids.get(body_id, body_id)
+
+    def alias_contacts(self, points):
+        """(body_a, body_b, link_a, link_b) for each contact point, with compound bodies replaced by the logical id of the touched child."""
+        contacts = [list(point[1:5]) for point in points]
+        for side, position_index in ((0, 5), (1, 6)):
+            for body_id, compound in self.compounds.items():
+                indices = [i for i, contact in enumerate(contacts) if contact[side] == body_id]
+                if indices:
+                    for i, logical_id in zip(indices, compound.resolve([points[i][position_index] for i in indices])):
+                        contacts[i][side] = logical_id
+        return contacts
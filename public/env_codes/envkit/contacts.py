@@ -0,0 +1,56 @@
+class ContactCache:
+    """
+    Index of the contact points produced by the last physics step.
+
+    A refresh issues a single unfiltered getContactPoints() call and buckets the
+    result by body pair, so each pair or per-body lookup afterwards is a dict
+    access. Call `invalidate()` before stepping the simulation; the next query
+    rebuilds the index. With a StaticScenery, contacts on its compound bodies
+    are reported under the logical ids of the merged bodies.
+    """
+
+    def __init__(self, p, scenery=None):
+        self._p = p
+        self._scenery = scenery if scenery is not None and scenery.compounds else None
+        self._pairs = {}
+        self._touching = {}
+        self._stale = True
+
+    def invalidate(self):
+        self._stale = True
+
+    def refresh(self):
+        pairs = {}
+        touching = {}
+        points = self._p.getContactPoints()
+        contacts = self._scenery.alias_contacts(points) if self._scenery is not None else (point[1:5] for point in points)
+        for body_a, body_b, link_a, link_b in contacts:
+            pairs.setdefault((body_a, body_b), set()).add((link_a, link_b))
+            pairs.setdefault((body_b, body_a), set()).add((link_b, link_a))
+            touching.setdefault(body_a, set()).add(body_b)
+            touching.setdefault(body_b, set()).add(body_a)
+        self._pairs = pairs
+        self._touching = touching
+        self._stale = False
+
+    def links(self, body_a, body_b):
+        """Set of (link_a, link_b) pairs through which two bodies touch."""
+        if self._stale:
+            self.refresh()
+        return self._pairs.get((body_a, body_b), frozenset())
+
+    def touching(self, body_id):
+        """Set of bodies in contact with `body_id`."""
+        if self._stale:
+            self.refresh()
+        return self._touching.get(body_id, frozenset())
+
+    def in_contact(self, body_a, body_b=None, link_a=None):
+        if body_b is None:
+            if link_a is None:
+                return len(self.touching(body_a)) > 0
+            return any(self.in_contact(body_a, other, link_a) for other in self.touching(body_a))
+        links = self.links(body_a, body_b)
+        if link_a is None:
+            return len(links) > 0
+        return any(link == link_a for link, _ in links)
@@ -0,0 +1,320 @@
+"""
+Learning-progress curriculum over many long_run tasks.
+
+A Curriculum keeps per-task success statistics from the `success` flag the
+tasks report and decides which task a free worker runs next. Tasks whose
+success rate is changing (learning progress: the gap between a fast and a slow
+moving average of success) get most of the episodes; mastered tasks and tasks
+that never succeed are set aside and only revisited occasionally. New tasks,
+added by hand or picked up from a TaskArchive, are tried first:
+
+    curriculum = Curriculum(archive=TaskArchive('archive'))
+    run_curriculum(curriculum, num_workers=8, episodes=10000, policy=policy)
+    python -m envkit.curriculum --workers 8 --episodes 2000 --archive archive
+
+Workers run episodes asynchronously: each one is handed its next task as soon
+as it reports the previous episode, so slow tasks never hold up fast ones.
+"""
+import argparse
+import collections
+import multiprocessing as mp
+import os
+import sys
+import traceback
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from envkit.benchmark import sample_action
+from envkit.loader import load_env_class, task_name, task_paths
+from envkit.prefetch import close_env
+
+NEW, LEARNING, MASTERED, IMPOSSIBLE = 'new', 'learning', 'mastered', 'impossible'
+
+
+class TaskStats:
+    __slots__ = ('name', 'path', 'episodes', 'successes', 'fast', 'slow', 'running', 'returns', 'failures')
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.episodes = 0
+        self.successes = 0
+        self.fast = 0.0
+        self.slow = 0.0
+        self.running = 0
+        self.returns = 0.0
+        self.failures = 0
+
+    @property
+    def progress(self):
+        return abs(self.fast - self.slow)
+
+    def as_dict(self):
+        return {'task': self.name, 'episodes': self.episodes, 'successes': self.successes, 'success_rate': self.fast, 'progress': self.progress, 'mean_return': self.returns / self.episodes if self.episodes else 0.0}
+
+
+class Curriculum:
+    """
+    Learning-progress task sampler. Success is tracked with moving averages of
+    rate `fast` and `slow`; a task is NEW until it has `min_episodes` results,
+    MASTERED while its fast average is at least `mastered`, IMPOSSIBLE after
+    `give_up_after` episodes without a single success, and LEARNING otherwise.
+    LEARNING tasks are drawn in proportion to their learning progress, with
+    probability `explore` uniformly instead; MASTERED and IMPOSSIBLE tasks are
+    drawn with probability `revisit`, so forgetting or a newly reachable task
+    is noticed. A task is dropped after `max_failures` episodes in a row that
+    raised.
+    """
+
+    def __init__(self, paths=(), archive=None, fast=0.1, slow=0.02, min_episodes=5, mastered=0.9, give_up_after=50, explore=0.1, revisit=0.02, max_failures=3, seed=None):
+        self.archive = archive
+        self.fast = fast
+        self.slow = slow
+        self.min_episodes = min_episodes
+        self.mastered = mastered
+        self.give_up_after = give_up_after
+        self.explore = explore
+        self.revisit = revisit
+        self.max_failures = max_failures
+        self.rng = np.random.default_rng(seed)
+        self.tasks = {}
+        for path in paths:
+            self.add(path)
+        if archive is not None:
+            self.sync()
+
+    def add(self, path, name=None):
+        """Adds a task file; its statistics are kept if it is already known."""
+        name = name or task_name(path)
+        stats = self.tasks.get(name)
+        if stats is None:
+            self.tasks[name] = TaskStats(name, path)
+        else:
+            stats.path = path
+        return name
+
+    def remove(self, name):
+        self.tasks.pop(name, None)
+
+    def sync(self):
+        """Adds the archive's tasks that have a task file and returns the names of the new ones."""
+        return [self.add(path, name) for name, path in self.archive.paths().items() if name not in self.tasks and os.path.exists(path)]
+
+    def status(self, name):
+        stats = self.tasks[name]
+        if stats.episodes < self.min_episodes:
+            return NEW
+        if stats.fast >= self.mastered:
+            return MASTERED
+        if stats.successes == 0 and stats.episodes >= self.give_up_after:
+            return IMPOSSIBLE
+        return LEARNING
+
+    def next_task(self):
+        """Name of the task a free worker should run next (None if there are no tasks); counts it as running until `report()`."""
+        if not self.tasks:
+            return None
+        groups = {NEW: [], LEARNING: [], MASTERED: [], IMPOSSIBLE: []}
+        for name in self.tasks:
+            groups[self.status(name)].append(self.tasks[name])
+        set_aside = groups[MASTERED] + groups[IMPOSSIBLE]
+        if groups[NEW]:
+            stats = min(groups[NEW], key=lambda stats: stats.episodes + stats.running)
+        elif not groups[LEARNING] or (set_aside and self.rng.random() < self.revisit):
+            stats = set_aside[self.rng.integers(len(set_aside))]
+        else:
+            learning = groups[LEARNING]
+            progress = np.array([stats.progress for stats in learning])
+            if self.rng.random() < self.explore or progress.sum() <= 0.0:
+                stats = learning[self.rng.integers(len(learning))]
+            else:
+                stats = learning[self.rng.choice(len(learning), p=progress / progress.sum())]
+        stats.running += 1
+        return stats.name
+
+    def report(self, name, success, episode_return=0.0):
+        """Counts one finished episode of `name`."""
+        stats = self.tasks.get(name)
+        if stats is None:
+            return
+        stats.running = max(stats.running - 1, 0)
+        stats.failures = 0
+        value = 1.0 if success else 0.0
+        if stats.episodes == 0:
+            stats.fast = stats.slow = value
+        else:
+            stats.fast += self.fast * (value - stats.fast)
+            stats.slow += self.slow * (value - stats.slow)
+        stats.episodes += 1
+        stats.successes += int(bool(success))
+        stats.returns += episode_return
+        if self.archive is not None:
+            self.archive.record_result(name, success)
+
+    def fail(self, name):
+        """Counts a running episode of `name` that raised; returns True if that dropped the task."""
+        stats = self.tasks.get(name)
+        if stats is None:
+            return False
+        stats.running = max(stats.running - 1, 0)
+        stats.failures += 1
+        if stats.failures < self.max_failures:
+            return False
+        self.remove(name)
+        return True
+
+    def cancel(self, name):
+        """Forgets a running episode of `name` that will never be reported."""
+        stats = self.tasks.get(name)
+        if stats is not None:
+            stats.running = max(stats.running - 1, 0)
+
+    def summary(self):
+        return [dict(stats.as_dict(), status=self.status(name)) for name, stats in self.tasks.items()]
+
+
+def run_episode(env, policy, max_steps, rng):
+    """Runs one episode; returns (success, return, steps). Success is whether any step reported it."""
+    observation = env.reset()
+    success, total = False, 0.0
+    for step in range(1, max_steps + 1):
+        action = policy(observation) if policy is not None else sample_action(env.action_space, rng)
+        observation, reward, terminated, truncated, info = env.step(action)
+        total += float(reward)
+        success = success or bool(info.get('success', False) if isinstance(info, dict) else False)
+        if terminated or truncated:
+            break
+    return success, total, step
+
+
+def _worker(remote, policy, max_steps, seed, max_envs):
+    envs = collections.OrderedDict()
+    rng = np.random.default_rng(seed)
+    try:
+        while True:
+            request = remote.recv()
+            if request is None:
+                break
+            name, path = request
+            try:
+                env = envs.pop(path, None) or load_env_class(path)(seed=seed)
+                envs[path] = env
+                while len(envs) > max_envs:
+                    close_env(envs.popitem(last=False)[1])
+                success, total, steps = run_episode(env, policy, max_steps, rng)
+                remote.send({'task': name, 'success': success, 'return': total, 'steps': steps, 'error': None})
+            except Exception:
+                envs.pop(path, None)
+                remote.send({'task': name, 'success': False, 'return': 0.0, 'steps': 0, 'error': traceback.format_exc()})
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        for env in envs.values():
+            close_env(env)
+        remote.close()
+
+
+def run_curriculum(curriculum, num_workers=None, episodes=1000, policy=None, max_steps=1000, seed=0, max_envs_per_worker=4, sync_every=100, on_episode=None, start_method='spawn'):
+    """
+    Runs `episodes` episodes on `num_workers` processes, each assigned its next
+    task by `curriculum` as soon as it is free, and returns the curriculum's
+    summary. `policy(observation)` picks actions (default: random actions) and
+    must be picklable; each worker keeps its `max_envs_per_worker` most
+    recently used environments alive. With an archive, new archive tasks are
+    picked up every `sync_every` episodes. `on_episode(result)` sees every
+    finished episode. A task whose episodes keep raising is dropped after
+    the curriculum's `max_failures` attempts in a row; the worker rebuilds its
+    environment before each retry.
+    """
+    num_workers = num_workers or os.cpu_count()
+    context = mp.get_context(start_method)
+    remotes, processes = [], []
+    for index in range(num_workers):
+        remote, worker_remote = context.Pipe()
+        process = context.Process(target=_worker, args=(worker_remote, policy, max_steps, seed + index, max_envs_per_worker), daemon=True)
+        process.start()
+        worker_remote.close()
+        remotes.append(remote)
+        processes.append(process)
+    busy = {}
+    idle = list(remotes)
+    started = finished = 0
+
+    def assign_idle():
+        nonlocal started
+        while idle and started < episodes:
+            name = curriculum.next_task()
+            if name is None:
+                return
+            remote = idle.pop()
+            busy[remote] = name
+            remote.send((name, curriculum.tasks[name].path))
+            started += 1
+
+    try:
+        assign_idle()
+        while busy:
+            for remote in wait(list(busy)):
+                name = busy.pop(remote)
+                try:
+                    result = remote.recv()
+                except EOFError:
+                    curriculum.cancel(name)
+                    continue
+                idle.append(remote)
+                finished += 1
+                if result['error'] is not None:
+                    curriculum.fail(name)
+                else:
+                    curriculum.report(name, result['success'], result['return'])
+                if on_episode is not None:
+                    on_episode(result)
+                if curriculum.archive is not None and sync_every and finished % sync_every == 0:
+                    curriculum.sync()
+                assign_idle()
+    finally:
+        for remote in remotes:
+            try:
+                remote.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+    return curriculum.summary()
+
+
+def format_table(summary):
+    lines = ['{:<12} {:<10} {:>8} {:>8} {:>8} {:>8} {:>10}'.format('task', 'status', 'episodes', 'success', 'rate', 'progress', 'return')]
+    for row in sorted(summary, key=lambda row: -row['episodes']):
+        lines.append('{:<12} {:<10} {:>8} {:>8} {:>8.2f} {:>8.3f} {:>10.2f}'.format(row['task'], row['status'], row['episodes'], row['successes'], row['success_rate'], row['progress'], row['mean_return']))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run episodes across many tasks, scheduled by learning progress.')
+    parser.add_argument('paths', nargs='*', help='task files (default: every task in long_run, or the archive with --archive)')
+    parser.add_argument('--archive', help='TaskArchive directory to take tasks from and record results in')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument('--max-steps', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    archive = None
+    if args.archive:
+        from envkit.archive import TaskArchive
+        archive = TaskArchive(args.archive)
+    paths = args.paths or ([] if archive is not None else task_paths())
+    try:
+        curriculum = Curriculum(paths, archive=archive, seed=args.seed)
+        print(format_table(run_curriculum(curriculum, args.workers, args.episodes, max_steps=args.max_steps, seed=args.seed)))
+    finally:
+        if archive is not None:
+            archive.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
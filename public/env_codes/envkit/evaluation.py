@@ -0,0 +1,39 @@
+def in_box_xy(point, center, size):
+    """True if `point` lies strictly inside the axis-aligned rectangle of `size` centred on `center` in the xy plane."""
+    return center[0] - size[0] / 2 < point[0] < center[0] + size[0] / 2 and center[1] - size[1] / 2 < point[1] < center[1] + size[1] / 2
+
+
+def up_alignment(orientation):
+    """Dot product of a body's local z axis with the world z axis, computed straight from its quaternion."""
+    x, y = orientation[0], orientation[1]
+    return 1.0 - 2.0 * (x * x + y * y)
+
+
+def is_upright(orientation, threshold=0.5):
+    return up_alignment(orientation) >= threshold
+
+
+class StepContext:
+    """
+    Memo for values derived from the current physics state (goal tests,
+    uprightness, distances), so reward, termination, success and info code can
+    share each one within a step. `invalidate()` clears the memo and invalidates
+    the per-step caches it was given, such as a StateSnapshot and a
+    ContactCache.
+    """
+
+    def __init__(self, *caches):
+        self.caches = caches
+        self._values = {}
+
+    def get(self, key, compute):
+        try:
+            return self._values[key]
+        except KeyError:
+            value = self._values[key] = compute()
+            return value
+
+    def invalidate(self):
+        self._values.clear()
+        for cache in self.caches:
+            cache.invalidate()
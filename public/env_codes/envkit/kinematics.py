@@ -0,0 +1,216 @@
+import abc
+
+import numpy as np
+
+
+def yaw_quaternions(yaws):
+    yaws = np.asarray(yaws, dtype=float)
+    quaternions = np.zeros((len(yaws), 4))
+    quaternions[:, 2] = np.sin(yaws / 2)
+    quaternions[:, 3] = np.cos(yaws / 2)
+    return quaternions
+
+
+class Track(abc.ABC):
+    """
+    Motion of a group of anchors. Subclasses keep anchor positions (M x 3), yaws
+    (M,) and velocities (M x 3) as arrays and advance them all at once; bodies
+    are attached to an anchor with a fixed offset in the anchor's frame.
+    """
+
+    set_velocity = False
+
+    def __init__(self, positions):
+        self.positions_init = np.array(positions, dtype=float).reshape(-1, 3)
+        self.positions = self.positions_init.copy()
+        self.yaws = np.zeros(len(self.positions))
+        self.velocities = np.zeros_like(self.positions)
+        self.attachments = []
+        self._attachment_arrays = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def attach(self, anchor_index, body_id, offset=(0.0, 0.0, 0.0)):
+        self.attachments.append((anchor_index, body_id, list(offset)))
+        self._attachment_arrays = None
+        return body_id
+
+    def attachment_arrays(self):
+        if self._attachment_arrays is None:
+            anchor_indices = np.array([anchor_index for anchor_index, _, _ in self.attachments], dtype=int)
+            offsets = np.array([offset for _, _, offset in self.attachments], dtype=float).reshape(-1, 3)
+            self._attachment_arrays = (anchor_indices, offsets)
+        return self._attachment_arrays
+
+    def reset(self):
+        self.positions[:] = self.positions_init
+        self.yaws[:] = 0.0
+        self.velocities[:] = 0.0
+
+    @abc.abstractmethod
+    def advance(self, time, dt):
+        """Moves the anchors to their state at `time`, `dt` after the previous call."""
+
+    def clone_state(self):
+        return {name: value.copy() for name, value in vars(self).items() if isinstance(value, np.ndarray)}
+
+    def restore_state(self, state):
+        """Copies a `clone_state()` back into the track's own arrays, so views of them held by the task stay valid."""
+        for name, value in state.items():
+            getattr(self, name)[...] = value
+
+
+class PingPongTrack(Track):
+    """Anchors that slide along `axis` and reverse once they are more than `extents` from their origin."""
+
+    def __init__(self, origins, axis, speeds, extents):
+        super().__init__(origins)
+        axis = np.asarray(axis, dtype=float)
+        self.axis = axis / np.linalg.norm(axis)
+        self.speeds = np.array(speeds, dtype=float).reshape(-1)
+        self.extents = np.broadcast_to(np.asarray(extents, dtype=float), self.speeds.shape).copy()
+        self.displacements = np.zeros(len(self))
+
+    def reset(self):
+        super().reset()
+        self.displacements[:] = 0.0
+
+    def advance(self, time, dt):
+        self.speeds[np.abs(self.displacements) > self.extents] *= -1.0
+        self.displacements += self.speeds * dt
+        self.positions[:] = self.positions_init + self.displacements[:, None] * self.axis
+        self.velocities[:] = self.speeds[:, None] * self.axis
+
+
+class RotationTrack(Track):
+    """Anchors spinning in place about the z axis, at yaw = angular_velocity * time."""
+
+    def __init__(self, positions, angular_velocities):
+        super().__init__(positions)
+        self.angular_velocities = np.array(angular_velocities, dtype=float).reshape(-1)
+
+    def advance(self, time, dt):
+        self.yaws[:] = self.angular_velocities * time
+
+
+class WaypointTrack(Track):
+    """Anchors following polylines at constant speed, looping back to the start or ping-ponging."""
+
+    def __init__(self, paths, speeds, loop=True):
+        self.paths = [np.array(path, dtype=float).reshape(-1, 3) for path in paths]
+        super().__init__([path[0] for path in self.paths])
+        self.speeds = np.broadcast_to(np.asarray(speeds, dtype=float), (len(self.paths),)).copy()
+        self.loop = loop
+        if loop:
+            self.paths = [np.concatenate([path, path[:1]]) for path in self.paths]
+        self.arc_lengths = [np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(path, axis=0), axis=1))]) for path in self.paths]
+        self.distances = np.zeros(len(self.paths))
+
+    def reset(self):
+        super().reset()
+        self.distances[:] = 0.0
+
+    def advance(self, time, dt):
+        self.distances += self.speeds * dt
+        for i, (path, arc_length) in enumerate(zip(self.paths, self.arc_lengths)):
+            total = arc_length[-1]
+            if total <= 0.0:
+                continue
+            if self.loop:
+                s = self.distances[i] % total
+            else:
+                s = total - abs(self.distances[i] % (2 * total) - total)
+            segment = min(np.searchsorted(arc_length, s, side='right') - 1, len(path) - 2)
+            direction = path[segment + 1] - path[segment]
+            length = arc_length[segment + 1] - arc_length[segment]
+            fraction = (s - arc_length[segment]) / length if length > 0.0 else 0.0
+            position = path[segment] + fraction * direction
+            self.velocities[i] = (position - self.positions[i]) / dt if dt > 0.0 else 0.0
+            self.positions[i] = position
+            self.yaws[i] = np.arctan2(direction[1], direction[0])
+
+
+class ChaseTrack(Track):
+    """
+    Anchors that move in the xy plane toward a target body at up to `speeds`,
+    stopping `stop_distance` short of it and turning to face it. Target
+    positions are read through `state` (a StateSnapshot) when given.
+    """
+
+    set_velocity = True
+
+    def __init__(self, p, origins, target_ids, speeds, stop_distance=0.0, state=None):
+        super().__init__(origins)
+        self._p = p
+        self.state = state
+        self.target_ids = list(target_ids)
+        self.speeds = np.broadcast_to(np.asarray(speeds, dtype=float), (len(self),)).copy()
+        self.stop_distance = stop_distance
+
+    def _target_position(self, body_id):
+        if self.state is not None:
+            return self.state.position(body_id)
+        return np.asarray(self._p.getBasePositionAndOrientation(body_id)[0])
+
+    def advance(self, time, dt):
+        targets = np.array([self._target_position(body_id) for body_id in self.target_ids]).reshape(-1, 3)
+        delta = targets[:, :2] - self.positions[:, :2]
+        distance = np.linalg.norm(delta, axis=1)
+        step = np.minimum(self.speeds * dt, np.maximum(distance - self.stop_distance, 0.0))
+        direction = np.divide(delta, distance[:, None], out=np.zeros_like(delta), where=distance[:, None] > 0.0)
+        self.positions[:, :2] += direction * step[:, None]
+        self.velocities[:, :2] = direction * (step / dt if dt > 0.0 else 0.0)[:, None]
+        moving = distance > 0.0
+        self.yaws[moving] = np.arctan2(delta[moving, 1], delta[moving, 0])
+
+
+class KinematicTracks:
+    """
+    Moves task-driven bodies (sliding gates, spinning targets, patrolling or
+    chasing obstacles). Each update advances every track with NumPy, computes
+    the world pose of every attached body in one pass and then writes the poses
+    back to the client.
+    """
+
+    def __init__(self, p):
+        self._p = p
+        self.tracks = []
+
+    def add(self, track):
+        self.tracks.append(track)
+        return track
+
+    def reset(self):
+        for track in self.tracks:
+            track.reset()
+
+    def clone_state(self):
+        return [track.clone_state() for track in self.tracks]
+
+    def restore_state(self, state):
+        for track, track_state in zip(self.tracks, state):
+            track.restore_state(track_state)
+
+    def update(self, time, dt):
+        for track in self.tracks:
+            track.advance(time, dt)
+        self.apply()
+
+    def apply(self):
+        for track in self.tracks:
+            if not track.attachments:
+                continue
+            anchor_indices, offsets = track.attachment_arrays()
+            yaws = track.yaws[anchor_indices]
+            cos, sin = np.cos(yaws), np.sin(yaws)
+            positions = track.positions[anchor_indices].copy()
+            positions[:, 0] += cos * offsets[:, 0] - sin * offsets[:, 1]
+            positions[:, 1] += sin * offsets[:, 0] + cos * offsets[:, 1]
+            positions[:, 2] += offsets[:, 2]
+            orientations = yaw_quaternions(yaws)
+            velocities = track.velocities[anchor_indices]
+            for (_, body_id, _), position, orientation, velocity in zip(track.attachments, positions.tolist(), orientations.tolist(), velocities.tolist()):
+                self._p.resetBasePositionAndOrientation(body_id, position, orientation)
+                if track.set_velocity:
+                    self._p.resetBaseVelocity(body_id, velocity, [0.0, 0.0, 0.0])
@@ -0,0 +1,100 @@
+"""
+Raycast range sensor for R2D2Env tasks.
+
+A Lidar casts a fixed fan of rays from the robot base with one rayTestBatch
+call per scan. Ray directions are tabulated once at construction; a scan only
+rotates the tables by the robot's heading and reads back the hit fractions:
+
+    Env = with_lidar(load_env_class(path), num_rays=64, max_range=15.0)
+    observation = Env(seed=0).reset()  # task observation followed by 64 ranges
+"""
+import math
+
+import numpy as np
+
+# rayTestBatch rejects larger batches.
+MAX_RAYS_PER_BATCH = 16384
+
+
+class Lidar:
+    """
+    `num_rays` rays per layer spread evenly over a horizontal `fov` (a full
+    circle by default) and `num_layers` layers spread over `vertical_fov`,
+    starting `min_range` from a point `height` above the base so they clear the
+    robot's own body. `scan()` returns float32 ranges in metres, `max_range`
+    where nothing was hit, ordered layer by layer. With `yaw_only=True` (the
+    default) the fan follows the robot's heading but stays level when the
+    robot pitches or rolls.
+    """
+
+    def __init__(self, p, num_rays=32, fov=2 * np.pi, num_layers=1, vertical_fov=0.0, min_range=0.3, max_range=10.0, height=0.0, yaw_only=True, num_threads=1):
+        if num_rays * num_layers > MAX_RAYS_PER_BATCH:
+            raise ValueError('A scan can cast at most {} rays, got {}'.format(MAX_RAYS_PER_BATCH, num_rays * num_layers))
+        self._p = p
+        self.num_rays = num_rays
+        self.num_layers = num_layers
+        self.min_range = float(min_range)
+        self.max_range = float(max_range)
+        self.yaw_only = yaw_only
+        self.num_threads = num_threads
+        full_circle = fov >= 2 * np.pi - 1e-9
+        azimuths = np.linspace(-fov / 2, fov / 2, num_rays, endpoint=not full_circle or num_rays == 1)
+        elevations = np.linspace(-vertical_fov / 2, vertical_fov / 2, num_layers) if num_layers > 1 else np.zeros(1)
+        elevation, azimuth = np.meshgrid(elevations, azimuths, indexing='ij')
+        self.directions = np.stack([np.cos(elevation) * np.cos(azimuth), np.cos(elevation) * np.sin(azimuth), np.sin(elevation)], axis=-1).reshape(-1, 3)
+        origin = np.array([0.0, 0.0, height])
+        self.local_starts = origin + self.min_range * self.directions
+        self.local_ends = origin + self.max_range * self.directions
+        self.low = np.full(len(self.directions), self.min_range, dtype=np.float32)
+        self.high = np.full(len(self.directions), self.max_range, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.directions)
+
+    def _rotation(self, orientation):
+        x, y, z, w = orientation
+        if self.yaw_only:
+            yaw = math.atan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+            cos, sin = math.cos(yaw), math.sin(yaw)
+            return np.array([[cos, -sin, 0.0], [sin, cos, 0.0], [0.0, 0.0, 1.0]])
+        return np.reshape(self._p.getMatrixFromQuaternion(orientation), (3, 3))
+
+    def scan(self, position, orientation):
+        """Ranges along every ray from a base at `position` with quaternion `orientation`."""
+        rotation_t = self._rotation(orientation).T
+        position = np.asarray(position, dtype=float)
+        starts = self.local_starts @ rotation_t + position
+        ends = self.local_ends @ rotation_t + position
+        results = self._p.rayTestBatch(starts.tolist(), ends.tolist(), numThreads=self.num_threads)
+        fractions = np.fromiter((result[2] for result in results), dtype=np.float32, count=len(results))
+        return self.min_range + (self.max_range - self.min_range) * fractions
+
+
+def with_lidar(env_cls, **lidar_kwargs):
+    """
+    Subclass of an R2D2Env task whose observations are the task's own
+    observation followed by a Lidar scan from the robot base, as one flat
+    float32 array. `lidar_kwargs` go to Lidar.
+    """
+    class LidarEnv(env_cls):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.lidar = Lidar(self._p, **lidar_kwargs)
+            space = getattr(self, 'observation_space', None)
+            if space is not None and hasattr(space, 'low'):
+                low = np.concatenate([np.asarray(space.low, dtype=np.float32).ravel(), self.lidar.low])
+                high = np.concatenate([np.asarray(space.high, dtype=np.float32).ravel(), self.lidar.high])
+                self.observation_space = type(space)(low=low, high=high, dtype=np.float32)
+
+        def reset(self, *args, **kwargs):
+            return self._with_scan(super().reset(*args, **kwargs))
+
+        def step(self, action):
+            observation, reward, terminated, truncated, info = super().step(action)
+            return (self._with_scan(observation), reward, terminated, truncated, info)
+
+        def _with_scan(self, observation):
+            base = self.robot.links['base']
+            return np.concatenate([np.asarray(observation, dtype=np.float32).ravel(), self.lidar.scan(base.position, base.orientation)])
+
+    return LidarEnv
@@ -0,0 +1,62 @@
+import ast
+import functools
+import hashlib
+import importlib.util
+import os
+import re
+
+ENVKIT_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV_CODES_DIR = os.path.dirname(ENVKIT_DIR)
+LONG_RUN_DIR = os.path.join(ENV_CODES_DIR, 'long_run')
+
+
+def task_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def task_paths(directory=LONG_RUN_DIR):
+    """Task files in `directory`, ordered by task number."""
+    def sort_key(filename):
+        match = re.search(r'(\d+)', filename)
+        return (int(match.group(1)) if match else -1, filename)
+    filenames = [filename for filename in os.listdir(directory) if filename.startswith('task_') and filename.endswith('.py')]
+    return [os.path.join(directory, filename) for filename in sorted(filenames, key=sort_key)]
+
+
+def source_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def envkit_hash():
+    """Hash of the envkit sources, for caches whose entries depend on the helpers as well as the task."""
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(ENVKIT_DIR)):
+        if filename.endswith('.py'):
+            digest.update(filename.encode())
+            with open(os.path.join(ENVKIT_DIR, filename), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def task_imports(path):
+    """Top-level modules a task file imports, without importing it."""
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def load_env_class(path, class_name='Env'):
+    """Imports a task file by path and returns its environment class."""
+    module_name = 'envkit_task_{}_{}'.format(task_name(path), source_hash(path)[:12])
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, class_name)
@@ -0,0 +1,138 @@
+"""
+Per-environment memory footprint of the long_run tasks.
+
+Each task is measured in its own spawned process: one environment is built
+and stepped to warm the process up, then `--envs` more are built and the
+growth of the process is divided among them. RSS counts every resident page;
+PSS splits pages shared with other processes (such as modules preloaded by a
+forkserver) between them, so it is what adds up across a node:
+
+    python -m envkit.memory --envs 16
+    python -m envkit.memory long_run/task_90.py --envs 32 --output memory.json
+
+The report separates the Python heap of the task objects (traced with
+tracemalloc) from the native memory of their physics clients. Tasks keep
+their per-step values in one StepValues array each (see envkit.state)
+rather than one NumPy object per value.
+"""
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import sys
+import traceback
+import tracemalloc
+
+import numpy as np
+
+from envkit.loader import load_env_class, task_name, task_paths
+
+# Imported by a VecEnv forkserver before it forks workers, so their pages are shared.
+PRELOAD_MODULES = ('numpy', 'pybullet', 'pybullet_data', 'pybullet_utils.bullet_client', 'envkit.contacts', 'envkit.evaluation', 'envkit.kinematics', 'envkit.loader', 'envkit.shapes', 'envkit.state', 'envkit.vec_env')
+
+
+def memory_usage(pid=None):
+    """Resident (rss), proportional (pss) and private memory of a process in MB; pss and private fall back to rss without smaps_rollup."""
+    pid = pid or os.getpid()
+    fields = {}
+    try:
+        with open('/proc/{}/smaps_rollup'.format(pid)) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024.0
+    except OSError:
+        with open('/proc/{}/statm'.format(pid)) as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+        return {'rss_mb': rss, 'pss_mb': rss, 'private_mb': rss}
+    return {'rss_mb': fields.get('Rss', 0.0), 'pss_mb': fields.get('Pss', 0.0), 'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)}
+
+
+def _build(env_class, seed, steps):
+    env = env_class(seed=seed)
+    env.reset()
+    action = np.zeros(getattr(env.action_space, 'shape', None) or (), dtype=getattr(env.action_space, 'dtype', np.float32))
+    for _ in range(steps):
+        env.step(action)
+    return env
+
+
+def measure_footprint(path, num_envs=8, seed=0, steps=10):
+    """Memory of the current process per additional environment of `path`, each reset and stepped `steps` times."""
+    env_class = load_env_class(path)
+    envs = [_build(env_class, seed, steps)]
+    gc.collect()
+    before = memory_usage()
+    tracemalloc.start()
+    envs.extend(_build(env_class, seed + i, steps) for i in range(1, num_envs + 1))
+    gc.collect()
+    python_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after = memory_usage()
+    for env in envs:
+        close = getattr(env, 'close', None)
+        if close is not None:
+            close()
+    return {
+        'task': task_name(path),
+        'envs': num_envs,
+        'process_mb': before['rss_mb'],
+        'rss_mb_per_env': (after['rss_mb'] - before['rss_mb']) / num_envs,
+        'pss_mb_per_env': (after['pss_mb'] - before['pss_mb']) / num_envs,
+        'python_kb_per_env': python_bytes / 1024.0 / num_envs,
+    }
+
+
+def _measure_worker(remote, path, num_envs, seed):
+    try:
+        remote.send(('ok', measure_footprint(path, num_envs, seed)))
+    except Exception:
+        remote.send(('error', traceback.format_exc()))
+    finally:
+        remote.close()
+
+
+def measure_in_subprocess(path, num_envs=8, seed=0):
+    context = mp.get_context('spawn')
+    remote, worker_remote = context.Pipe()
+    process = context.Process(target=_measure_worker, args=(worker_remote, path, num_envs, seed), daemon=True)
+    process.start()
+    worker_remote.close()
+    try:
+        tag, data = remote.recv()
+    except EOFError:
+        tag, data = 'error', 'worker exited with code {}'.format(process.exitcode)
+    process.join()
+    if tag == 'error':
+        return {'task': task_name(path), 'error': data}
+    return data
+
+
+def format_table(results):
+    lines = ['{:<12} {:>10} {:>10} {:>10} {:>12}'.format('task', 'process MB', 'RSS MB/env', 'PSS MB/env', 'Python KB/env')]
+    for result in results:
+        if 'error' in result:
+            lines.append('{:<12} FAILED: {}'.format(result['task'], result['error'].strip().splitlines()[-1]))
+            continue
+        lines.append('{:<12} {:>10.1f} {:>10.2f} {:>10.2f} {:>12.1f}'.format(result['task'], result['process_mb'], result['rss_mb_per_env'], result['pss_mb_per_env'], result['python_kb_per_env']))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the memory footprint of each environment of the long_run tasks.')
+    parser.add_argument('paths', nargs='*', help='task files (default: every task in long_run)')
+    parser.add_argument('--envs', type=int, default=8, help='environments to build per task')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON')
+    args = parser.parse_args(argv)
+    results = [measure_in_subprocess(path, args.envs, args.seed) for path in (args.paths or task_paths())]
+    print(format_table(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if all('error' not in result for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,630 @@
+"""
+Asyncio Socket.IO play server for human players.
+
+Every connected client gets its own environment. Environments live in a pool
+of worker processes, each hosting many sessions, so a slow step only holds up
+the sessions on the same worker. Each worker is driven by its own fixed-rate
+tick loop that sends one batched step command per tick for all of its
+sessions. Spare workers build the next level of a session ahead of time and
+take the session over when it gets there:
+
+    python -m envkit.play_server --port 5000 --workers 8 --access-codes codes.txt
+
+The events match the web client (src/app/KeyIdentifier.tsx): clients emit
+`action`, `reset`, `next_level`, `prev_level`, `mark_success`, `mark_failure`
+and `access_code`, and receive `env_description`, `level_complete`,
+`next_level`, `generating_next_level`, `reset_message`, `access_granted` and
+`success_marked` / `failure_marked`. A client that emits `frames` with
+`{enabled: true}` also receives JPEG frames as `frame` events. When its
+environment fails to build or step, a client receives `env_error` with a
+`message`; its level is paused until it emits `reset`, which rebuilds it.
+
+Requires python-socketio and aiohttp, plus Pillow for frames.
+"""
+import argparse
+import asyncio
+import inspect
+import io
+import logging
+import multiprocessing as mp
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from envkit.loader import task_name, task_paths
+from envkit.prefetch import LevelPrefetcher, build_env, close_env
+
+logger = logging.getLogger(__name__)
+
+IDLE_ACTION = 0
+
+
+def render_frame(env, width, height, quality, distance=4.0, pitch=-30.0, fov=60.0):
+    """JPEG bytes of a small chase-camera view of the robot, rendered on the CPU."""
+    from PIL import Image
+    p = env._p
+    base = env.robot.links['base']
+    yaw = np.degrees(p.getEulerFromQuaternion(base.orientation)[2]) - 90.0
+    view = p.computeViewMatrixFromYawPitchRoll(cameraTargetPosition=list(base.position), distance=distance, yaw=yaw, pitch=pitch, roll=0.0, upAxisIndex=2)
+    projection = p.computeProjectionMatrixFOV(fov=fov, aspect=width / height, nearVal=0.1, farVal=100.0)
+    _, _, rgba, _, _ = p.getCameraImage(width, height, viewMatrix=view, projectionMatrix=projection, renderer=p.ER_TINY_RENDERER)
+    rgb = np.reshape(np.asarray(rgba, dtype=np.uint8), (height, width, 4))[:, :, :3]
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def _worker(remote):
+    envs = {}
+    prefetcher = LevelPrefetcher()
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == 'close':
+                break
+            try:
+                remote.send(('ok', _run_command(envs, prefetcher, command, data)))
+            except Exception:
+                remote.send(('error', traceback.format_exc()))
+    finally:
+        prefetcher.close()
+        for env in envs.values():
+            close_env(env)
+        remote.close()
+
+
+def _run_command(envs, prefetcher, command, data):
+    if command in ('open', 'adopt'):
+        # 'adopt' takes over a level this process prefetched under `token` and only builds it if that is gone or stale.
+        token, session, path, seed = data
+        env = prefetcher.take(token, path, seed) if command == 'adopt' else None
+        if env is None:
+            env = build_env(path, seed)
+        if session in envs:
+            close_env(envs.pop(session))
+        envs[session] = env
+        return inspect.cleandoc(type(env).__doc__ or '')
+    if command == 'prefetch':
+        token, path, seed = data
+        prefetcher.prefetch(token, path, seed)
+        return None
+    if command == 'discard':
+        prefetcher.discard(data)
+        return None
+    if command == 'reset':
+        envs[data].reset()
+        return None
+    if command == 'step':
+        actions, render, frame_size, quality = data
+        results = {}
+        for session, action in actions.items():
+            try:
+                env = envs[session]
+                _, reward, terminated, truncated, info = env.step(action)
+                success = bool(info.get('success', False)) if isinstance(info, dict) else False
+                if terminated or truncated:
+                    env.reset()
+                frame = render_frame(env, frame_size[0], frame_size[1], quality) if session in render else None
+                results[session] = (float(reward), bool(terminated or truncated), success, frame, None)
+            except Exception:
+                # One broken session must not stop the others on this worker.
+                results[session] = (0.0, False, False, None, traceback.format_exc())
+        return results
+    if command == 'close_session':
+        if data in envs:
+            close_env(envs.pop(data))
+        return None
+    raise ValueError('Unknown command: {}'.format(command))
+
+
+class Worker:
+    """One environment process. Commands are sent one at a time from a dedicated thread, so waiting never blocks the event loop."""
+
+    def __init__(self, context, index):
+        self.index = index
+        self.sessions = {}
+        self.prefetching = set()
+        self._context = context
+        self._start()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='play-worker-{}'.format(index))
+        self._lock = asyncio.Lock()
+
+    @property
+    def spare(self):
+        """True while the process steps no session and builds nothing, so a build there holds nobody up."""
+        return not self.sessions and not self.prefetching
+
+    def _start(self):
+        self._remote, worker_remote = self._context.Pipe()
+        self._process = self._context.Process(target=_worker, args=(worker_remote,), daemon=True)
+        self._process.start()
+        worker_remote.close()
+
+    def restart(self):
+        """Replaces a process that exited. Its environments are gone, so its sessions must open their levels again."""
+        self._remote.close()
+        self._process.join(timeout=1)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._start()
+
+    def _roundtrip(self, command, data):
+        self._remote.send((command, data))
+        tag, result = self._remote.recv()
+        if tag == 'error':
+            raise RuntimeError('Play worker {} failed to {}:\n{}'.format(self.index, command, result))
+        return result
+
+    async def call(self, command, data=None):
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._roundtrip, command, data)
+
+    def close(self):
+        try:
+            self._remote.send(('close', None))
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._remote.close()
+        self._executor.shutdown(wait=False)
+
+
+class PlaySession:
+    """
+    State of one connected client. Key events between two ticks are coalesced:
+    the latest action is applied on the next tick and held for `hold_ticks`
+    ticks, which bridges the gap before the keyboard's auto-repeat starts.
+    """
+
+    def __init__(self, sid, worker, level, seed):
+        self.sid = sid
+        self.worker = worker
+        self.level = level
+        self.seed = seed
+        self.ready = False
+        self.granted = False
+        self.lock = asyncio.Lock()
+        self.action = IDLE_ACTION
+        self.hold = 0
+        self.frames = False
+        self.frame_sent_at = None
+        self.prefetch = None
+
+    def push(self, action, hold_ticks):
+        self.action = action
+        self.hold = hold_ticks
+
+    def take_action(self):
+        if self.hold <= 0:
+            return IDLE_ACTION
+        self.hold -= 1
+        return self.action
+
+
+class PlayServer:
+    """
+    Sessions, workers and tick loops behind a socketio.AsyncServer `sio`.
+
+    Levels are the task files in `levels` (all long_run tasks by default).
+    `action_fn` maps a client key code (1-5, 0 when idle) to the action passed
+    to `env.step`; by default the key code is passed through. Frames are
+    rendered at most `frame_rate` times per second at `frame_size`, and a
+    session gets no new frame until the client acknowledges the previous one
+    (or `frame_timeout` passes), so slow connections receive fewer frames
+    instead of a growing backlog.
+
+    With `prefetch` (the default) the level after a session's current one is
+    built by a spare worker, a process stepping no session (up to
+    `spare_workers` are started next to the `num_workers` regular ones).
+    When the session opens that level and the build has finished, the session
+    moves to the spare worker, so the change costs no build at all; otherwise
+    the level is built on the session's own worker as before and the miss is
+    logged and counted in `prefetch_misses`. Nothing waits for a prefetch.
+
+    A session's actions are ignored until it sends a valid access code.
+    `access_codes` is a collection of valid codes or a function of a code
+    returning whether it is valid (see `codes_from_file`). With no codes every
+    code is refused; `open_access=True` lets every session play without one.
+    """
+
+    def __init__(self, sio, levels=None, num_workers=None, tick_rate=30.0, hold_ticks=4, frame_rate=10.0, frame_size=(160, 120), jpeg_quality=70, frame_timeout=1.0, action_fn=None, seed=None, prefetch=True, spare_workers=1, access_codes=None, open_access=False, start_method='spawn'):
+        self.sio = sio
+        self.levels = list(levels or task_paths())
+        self.num_workers = num_workers or os.cpu_count()
+        self.tick_rate = tick_rate
+        self.hold_ticks = hold_ticks
+        self.frame_interval = max(int(round(tick_rate / frame_rate)), 1)
+        self.frame_size = tuple(frame_size)
+        self.jpeg_quality = jpeg_quality
+        self.frame_timeout = frame_timeout
+        self.action_fn = action_fn
+        self.seed = seed
+        self.prefetch = prefetch
+        self.spare_workers = spare_workers
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+        self.access_codes = access_codes
+        self.open_access = open_access
+        self.start_method = start_method
+        self.sessions = {}
+        self.marks = []
+        self.workers = []
+        self._tasks = []
+        self._session_count = 0
+        self._prefetch_count = 0
+        self._context = None
+
+    async def start(self):
+        self._context = mp.get_context(self.start_method)
+        for _ in range(self.num_workers):
+            self._add_worker()
+
+    def _add_worker(self):
+        worker = Worker(self._context, len(self.workers))
+        self.workers.append(worker)
+        self._tasks.append(asyncio.ensure_future(self._tick_loop(worker)))
+        return worker
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for worker in self.workers:
+            worker.close()
+        self._tasks = []
+        self.workers = []
+        self.sessions = {}
+
+    def attach(self):
+        """Registers the client event handlers on `sio`."""
+        handlers = {
+            'connect': self.on_connect,
+            'disconnect': self.on_disconnect,
+            'action': self.on_action,
+            'reset': self.on_reset,
+            'next_level': self.on_next_level,
+            'prev_level': self.on_prev_level,
+            'mark_success': self.on_mark_success,
+            'mark_failure': self.on_mark_failure,
+            'access_code': self.on_access_code,
+            'frames': self.on_frames,
+        }
+        for event, handler in handlers.items():
+            self.sio.on(event, handler)
+
+    async def _tick_loop(self, worker):
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.tick_rate
+        tick = 0
+        next_tick = loop.time()
+        while True:
+            sessions = [session for session in worker.sessions.values() if session.ready]
+            if sessions:
+                actions = {session.sid: self._action(session.take_action()) for session in sessions}
+                render = [session.sid for session in sessions if self._wants_frame(session, tick)]
+                try:
+                    results = await worker.call('step', (actions, render, self.frame_size, self.jpeg_quality))
+                except (EOFError, OSError):
+                    logger.exception('Play worker %d exited, restarting it', worker.index)
+                    worker.restart()
+                    for session in list(worker.sessions.values()):
+                        await self._fail(session, 'The level stopped unexpectedly. Press reset to load it again.')
+                    results = {}
+                except Exception:
+                    # Failures of single sessions come back in the results; this is the step command as a whole.
+                    logger.exception('Play worker %d failed to step', worker.index)
+                    for session in sessions:
+                        await self._fail(session, 'The level failed to step. Press reset to load it again.')
+                    results = {}
+                for sid, result in results.items():
+                    await self._deliver(sid, result)
+            tick += 1
+            next_tick += period
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # Behind schedule: drop the missed ticks instead of stepping in a burst.
+                next_tick = loop.time()
+            await asyncio.sleep(max(delay, 0.0))
+
+    def _action(self, key):
+        return key if self.action_fn is None else self.action_fn(key)
+
+    def _wants_frame(self, session, tick):
+        if not session.frames or tick % self.frame_interval:
+            return False
+        return session.frame_sent_at is None or time.monotonic() - session.frame_sent_at > self.frame_timeout
+
+    async def _deliver(self, sid, result):
+        session = self.sessions.get(sid)
+        if session is None:
+            return
+        reward, done, success, frame, error = result
+        if error is not None:
+            logger.error('Session %s failed to step:\n%s', sid, error)
+            await self._fail(session, 'The level failed to step. Press reset to load it again.')
+            return
+        if success:
+            await self.sio.emit('level_complete', to=sid)
+        if done:
+            await self.sio.emit('reset_message', to=sid)
+        if frame is not None:
+            session.frame_sent_at = time.monotonic()
+            await self.sio.emit('frame', frame, to=sid, callback=lambda *_: self._frame_acknowledged(sid))
+
+    def _frame_acknowledged(self, sid):
+        session = self.sessions.get(sid)
+        if session is not None:
+            session.frame_sent_at = None
+
+    async def _fail(self, session, message):
+        """Pauses a session whose environment failed and tells its client."""
+        session.ready = False
+        await self.sio.emit('env_error', {'message': message}, to=session.sid)
+
+    async def _open(self, session):
+        """Builds the session's current level, or adopts it from a finished prefetch; returns whether it succeeded."""
+        session.ready = False
+        path = self.levels[session.level]
+        prefetch = session.prefetch
+        try:
+            if prefetch is not None and prefetch[1] == path:
+                session.prefetch = None
+                future = prefetch[3]
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    description = await self._adopt(session, prefetch)
+                else:
+                    self._discard_prefetch(prefetch)
+                    self.prefetch_misses += 1
+                    logger.info('Session %s: %s was not prefetched in time, building it on worker %d', session.sid, task_name(path), session.worker.index)
+                    description = await session.worker.call('open', (None, session.sid, path, session.seed))
+            else:
+                description = await session.worker.call('open', (None, session.sid, path, session.seed))
+        except Exception:
+            logger.exception('Session %s failed to open %s', session.sid, task_name(path))
+            await self._fail(session, 'The level failed to load. Press reset to try again.')
+            return False
+        session.ready = True
+        await self.sio.emit('env_description', {'description': description}, to=session.sid)
+        self._start_prefetch(session)
+        return True
+
+    async def _adopt(self, session, prefetch):
+        """Moves `session` to the worker that prefetched its level."""
+        worker, path, token, _ = prefetch
+        old_worker = session.worker
+        old_worker.sessions.pop(session.sid, None)
+        try:
+            await old_worker.call('close_session', session.sid)
+        except Exception:
+            logger.exception('Session %s failed to close on worker %d', session.sid, old_worker.index)
+        session.worker = worker
+        worker.sessions[session.sid] = session
+        try:
+            description = await worker.call('adopt', (token, session.sid, path, session.seed))
+        finally:
+            worker.prefetching.discard(token)
+        self.prefetch_hits += 1
+        return description
+
+    def _spare_worker(self):
+        for worker in self.workers:
+            if worker.spare:
+                return worker
+        if len(self.workers) < self.num_workers + self.spare_workers:
+            return self._add_worker()
+        return None
+
+    def _start_prefetch(self, session):
+        """Has a spare worker build the level after the session's current one, keeping a prefetch of it that is already under way."""
+        path = self.levels[session.level + 1] if self.prefetch and session.level + 1 < len(self.levels) else None
+        if session.prefetch is not None:
+            if session.prefetch[1] == path:
+                return
+            self._discard_prefetch(session.prefetch)
+            session.prefetch = None
+        if path is None:
+            return
+        worker = self._spare_worker()
+        if worker is None:
+            logger.info('Session %s: no spare worker, %s will be built when it is opened', session.sid, task_name(path))
+            return
+        self._prefetch_count += 1
+        token = '{}/{}'.format(session.sid, self._prefetch_count)
+        worker.prefetching.add(token)
+        future = asyncio.ensure_future(worker.call('prefetch', (token, path, session.seed)))
+        future.add_done_callback(lambda future: self._prefetch_done(session.sid, path, future))
+        session.prefetch = (worker, path, token, future)
+
+    def _prefetch_done(self, sid, path, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error('Session %s failed to prefetch %s: %s', sid, task_name(path), future.exception())
+
+    def _discard_prefetch(self, prefetch):
+        asyncio.ensure_future(self._drop_prefetch(*prefetch))
+
+    async def _drop_prefetch(self, worker, path, token, future):
+        try:
+            await asyncio.wait([future])
+            if worker in self.workers:
+                await worker.call('discard', token)
+        except Exception:
+            logger.exception('Failed to discard the prefetched %s on worker %d', task_name(path), worker.index)
+        finally:
+            worker.prefetching.discard(token)
+
+    async def on_connect(self, sid, environ, auth=None):
+        # Workers busy with a prefetch build come last, so the new session is not held up by it.
+        worker = min(self.workers, key=lambda worker: (bool(worker.prefetching), len(worker.sessions)))
+        seed = None if self.seed is None else self.seed + self._session_count
+        self._session_count += 1
+        session = self.sessions[sid] = PlaySession(sid, worker, 0, seed)
+        session.granted = self.open_access
+        worker.sessions[sid] = session
+        async with session.lock:
+            await self._open(session)
+
+    async def on_disconnect(self, sid):
+        session = self.sessions.pop(sid, None)
+        if session is None:
+            return
+        session.worker.sessions.pop(sid, None)
+        if session.prefetch is not None:
+            self._discard_prefetch(session.prefetch)
+            session.prefetch = None
+        async with session.lock:
+            try:
+                await session.worker.call('close_session', sid)
+            except Exception:
+                logger.exception('Session %s failed to close', sid)
+
+    async def on_action(self, sid, data):
+        session = self.sessions.get(sid)
+        if session is None or not session.granted:
+            return
+        try:
+            key = int(data['action'] if isinstance(data, dict) else data)
+        except (KeyError, TypeError, ValueError):
+            return
+        session.push(key, self.hold_ticks)
+
+    async def on_reset(self, sid, data=None):
+        session = self.sessions.get(sid)
+        if session is None:
+            return
+        async with session.lock:
+            if session.ready:
+                try:
+                    await session.worker.call('reset', sid)
+                except Exception:
+                    logger.exception('Session %s failed to reset', sid)
+                    await self._fail(session, 'The level failed to reset. Press reset to load it again.')
+                    return
+            elif not await self._open(session):
+                return
+            await self.sio.emit('reset_message', to=sid)
+
+    async def _change_level(self, sid, offset):
+        session = self.sessions.get(sid)
+        if session is None:
+            return
+        async with session.lock:
+            session.level = min(max(session.level + offset, 0), len(self.levels) - 1)
+            await self.sio.emit('generating_next_level', {'generating': True}, to=sid)
+            try:
+                opened = await self._open(session)
+            finally:
+                await self.sio.emit('generating_next_level', {'generating': False}, to=sid)
+            if opened:
+                await self.sio.emit('next_level', to=sid)
+
+    async def on_next_level(self, sid, data=None):
+        await self._change_level(sid, 1)
+
+    async def on_prev_level(self, sid, data=None):
+        await self._change_level(sid, -1)
+
+    async def _mark(self, sid, success):
+        session = self.sessions.get(sid)
+        if session is None:
+            return
+        self.marks.append({'sid': sid, 'task': task_name(self.levels[session.level]), 'success': success, 'time': time.time()})
+        logger.info('Session %s marked %s as %s', sid, task_name(self.levels[session.level]), 'success' if success else 'failure')
+        await self.sio.emit('success_marked' if success else 'failure_marked', to=sid)
+
+    async def on_mark_success(self, sid, data=None):
+        await self._mark(sid, True)
+
+    async def on_mark_failure(self, sid, data=None):
+        await self._mark(sid, False)
+
+    def check_access(self, code):
+        if self.open_access:
+            return True
+        if self.access_codes is None or not isinstance(code, str) or not code.strip():
+            return False
+        if callable(self.access_codes):
+            return bool(self.access_codes(code.strip()))
+        return code.strip() in self.access_codes
+
+    async def on_access_code(self, sid, data=None):
+        session = self.sessions.get(sid)
+        if session is None:
+            return
+        code = data.get('code') if isinstance(data, dict) else data
+        try:
+            granted = self.check_access(code)
+        except Exception:
+            logger.exception('Checking the access code of session %s failed', sid)
+            granted = False
+        session.granted = session.granted or granted
+        logger.info('Session %s %s access', sid, 'was granted' if granted else 'was refused')
+        await self.sio.emit('access_granted', {'granted': granted}, to=sid)
+
+    async def on_frames(self, sid, data=None):
+        session = self.sessions.get(sid)
+        if session is not None:
+            session.frames = bool(data.get('enabled', True)) if isinstance(data, dict) else True
+            session.frame_sent_at = None
+
+
+def codes_from_file(path):
+    """Access-code check against a file of one code per line, re-read on every attempt so codes can be added while the server runs."""
+    def check(code):
+        try:
+            with open(path) as f:
+                return code in {line.strip() for line in f if line.strip()}
+        except OSError:
+            logger.exception('Cannot read access codes from %s', path)
+            return False
+    return check
+
+
+def create_app(cors_allowed_origins='*', **server_kwargs):
+    """aiohttp application serving the play server; `server_kwargs` go to PlayServer."""
+    import socketio
+    from aiohttp import web
+    sio = socketio.AsyncServer(async_mode='aiohttp', cors_allowed_origins=cors_allowed_origins)
+    app = web.Application()
+    sio.attach(app)
+    server = PlayServer(sio, **server_kwargs)
+    server.attach()
+
+    async def on_startup(app):
+        await server.start()
+
+    async def on_cleanup(app):
+        await server.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app['play_server'] = server
+    return app
+
+
+def main(argv=None):
+    from aiohttp import web
+    parser = argparse.ArgumentParser(description='Serve long_run tasks to human players over Socket.IO.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None, help='environment processes (default: one per CPU)')
+    parser.add_argument('--tick-rate', type=float, default=30.0)
+    parser.add_argument('--frame-rate', type=float, default=10.0)
+    parser.add_argument('--frame-size', type=int, nargs=2, default=[160, 120], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--seed', type=int, default=None)
+    access = parser.add_mutually_exclusive_group(required=True)
+    access.add_argument('--access-codes', metavar='FILE', help='file of valid access codes, one per line')
+    access.add_argument('--open-access', action='store_true', help='let every client play without an access code')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    access_codes = codes_from_file(args.access_codes) if args.access_codes else None
+    app = create_app(num_workers=args.workers, tick_rate=args.tick_rate, frame_rate=args.frame_rate, frame_size=args.frame_size, seed=args.seed, access_codes=access_codes, open_access=args.open_access)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
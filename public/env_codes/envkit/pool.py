@@ -0,0 +1,114 @@
+class BodyPool:
+    """
+    Fixed set of identical bodies for tasks that spawn and despawn objects.
+
+    All bodies are created up front in one batched call and parked below the
+    world with collisions disabled and zero mass, so they cost nothing in the
+    simulation. `acquire()` moves a parked body into place, restores its mass and
+    collisions and optionally recolors it; `release()` parks it again. Body ids
+    never change, so per-step cost does not depend on the spawn rate.
+
+    When every body is in use, `acquire()` creates `grow` more in one batched
+    call (with `grow=0` it returns None instead). Growing adds bodies to the
+    world, so physics states saved before it (ResetSnapshot, clones) no longer
+    apply; `grown` counts the growths.
+    """
+
+    def __init__(self, p, shapes, shape_type, dimensions, mass, size, color=(1.0, 1.0, 1.0, 1.0), park_position=(0.0, 0.0, -100.0), park_spacing=2.0, grow=0):
+        self._p = p
+        self.shapes = shapes
+        self.shape_type = shape_type
+        self.dimensions = list(dimensions)
+        self.mass = mass
+        self.color = list(color)
+        self.park_position = list(park_position)
+        self.park_spacing = park_spacing
+        self.grow = grow
+        self.grown = 0
+        self.park_positions = []
+        self.body_ids = []
+        self._park_index = {}
+        self.active = []
+        self.colors = {}
+        self._free = []
+        self._add(size)
+
+    def _add(self, count):
+        start = len(self.body_ids)
+        positions = [[self.park_position[0] + i * self.park_spacing, self.park_position[1], self.park_position[2]] for i in range(start, start + count)]
+        body_ids = self.shapes.create_bodies(self.shape_type, self.dimensions, self.mass, positions, self.color)
+        self.park_positions.extend(positions)
+        for i, body_id in enumerate(body_ids):
+            self._park_index[body_id] = start + i
+        self.body_ids.extend(body_ids)
+        for body_id in reversed(body_ids):
+            self._park(body_id)
+            self._free.append(body_id)
+
+    def __len__(self):
+        return len(self.active)
+
+    @property
+    def capacity(self):
+        return len(self.body_ids)
+
+    def _park(self, body_id):
+        self._p.resetBaseVelocity(body_id, [0.0, 0.0, 0.0], [0.0, 0.0, 0.0])
+        self._p.resetBasePositionAndOrientation(body_id, self.park_positions[self._park_index[body_id]], [0.0, 0.0, 0.0, 1.0])
+        self._p.changeDynamics(body_id, -1, mass=0.0)
+        self._p.setCollisionFilterGroupMask(body_id, -1, 0, 0)
+
+    def acquire(self, position, orientation=None, color=None):
+        """Activates a parked body at `position`. Returns None when the pool is exhausted and may not grow."""
+        if not self._free:
+            if not self.grow:
+                return None
+            self._add(self.grow)
+            self.grown += 1
+        body_id = self._free.pop()
+        self._p.resetBasePositionAndOrientation(body_id, position, orientation if orientation is not None else [0.0, 0.0, 0.0, 1.0])
+        self._p.changeDynamics(body_id, -1, mass=self.mass)
+        self._p.setCollisionFilterGroupMask(body_id, -1, 1, -1)
+        if color is not None:
+            self._p.changeVisualShape(body_id, -1, rgbaColor=color)
+            self.colors[body_id] = color
+        self.active.append(body_id)
+        return body_id
+
+    def release(self, body_id):
+        self.active.remove(body_id)
+        self._park(body_id)
+        self._free.append(body_id)
+
+    def release_all(self):
+        for body_id in list(self.active):
+            self.release(body_id)
+
+    def clone_state(self):
+        return (list(self.active), list(self._free), dict(self.colors))
+
+    def restore_state(self, state):
+        """
+        Returns the pool to a `clone_state()`. Only mass, collisions and colour
+        are reapplied; body poses are part of the physics state and must be
+        restored with it. `active` is updated in place.
+        """
+        active, free, colors = state
+        was_active = set(self.active)
+        for body_id in active:
+            if body_id not in was_active:
+                self._p.changeDynamics(body_id, -1, mass=self.mass)
+                self._p.setCollisionFilterGroupMask(body_id, -1, 1, -1)
+        now_active = set(active)
+        for body_id in was_active - now_active:
+            self._p.changeDynamics(body_id, -1, mass=0.0)
+            self._p.setCollisionFilterGroupMask(body_id, -1, 0, 0)
+        for body_id, color in colors.items():
+            if self.colors.get(body_id) != color:
+                self._p.changeVisualShape(body_id, -1, rgbaColor=color)
+        self.active[:] = active
+        self._free[:] = free
+        self.colors = dict(colors)
+
+    def is_active(self, body_id):
+        return body_id in self.active
@@ -0,0 +1,87 @@
+"""
+Construction of the level a player is likely to open next, ahead of time.
+
+Building a long_run environment (loading the task, creating the world,
+resetting it) takes long enough to stall a level change. A PyBullet world
+cannot move between processes, and a build on a thread would compete for the
+GIL with the process's other environments, so a LevelPrefetcher is meant for a
+process that steps nothing while it builds: the play server sends the next
+level to a spare worker process and, once the build has finished, moves the
+session to that process instead of moving the environment:
+
+    prefetcher = LevelPrefetcher()
+    prefetcher.prefetch(session, next_path, seed)      # in the spare process
+    ...
+    env = prefetcher.take(session, path, seed) or build_env(path, seed)
+"""
+from envkit.loader import load_env_class, source_hash
+
+
+def build_env(path, seed=None):
+    """Loads a task file, constructs its Env and resets it."""
+    env = load_env_class(path)(seed=seed)
+    env.reset()
+    return env
+
+
+def close_env(env):
+    close = getattr(env, 'close', None)
+    if close is not None:
+        close()
+
+
+class LevelPrefetcher:
+    """
+    At most one prebuilt environment per key (a session). `prefetch()` builds
+    in the calling process before it returns; `take()` never waits, and hands
+    the environment over only if it was built from the same task path, source
+    hash and seed, so an edited task file is never handed out stale. A
+    mismatching `take()`, a new `prefetch()` and `discard()` close the
+    prebuilt environment.
+    """
+
+    def __init__(self, build=build_env):
+        self.build = build
+        self.hits = 0
+        self.misses = 0
+        self._envs = {}
+
+    def __contains__(self, key):
+        return key in self._envs
+
+    def _source(self, path):
+        try:
+            return (path, source_hash(path))
+        except OSError:
+            return None
+
+    def prefetch(self, key, path, seed=None):
+        """Builds `path` for `key` unless the same level is already built; build errors propagate."""
+        source = self._source(path)
+        current = self._envs.get(key)
+        if current is not None and source is not None and current[0] == source and current[1] == seed:
+            return
+        self.discard(key)
+        if source is None:
+            return
+        self._envs[key] = (source, seed, self.build(path, seed))
+
+    def take(self, key, path, seed=None):
+        """The prebuilt environment for `key` if it matches `path` and `seed`, otherwise None."""
+        entry = self._envs.pop(key, None)
+        if entry is not None and entry[0] == self._source(path) and entry[1] == seed:
+            self.hits += 1
+            return entry[2]
+        if entry is not None:
+            close_env(entry[2])
+        self.misses += 1
+        return None
+
+    def discard(self, key):
+        entry = self._envs.pop(key, None)
+        if entry is not None:
+            close_env(entry[2])
+
+    def close(self):
+        for key in list(self._envs):
+            self.discard(key)
@@ -0,0 +1,136 @@
+import json
+import time
+
+import pybullet
+
+ENV_METHODS = ('step', 'get_task_rewards', 'get_terminated', 'get_success')
+CLIENT_METHODS = ('stepSimulation',)
+# BulletClient.__getattr__ marks the client as disconnected when 'disconnect' is looked up.
+UNCOUNTED_API = ('connect', 'disconnect')
+_MISSING = object()
+
+
+class SectionStats:
+    __slots__ = ('calls', 'total_ns', 'api_calls')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.api_calls = 0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'total_ns': self.total_ns, 'mean_ns': self.total_ns // self.calls if self.calls else 0, 'api_calls': self.api_calls}
+
+
+class Profiler:
+    """
+    Low-overhead timers and counters on an environment's task methods.
+
+    Each wrapped method (step, get_task_rewards, get_terminated, get_success by
+    default, plus stepSimulation on the physics client) becomes a section that
+    records its call count and total time in nanoseconds. API counting is
+    opt-in because it wraps every client method: with `count_api_calls=True`
+    every PyBullet call made through the env's client is counted against all
+    sections active at the time, so the count for `step` includes the calls
+    made by the reward functions it runs. Statistics are closed into a
+    per-episode summary on every reset.
+    """
+
+    def __init__(self, env, methods=ENV_METHODS, client_methods=CLIENT_METHODS, count_api_calls=False):
+        self.env = env
+        self.episodes = []
+        self._sections = {}
+        self._active = []
+        self._patched = []
+        self._episode_start_ns = time.perf_counter_ns()
+        client = env._p
+        if count_api_calls:
+            for name in dir(pybullet):
+                if name.startswith('_') or name in client_methods or name in UNCOUNTED_API or not callable(getattr(pybullet, name)):
+                    continue
+                function = getattr(client, name, None)
+                if callable(function):
+                    self._patch(client, name, self._counted(function))
+        for name in client_methods:
+            method = getattr(client, name)
+            self._patch(client, name, self._timed(name, self._counted(method) if count_api_calls else method))
+        for name in methods:
+            self._patch(env, name, self._timed(name, getattr(env, name)))
+        self._patch(env, 'reset', self._resetting(getattr(env, 'reset')))
+
+    def _patch(self, owner, name, wrapper):
+        self._patched.append((owner, name, vars(owner).get(name, _MISSING)))
+        setattr(owner, name, wrapper)
+
+    def _section(self, name):
+        section = self._sections.get(name)
+        if section is None:
+            section = self._sections[name] = SectionStats()
+        return section
+
+    def _timed(self, name, method):
+        active = self._active
+
+        def wrapper(*args, **kwargs):
+            section = self._section(name)
+            active.append(section)
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                section.total_ns += time.perf_counter_ns() - start
+                section.calls += 1
+                active.pop()
+        return wrapper
+
+    def _counted(self, function):
+        active = self._active
+
+        def wrapper(*args, **kwargs):
+            for section in active:
+                section.api_calls += 1
+            return function(*args, **kwargs)
+        return wrapper
+
+    def _resetting(self, reset):
+        def wrapper(*args, **kwargs):
+            self.end_episode()
+            return reset(*args, **kwargs)
+        return wrapper
+
+    def end_episode(self):
+        """Closes the current episode and returns its summary, or None if nothing was recorded."""
+        now = time.perf_counter_ns()
+        if not self._sections:
+            self._episode_start_ns = now
+            return None
+        summary = {'wall_ns': now - self._episode_start_ns, 'sections': {name: section.as_dict() for name, section in self._sections.items()}}
+        self.episodes.append(summary)
+        self._sections = {}
+        self._episode_start_ns = now
+        return summary
+
+    def summary(self):
+        """Totals over all closed episodes."""
+        totals = {}
+        for episode in self.episodes:
+            for name, section in episode['sections'].items():
+                total = totals.setdefault(name, {'calls': 0, 'total_ns': 0, 'api_calls': 0})
+                for key in total:
+                    total[key] += section[key]
+        for total in totals.values():
+            total['mean_ns'] = total['total_ns'] // total['calls'] if total['calls'] else 0
+        return {'episodes': len(self.episodes), 'sections': totals}
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump({'summary': self.summary(), 'episodes': self.episodes}, f, indent=2)
+
+    def detach(self):
+        self.end_episode()
+        for owner, name, previous in reversed(self._patched):
+            if previous is _MISSING:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, previous)
+        self._patched = []
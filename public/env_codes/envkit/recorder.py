@@ -0,0 +1,272 @@
+"""
+Streaming columnar trajectory recorder.
+
+A recording directory holds one sub-directory per shard with one .npy file per
+column, plus `metadata.json` (columns, shapes, dtypes, reward component names)
+and `episodes.npy` / `shards.npy` indexes. Shards can be opened memory-mapped,
+so reading one episode touches only its rows:
+
+    recorder = TrajectoryRecorder(env, 'runs/task_84')
+    ...  # reset / step as usual
+    recorder.close()
+    episode = TrajectoryReader('runs/task_84').episode(3)
+"""
+import functools
+import json
+import os
+import queue
+import tempfile
+import threading
+
+import numpy as np
+import pybullet
+
+TRACKED_OBJECT_ATTRIBUTES = ('ball_id', 'target_object_id', 'opponent_id')
+_MISSING = object()
+
+
+def _write_atomic(path, write):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class TrajectoryRecorder:
+    """
+    Records every step of `env` into `directory`: episode and step counters, the
+    robot base pose, the poses of `object_ids` (by default whichever of
+    TRACKED_OBJECT_ATTRIBUTES the env has), the action, the total reward, each
+    component returned by `get_task_rewards`, and the done and success flags.
+
+    Rows go into preallocated chunks of `chunk_size` rows, staged as one int and
+    one float array. A full chunk is handed to a writer thread, which splits it
+    into columns and saves them as a shard while stepping continues in one of
+    the other `num_buffers` chunks; the stepping thread only blocks when every
+    chunk is waiting to be written. Reward components are
+    fixed by the first `get_task_rewards` call; missing components are recorded
+    as NaN.
+    """
+
+    def __init__(self, env, directory, object_ids=None, chunk_size=4096, num_buffers=3):
+        self.env = env
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.num_buffers = num_buffers
+        if object_ids is None:
+            object_ids = [getattr(env, name) for name in TRACKED_OBJECT_ATTRIBUTES if isinstance(getattr(env, name, None), int)]
+        self.object_ids = list(object_ids)
+        self.reward_names = None
+        self.columns = None
+        self.episodes = []
+        self.shards = []
+        self._rows_written = 0
+        self._row = 0
+        self._buffer = None
+        self._free = queue.Queue()
+        self._pending = queue.Queue()
+        self._error = None
+        self._episode = -1
+        self._episode_start = 0
+        self._step = 0
+        self._rewards = None
+        self._patched = []
+        # Calls pybullet directly instead of through BulletClient.__getattr__, which builds a partial per call.
+        client = getattr(env._p, '_client', None)
+        self._get_pose = functools.partial(pybullet.getBasePositionAndOrientation, physicsClientId=client) if client is not None else env._p.getBasePositionAndOrientation
+        self._robot_id = env.robot.robot_id
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name='trajectory-writer', daemon=True)
+        self._writer.start()
+        self._patch('step', self._stepping(env.step))
+        self._patch('reset', self._resetting(env.reset))
+        self._patch('get_task_rewards', self._capturing(env.get_task_rewards))
+
+    def _patch(self, name, wrapper):
+        self._patched.append((name, vars(self.env).get(name, _MISSING)))
+        setattr(self.env, name, wrapper)
+
+    def _resetting(self, reset):
+        def wrapper(*args, **kwargs):
+            observation = reset(*args, **kwargs)
+            self._end_episode()
+            self._episode += 1
+            self._episode_start = self._rows_written + self._row
+            self._step = 0
+            return observation
+        return wrapper
+
+    def _capturing(self, get_task_rewards):
+        def wrapper(*args, **kwargs):
+            rewards = self._rewards = get_task_rewards(*args, **kwargs)
+            return rewards
+        return wrapper
+
+    def _stepping(self, step):
+        def wrapper(action):
+            result = step(action)
+            self._record(action, result)
+            return result
+        return wrapper
+
+    def _allocate(self, action):
+        action = np.asarray(action)
+        self.reward_names = sorted(self._rewards) if self._rewards else []
+        self.columns = {
+            'episode': ((), np.int32),
+            'step': ((), np.int32),
+            'terminated': ((), np.bool_),
+            'truncated': ((), np.bool_),
+            'success': ((), np.bool_),
+            'robot_pose': ((7,), np.float32),
+            'object_poses': ((len(self.object_ids), 7), np.float32),
+            'action': (action.shape, np.float32),
+            'reward': ((), np.float32),
+            'rewards': ((len(self.reward_names),), np.float32),
+        }
+        # Each row is staged as one int row and one float row; the writer thread
+        # slices them back into columns.
+        self._slices = {}
+        offsets = {np.int32: 0, np.bool_: 0, np.float32: 0}
+        for name, (shape, dtype) in self.columns.items():
+            kind = np.float32 if dtype is np.float32 else np.int32
+            size = int(np.prod(shape))
+            self._slices[name] = (kind, offsets[kind], offsets[kind] + size)
+            offsets[kind] += size
+        for _ in range(self.num_buffers):
+            self._free.put((np.zeros((self.chunk_size, offsets[np.int32]), dtype=np.int32), np.zeros((self.chunk_size, offsets[np.float32]), dtype=np.float32)))
+        metadata = {
+            'chunk_size': self.chunk_size,
+            'object_ids': self.object_ids,
+            'reward_names': self.reward_names,
+            'columns': {name: {'shape': list(shape), 'dtype': np.dtype(dtype).str} for name, (shape, dtype) in self.columns.items()},
+        }
+        _write_atomic(os.path.join(self.directory, 'metadata.json'), lambda f: f.write(json.dumps(metadata, indent=2).encode()))
+
+    def _record(self, action, result):
+        if self._error is not None:
+            raise RuntimeError('Trajectory writer failed') from self._error
+        if self.columns is None:
+            self._allocate(action)
+        if self._buffer is None:
+            self._buffer = self._free.get()
+        if self._episode < 0:
+            self._episode = 0
+        _, reward, terminated, truncated, info = result
+        get_pose = self._get_pose
+        success = bool(info.get('success', False)) if isinstance(info, dict) else False
+        ints, floats = self._buffer
+        ints[self._row] = (self._episode, self._step, bool(terminated), bool(truncated), success)
+        position, orientation = get_pose(self._robot_id)
+        values = list(position) + list(orientation)
+        for body_id in self.object_ids:
+            position, orientation = get_pose(body_id)
+            values += position
+            values += orientation
+        values += np.asarray(action, dtype=np.float32).ravel().tolist()
+        values.append(float(reward))
+        rewards = self._rewards or {}
+        values += [rewards.get(name, np.nan) for name in self.reward_names]
+        floats[self._row] = values
+        self._rewards = None
+        self._step += 1
+        self._row += 1
+        if self._row == self.chunk_size:
+            self._flush()
+
+    def _end_episode(self):
+        end = self._rows_written + self._row
+        if self._episode >= 0 and end > self._episode_start:
+            self.episodes.append((self._episode, self._episode_start, end - self._episode_start))
+
+    def _flush(self):
+        if self._row == 0:
+            return
+        shard = len(self.shards)
+        self.shards.append((shard, self._rows_written, self._row))
+        self._pending.put((shard, self._buffer, self._row, list(self.shards), list(self.episodes)))
+        self._rows_written += self._row
+        self._row = 0
+        self._buffer = None
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            shard, buffer, rows, shards, episodes = item
+            try:
+                shard_dir = os.path.join(self.directory, 'shard_{:05d}'.format(shard))
+                os.makedirs(shard_dir, exist_ok=True)
+                staged = {np.int32: buffer[0], np.float32: buffer[1]}
+                for name, (shape, dtype) in self.columns.items():
+                    kind, lo, hi = self._slices[name]
+                    np.save(os.path.join(shard_dir, name + '.npy'), staged[kind][:rows, lo:hi].astype(dtype).reshape((rows,) + shape))
+                self._write_index(shards, episodes)
+            except Exception as error:
+                self._error = error
+            self._free.put(buffer)
+
+    def _write_index(self, shards, episodes):
+        _write_atomic(os.path.join(self.directory, 'shards.npy'), lambda f: np.save(f, np.array(shards, dtype=np.int64).reshape(-1, 3)))
+        _write_atomic(os.path.join(self.directory, 'episodes.npy'), lambda f: np.save(f, np.array(episodes, dtype=np.int64).reshape(-1, 3)))
+
+    def close(self):
+        """Writes the open episode and remaining rows, waits for the writer and restores the env."""
+        self._end_episode()
+        self._episode_start = self._rows_written + self._row
+        self._flush()
+        self._pending.put(None)
+        self._writer.join()
+        if self.columns is not None:
+            self._write_index(self.shards, self.episodes)
+        for name, previous in reversed(self._patched):
+            if previous is _MISSING:
+                delattr(self.env, name)
+            else:
+                setattr(self.env, name, previous)
+        self._patched = []
+        if self._error is not None:
+            raise RuntimeError('Trajectory writer failed') from self._error
+
+
+class TrajectoryReader:
+    """Random access to a recording: columns are memory-mapped per shard."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'metadata.json')) as f:
+            self.metadata = json.load(f)
+        self.reward_names = self.metadata['reward_names']
+        self.shards = np.load(os.path.join(directory, 'shards.npy'))
+        self.episodes = np.load(os.path.join(directory, 'episodes.npy'))
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def column_shards(self, name):
+        if name not in self._columns:
+            self._columns[name] = [np.load(os.path.join(self.directory, 'shard_{:05d}'.format(shard), name + '.npy'), mmap_mode='r') for shard, _, _ in self.shards]
+        return self._columns[name]
+
+    def rows(self, name, start, stop):
+        """Rows [start, stop) of a column across shard boundaries."""
+        parts = []
+        for (_, shard_start, shard_rows), column in zip(self.shards, self.column_shards(name)):
+            lo, hi = max(start, shard_start), min(stop, shard_start + shard_rows)
+            if lo < hi:
+                parts.append(column[lo - shard_start:hi - shard_start])
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.zeros((0,) + tuple(self.metadata['columns'][name]['shape']), dtype=self.metadata['columns'][name]['dtype'])
+
+    def episode(self, index, columns=None):
+        """Dict of column arrays for the `index`-th recorded episode."""
+        _, start, length = self.episodes[index]
+        return {name: self.rows(name, start, start + length) for name in (columns or self.metadata['columns'])}
@@ -0,0 +1,100 @@
+"""
+Episode logs and deterministic replay for the long_run tasks.
+
+An episode is fully determined by the task source, the seed its environment
+was constructed with, the seed passed to `reset()` and the actions taken. An
+EpisodeLog stores those together with the rewards of the original run, and
+`replay()` re-runs the episode in a fresh environment and checks that every
+reward matches exactly:
+
+    log = run_episode(path, actions, seed=0, reset_seed=7)
+    log.save('episode.npz')
+    python -m envkit.replay episode.npz
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from envkit.loader import LONG_RUN_DIR, load_env_class, source_hash, task_name
+
+
+class EpisodeLog:
+    def __init__(self, task, task_hash, seed, reset_seed, actions, rewards, terminated):
+        self.task = task
+        self.task_hash = task_hash
+        self.seed = seed
+        self.reset_seed = reset_seed
+        self.actions = np.asarray(actions)
+        self.rewards = np.asarray(rewards, dtype=np.float64)
+        self.terminated = np.asarray(terminated, dtype=bool)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def save(self, path):
+        np.savez_compressed(path, task=np.array(self.task), task_hash=np.array(self.task_hash), seed=np.array(self.seed, dtype=np.int64), reset_seed=np.array(self.reset_seed, dtype=np.int64), actions=self.actions, rewards=self.rewards, terminated=self.terminated)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(str(data['task']), str(data['task_hash']), int(data['seed']), int(data['reset_seed']), data['actions'], data['rewards'], data['terminated'])
+
+
+def run_episode(path, actions, seed, reset_seed):
+    """Runs `actions` in a new environment until they run out or the episode ends, and returns its log."""
+    if seed is None or reset_seed is None:
+        raise ValueError('Replayable episodes need integer seeds')
+    env = load_env_class(path)(seed=seed)
+    try:
+        env.reset(seed=reset_seed)
+        rewards, terminated = [], []
+        for action in actions:
+            _, reward, done, truncated, _ = env.step(action)
+            rewards.append(reward)
+            terminated.append(done)
+            if done or truncated:
+                break
+    finally:
+        close = getattr(env, 'close', None)
+        if close is not None:
+            close()
+    return EpisodeLog(task_name(path), source_hash(path), seed, reset_seed, np.asarray(actions)[:len(rewards)], rewards, terminated)
+
+
+def replay(log, path=None):
+    """
+    Re-runs a logged episode and compares it with the log. Returns a dict with
+    `matches`, the number of replayed `steps` and the index of the
+    `first_mismatch` (None when the episodes are identical).
+    """
+    path = path or os.path.join(LONG_RUN_DIR, log.task + '.py')
+    if source_hash(path) != log.task_hash:
+        raise ValueError('{} has changed since the episode was logged'.format(path))
+    rerun = run_episode(path, log.actions, log.seed, log.reset_seed)
+    steps = min(len(rerun), len(log))
+    mismatches = np.flatnonzero((rerun.rewards[:steps] != log.rewards[:steps]) | (rerun.terminated[:steps] != log.terminated[:steps]))
+    first_mismatch = int(mismatches[0]) if len(mismatches) else (steps if len(rerun) != len(log) else None)
+    return {'matches': first_mismatch is None, 'steps': len(rerun), 'first_mismatch': first_mismatch}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay logged long_run episodes and verify their rewards.')
+    parser.add_argument('logs', nargs='+', help='episode .npz files')
+    parser.add_argument('--task', help='task file (default: the logged task in long_run)')
+    args = parser.parse_args(argv)
+    failed = 0
+    for log_path in args.logs:
+        log = EpisodeLog.load(log_path)
+        result = replay(log, args.task)
+        if result['matches']:
+            print('{}: {} steps match'.format(log_path, result['steps']))
+        else:
+            failed += 1
+            print('{}: MISMATCH at step {}'.format(log_path, result['first_mismatch']))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Precompiled scenes: the bodies a task builds in `__init__`, stored on disk so
+later constructions bulk-load them instead of rebuilding the world procedurally.
+
+A scene is one .npz of flat arrays (shape types, dimensions, masses, colors,
+initial poses) plus, as JSON, the recorded base dynamics and the task
+attributes that hold body ids. Files are keyed by the sha256 of the task
+source, so editing a task invalidates its scene. A loaded scene is shared by
+every environment of the process that preloads it.
+
+The cache is for geometry that depends on the task source alone. task_90 and
+task_122 draw their terrain, gates and targets from the environment's RNG in
+`__init__`, so a file keyed by source would give every seed the same layout;
+they build procedurally.
+"""
+import json
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+from envkit.loader import source_hash, task_name
+
+SCENE_FORMAT_VERSION = 2
+SCENE_CACHE_DIR = os.environ.get('ENVKIT_SCENE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'envkit', 'scenes'))
+IDENTITY_ORIENTATION = [0.0, 0.0, 0.0, 1.0]
+_loaded_scenes = weakref.WeakValueDictionary()
+
+
+class Scene:
+    """Bodies in creation order, with their base dynamics keyed by body index."""
+
+    def __init__(self):
+        self.shape_types = []
+        self.dimensions = []
+        self.masses = []
+        self.colors = []
+        self.positions = []
+        self.orientations = []
+        self.dynamics = {}
+        self.attributes = {}
+
+    def __len__(self):
+        return len(self.shape_types)
+
+    def add(self, shape_type, dimensions, mass, color, position, orientation):
+        self.shape_types.append(int(shape_type))
+        self.dimensions.append([float(x) for x in dimensions])
+        self.masses.append(float(mass))
+        self.colors.append([float(x) for x in color])
+        self.positions.append([float(x) for x in position])
+        self.orientations.append([float(x) for x in orientation])
+        return len(self.shape_types) - 1
+
+    def set_dynamics(self, index, dynamics):
+        self.dynamics.setdefault(index, {}).update(dynamics)
+
+    def signature(self, index):
+        return self.shape_types[index], self.dimensions[index], self.masses[index], self.colors[index]
+
+    def batches(self):
+        """(start, stop) index ranges of consecutive identical bodies that can share one batched createMultiBody call."""
+        start = 0
+        while start < len(self):
+            stop = start + 1
+            if self.orientations[start] == IDENTITY_ORIENTATION:
+                while stop < len(self) and self.signature(stop) == self.signature(start) and self.orientations[stop] == IDENTITY_ORIENTATION:
+                    stop += 1
+            yield start, stop
+            start = stop
+
+    def save(self, path):
+        dimensions = np.zeros((len(self), 3))
+        for i, row in enumerate(self.dimensions):
+            dimensions[i, :len(row)] = row
+        arrays = {
+            'version': np.array(SCENE_FORMAT_VERSION),
+            'shape_types': np.array(self.shape_types, dtype=np.int32),
+            'dimension_counts': np.array([len(row) for row in self.dimensions], dtype=np.int32),
+            'dimensions': dimensions,
+            'masses': np.array(self.masses),
+            'colors': np.array(self.colors).reshape(-1, 4),
+            'positions': np.array(self.positions).reshape(-1, 3),
+            'orientations': np.array(self.orientations).reshape(-1, 4),
+            'dynamics': np.array(json.dumps({str(index): dynamics for index, dynamics in self.dynamics.items()})),
+            'attributes': np.array(json.dumps(self.attributes)),
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != SCENE_FORMAT_VERSION:
+                raise ValueError('Unsupported scene format version {} in {}'.format(int(data['version']), path))
+            scene = cls()
+            scene.shape_types = data['shape_types'].tolist()
+            scene.dimensions = [row[:count] for row, count in zip(data['dimensions'].tolist(), data['dimension_counts'].tolist())]
+            scene.masses = data['masses'].tolist()
+            scene.colors = data['colors'].tolist()
+            scene.positions = data['positions'].tolist()
+            scene.orientations = data['orientations'].tolist()
+            scene.dynamics = {int(index): dynamics for index, dynamics in json.loads(str(data['dynamics'])).items()}
+            scene.attributes = json.loads(str(data['attributes']))
+        return scene
+
+
+class SceneCache:
+    """
+    Disk cache of a task's scene for a ShapeFactory. When a scene for the task
+    source exists it is preloaded into `shapes` right away and `build()` skips
+    the procedural build; otherwise the build is recorded and written out. Only
+    tasks whose `__init__` geometry is deterministic should enable it.
+    """
+
+    def __init__(self, shapes, source_path, enabled=True, directory=None):
+        self.shapes = shapes
+        self.enabled = enabled
+        self.path = os.path.join(directory or SCENE_CACHE_DIR, '{}-{}.npz'.format(task_name(source_path), source_hash(source_path)[:16])) if enabled else None
+        self.loaded = False
+        if not enabled:
+            return
+        scene = _loaded_scenes.get(self.path)
+        if scene is None and os.path.exists(self.path):
+            try:
+                scene = _loaded_scenes[self.path] = Scene.load(self.path)
+            except (OSError, ValueError, KeyError):
+                scene = None
+        if scene is not None:
+            shapes.preload(scene)
+            self.loaded = True
+        else:
+            shapes.start_recording()
+
+    def build(self, owner, build, attributes):
+        """
+        Creates the scene's bodies. `build()` creates them procedurally and
+        stores their ids in the `attributes` of `owner`, each a body id or a
+        list of body ids. With a preloaded scene `build()` is not called: the
+        attributes are set to the preloaded bodies recorded under their names.
+        """
+        if self.loaded:
+            if sorted(self.shapes.scene_attributes) != sorted(attributes):
+                raise ValueError('Scene {} records attributes {}, the task expects {}; the scene file is stale.'.format(self.path, sorted(self.shapes.scene_attributes), sorted(attributes)))
+            for name, value in self.shapes.claim_preloaded().items():
+                setattr(owner, name, value)
+            return
+        build()
+        if self.enabled and len(self.shapes.scene):
+            self.shapes.scene.attributes = {name: self.shapes.scene_indices(getattr(owner, name)) for name in attributes}
+            try:
+                self.shapes.scene.save(self.path)
+            except OSError:
+                pass
+        self.shapes.stop_recording()
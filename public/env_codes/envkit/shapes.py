@@ -0,0 +1,147 @@
+from envkit.scene import IDENTITY_ORIENTATION, Scene
+
+
+class ShapeFactory:
+    """
+    Creates primitive bodies for a PyBullet client, reusing collision and visual
+    shapes. Shapes are keyed by geometry (and color for visual shapes), so a
+    course with twenty identical walls allocates one collision shape and one
+    visual shape instead of forty.
+
+    The geometry of every body it creates is kept in `geometry` as
+    (shape_type, dimensions, color). Between `start_recording()` and
+    `stop_recording()` bodies are also recorded into `scene` (a Scene).
+    `preload(scene)` creates a recorded scene up front in as few batched calls
+    as possible and `claim_preloaded()` hands its bodies to the task, in place
+    of the create calls of a procedural build.
+    """
+
+    def __init__(self, p):
+        self._p = p
+        self._collision_shapes = {}
+        self._visual_shapes = {}
+        self.geometry = {}
+        self.scene = None
+        self._scene_indices = {}
+        self._preloaded_scene = None
+        self._preloaded_ids = []
+
+    def get_shapes(self, shape_type, dimensions, color):
+        key = (shape_type, tuple(float(x) for x in dimensions))
+        collision_shape_id = self._collision_shapes.get(key)
+        if collision_shape_id is None:
+            collision_shape_id = self._p.createCollisionShape(shapeType=shape_type, **self._geometry_kwargs(shape_type, dimensions, visual=False))
+            self._collision_shapes[key] = collision_shape_id
+        visual_key = key + (tuple(float(x) for x in color),)
+        visual_shape_id = self._visual_shapes.get(visual_key)
+        if visual_shape_id is None:
+            visual_shape_id = self._p.createVisualShape(shapeType=shape_type, rgbaColor=color, **self._geometry_kwargs(shape_type, dimensions, visual=True))
+            self._visual_shapes[visual_key] = visual_shape_id
+        return collision_shape_id, visual_shape_id
+
+    def _geometry_kwargs(self, shape_type, dimensions, visual):
+        if shape_type == self._p.GEOM_BOX:
+            return {'halfExtents': list(dimensions)}
+        if shape_type == self._p.GEOM_SPHERE:
+            return {'radius': dimensions[0]}
+        if shape_type == self._p.GEOM_CYLINDER:
+            radius, height = dimensions
+            return {'radius': radius, 'length': height} if visual else {'radius': radius, 'height': height}
+        raise ValueError('Unsupported shape type: {}'.format(shape_type))
+
+    def create_body(self, shape_type, dimensions, mass, position, color, orientation=None):
+        if orientation is None:
+            orientation = [0.0, 0.0, 0.0, 1.0]
+        collision_shape_id, visual_shape_id = self.get_shapes(shape_type, dimensions, color)
+        body_id = self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position, baseOrientation=orientation)
+        self._record(body_id, shape_type, dimensions, mass, color, position, orientation)
+        return body_id
+
+    def create_bodies(self, shape_type, dimensions, mass, positions, color):
+        """Creates one body per position in a single batched createMultiBody call."""
+        positions = [list(position) for position in positions]
+        if len(positions) == 0:
+            return []
+        if len(positions) == 1:
+            return [self.create_body(shape_type, dimensions, mass, positions[0], color)]
+        collision_shape_id, visual_shape_id = self.get_shapes(shape_type, dimensions, color)
+        body_ids = list(self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, batchPositions=positions))
+        for body_id, position in zip(body_ids, positions):
+            self._record(body_id, shape_type, dimensions, mass, color, position, IDENTITY_ORIENTATION)
+        return body_ids
+
+    def change_dynamics(self, body_id, **kwargs):
+        """changeDynamics on a body's base, recorded into the scene. Skipped for preloaded bodies that already have these values."""
+        index = self._scene_indices.get(body_id)
+        if self._preloaded_scene is not None and index is not None:
+            recorded = self._preloaded_scene.dynamics.get(index, {})
+            if all(recorded.get(key) == value for key, value in kwargs.items()):
+                return
+        self._p.changeDynamics(body_id, -1, **kwargs)
+        if self.scene is not None and index is not None:
+            self.scene.set_dynamics(index, kwargs)
+
+    def _record(self, body_id, shape_type, dimensions, mass, color, position, orientation):
+        self.geometry[body_id] = (shape_type, list(dimensions), list(color))
+        if self.scene is not None:
+            self._scene_indices[body_id] = self.scene.add(shape_type, dimensions, mass, color, position, orientation)
+
+    def scene_indices(self, body_ids):
+        """Scene index of a recorded body id, or list of indices for a list of ids."""
+        if isinstance(body_ids, (list, tuple)):
+            return [self._scene_indices[body_id] for body_id in body_ids]
+        return self._scene_indices[body_ids]
+
+    def start_recording(self):
+        self.scene = Scene()
+
+    def stop_recording(self):
+        self.scene = None
+
+    def preload(self, scene):
+        """
+        Creates every body of `scene` in record order, so body ids match a
+        procedural build. Runs of identical unrotated bodies become one batched
+        createMultiBody call each.
+        """
+        body_ids = []
+        for start, stop in scene.batches():
+            shape_type, dimensions, mass, color = scene.signature(start)
+            collision_shape_id, visual_shape_id = self.get_shapes(shape_type, dimensions, color)
+            if stop - start > 1:
+                body_ids.extend(self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, batchPositions=scene.positions[start:stop]))
+            else:
+                body_ids.append(self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=scene.positions[start], baseOrientation=scene.orientations[start]))
+        for index, dynamics in sorted(scene.dynamics.items()):
+            self._p.changeDynamics(body_ids[index], -1, **dynamics)
+        for index, body_id in enumerate(body_ids):
+            self._scene_indices[body_id] = index
+            self.geometry[body_id] = (scene.shape_types[index], scene.dimensions[index], scene.colors[index])
+        self._preloaded_scene = scene
+        self._preloaded_ids = body_ids
+        self.scene = None
+        return body_ids
+
+    @property
+    def scene_attributes(self):
+        return self._preloaded_scene.attributes if self._preloaded_scene is not None else {}
+
+    def claim_preloaded(self):
+        """The preloaded scene's recorded attributes with body indices replaced by body ids."""
+        ids = self._preloaded_ids
+        return {name: [ids[index] for index in value] if isinstance(value, list) else ids[value] for name, value in self._preloaded_scene.attributes.items()}
+
+    def create_box(self, mass, half_extents, position, color, orientation=None):
+        return self.create_body(self._p.GEOM_BOX, half_extents, mass, position, color, orientation)
+
+    def create_sphere(self, mass, radius, position, color, orientation=None):
+        return self.create_body(self._p.GEOM_SPHERE, [radius], mass, position, color, orientation)
+
+    def create_cylinder(self, mass, radius, height, position, color, orientation=None):
+        return self.create_body(self._p.GEOM_CYLINDER, [radius, height], mass, position, color, orientation)
+
+    def create_boxes(self, mass, half_extents, positions, color):
+        return self.create_bodies(self._p.GEOM_BOX, half_extents, mass, positions, color)
+
+    def create_cylinders(self, mass, radius, height, positions, color):
+        return self.create_bodies(self._p.GEOM_CYLINDER, [radius, height], mass, positions, color)
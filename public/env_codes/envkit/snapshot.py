@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class ResetSnapshot:
+    """
+    In-memory physics snapshot of a task's initial layout.
+
+    The first reset places every body by hand and then calls `capture()`; later
+    resets call `restore()`, which puts the whole world back with one
+    restoreState call instead of a resetBasePositionAndOrientation and
+    resetBaseVelocity per body. Randomization is applied on top of the restored
+    state by the task. The snapshot is only valid while the set of bodies in the
+    world matches the one at capture time, so tasks that spawn bodies must remove
+    them before restoring. If bodies were added since (a BodyPool grew),
+    `restore()` drops the snapshot and returns False, so the task places its
+    bodies by hand and captures again.
+    """
+
+    def __init__(self, p, enabled=True):
+        self._p = p
+        self.enabled = enabled
+        self.state_id = None
+        self.num_bodies = None
+
+    def capture(self):
+        if not self.enabled:
+            return
+        self.discard()
+        self.state_id = self._p.saveState()
+        self.num_bodies = self._p.getNumBodies()
+
+    def restore(self):
+        """Restores the captured state. Returns False if there is nothing to restore or the world has gained bodies since."""
+        if not self.enabled or self.state_id is None:
+            return False
+        if self._p.getNumBodies() != self.num_bodies:
+            self.discard()
+            return False
+        self._p.restoreState(stateId=self.state_id)
+        return True
+
+    def restore_or_place(self, place):
+        """Restores the captured state, or calls `place()` to put the bodies in their initial poses by hand and captures the result."""
+        if not self.restore():
+            place()
+            self.capture()
+
+    def discard(self):
+        if self.state_id is not None:
+            self._p.removeState(self.state_id)
+            self.state_id = None
+
+
+def reseed(env, seed):
+    """Restarts `env.rng` from `seed`; does nothing if `seed` is None or the task draws no random numbers."""
+    if seed is not None and getattr(env, 'rng', None) is not None:
+        env.rng = np.random.default_rng(seed)
@@ -0,0 +1,177 @@
+import math
+
+import numpy as np
+
+_FIXED = object()
+
+
+class SpatialHash:
+    """
+    Uniform grid over body positions in the xy plane, answering "what is within
+    r of this point" and "which body of a class is nearest" by looking only at
+    the grid cells around the query instead of at every body.
+
+    Entries are either tracked (moving bodies, re-read from `state` or from a
+    position callable after every `invalidate()`) or fixed (scenery placed once,
+    with a footprint `radius`). Each entry carries a `label` (its class, e.g.
+    'ball' or 'obstacle') that queries can filter on. Distances are measured in
+    the xy plane from the query point to an entry's footprint, i.e. centre
+    distance minus radius, clamped at zero. Like the other per-step caches the
+    tracked part of the grid is rebuilt lazily on the first query after
+    `invalidate()`, so it can be handed to a StepContext; the fixed part is
+    kept in its own grid and never copied.
+    """
+
+    def __init__(self, state, cell_size=1.0):
+        self.state = state
+        self.cell_size = float(cell_size)
+        self.labels = {}
+        self._radii = {}
+        self._positions = {}
+        self._tracked = {}
+        self._fixed_cells = {}
+        self._cells = {}
+        self._counts = {}
+        self._fixed_bounds = None
+        self._bounds = None
+        self._stale = True
+
+    def __contains__(self, key):
+        return key in self.labels
+
+    def track(self, key, label=None, position=None):
+        """
+        Adds a moving entry. Without `position` the key is a body id read from
+        the StateSnapshot (and tracked by it); otherwise `position` is a
+        callable returning the entry's current position.
+        """
+        if position is None:
+            self.state.track(key)
+        self._tracked[key] = position
+        self._register(key, label, 0.0)
+        self._stale = True
+
+    def add_fixed(self, key, position, label=None, radius=0.0):
+        """Adds an entry that never moves, such as a static obstacle with a footprint of `radius`."""
+        self._register(key, label, radius)
+        self._positions[key] = (float(position[0]), float(position[1]))
+        for cell in self._cells_around(position[0], position[1], radius):
+            self._fixed_cells.setdefault(cell, []).append(key)
+        self._fixed_bounds = self._union(self._fixed_bounds, self._cell(position[0] - radius, position[1] - radius), self._cell(position[0] + radius, position[1] + radius))
+        self._stale = True
+
+    def remove(self, key):
+        if key not in self.labels:
+            return
+        label = self.labels.pop(key)
+        self._counts[label] -= 1
+        self._radii.pop(key)
+        self._positions.pop(key, None)
+        if self._tracked.pop(key, _FIXED) is _FIXED:
+            for keys in self._fixed_cells.values():
+                if key in keys:
+                    keys.remove(key)
+        self._stale = True
+
+    def _register(self, key, label, radius):
+        if key in self.labels:
+            self.remove(key)
+        self.labels[key] = label
+        self._radii[key] = float(radius)
+        self._counts[label] = self._counts.get(label, 0) + 1
+
+    @staticmethod
+    def _union(bounds, low, high):
+        if bounds is None:
+            return (low[0], low[1], high[0], high[1])
+        return (min(bounds[0], low[0]), min(bounds[1], low[1]), max(bounds[2], high[0]), max(bounds[3], high[1]))
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _cells_around(self, x, y, radius):
+        i0, j0 = self._cell(x - radius, y - radius)
+        i1, j1 = self._cell(x + radius, y + radius)
+        return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+    def invalidate(self):
+        self._stale = True
+
+    def refresh(self):
+        cells = {}
+        bounds = self._fixed_bounds
+        for key, position in self._tracked.items():
+            xyz = self.state.position(key) if position is None else position()
+            x, y = float(xyz[0]), float(xyz[1])
+            self._positions[key] = (x, y)
+            cell = self._cell(x, y)
+            cells.setdefault(cell, []).append(key)
+            bounds = self._union(bounds, cell, cell)
+        self._cells = cells
+        self._bounds = bounds
+        self._stale = False
+
+    def _keys(self, cell):
+        fixed, tracked = self._fixed_cells.get(cell), self._cells.get(cell)
+        if fixed is None:
+            return tracked or ()
+        return fixed + tracked if tracked else fixed
+
+    def position(self, key):
+        """xy position of an entry as of the last refresh."""
+        if self._stale:
+            self.refresh()
+        return self._positions[key]
+
+    def distance(self, key, position):
+        """xy distance from `position` to the footprint of entry `key`."""
+        x, y = self.position(key)
+        dx, dy = x - position[0], y - position[1]
+        return max(math.sqrt(dx * dx + dy * dy) - self._radii[key], 0.0)
+
+    def within(self, position, radius, label=None):
+        """Keys of the entries (optionally of one `label`) closer than `radius` to `position`, nearest first."""
+        if self._stale:
+            self.refresh()
+        found = {}
+        for cell in self._cells_around(position[0], position[1], radius):
+            for key in self._keys(cell):
+                if key not in found and (label is None or self.labels[key] == label):
+                    distance = self.distance(key, position)
+                    if distance < radius:
+                        found[key] = distance
+        return sorted(found, key=found.get)
+
+    def nearest(self, position, label=None, max_distance=np.inf):
+        """(key, distance) of the nearest entry, optionally of one `label`; (None, inf) if none is within `max_distance`."""
+        if self._stale:
+            self.refresh()
+        if self._bounds is None or (label is not None and not self._counts.get(label)):
+            return None, np.inf
+        best_key, best_distance = None, np.inf
+        ci, cj = self._cell(position[0], position[1])
+        i0, j0, i1, j1 = self._bounds
+        max_ring = max(ci - i0, i1 - ci, cj - j0, j1 - cj, 0)
+        seen = set()
+        ring = 0
+        # Every cell in ring k is at least k - 1 cells away from the query point.
+        while ring <= max_ring and (ring - 1) * self.cell_size < min(best_distance, max_distance):
+            for cell in self._ring(ci, cj, ring):
+                for key in self._keys(cell):
+                    if key in seen or (label is not None and self.labels[key] != label):
+                        continue
+                    seen.add(key)
+                    distance = self.distance(key, position)
+                    if distance < best_distance:
+                        best_key, best_distance = key, distance
+            ring += 1
+        if best_distance > max_distance:
+            return None, np.inf
+        return best_key, best_distance
+
+    def _ring(self, ci, cj, ring):
+        if ring == 0:
+            return [(ci, cj)]
+        cells = [(ci + di, cj + dj) for di in (-ring, ring) for dj in range(-ring, ring + 1)]
+        cells += [(ci + di, cj + dj) for dj in (-ring, ring) for di in range(-ring + 1, ring)]
+        return cells
@@ -0,0 +1,171 @@
+import numpy as np
+
+
+class StateSnapshot:
+    """
+    Base pose and velocity of a set of tracked bodies, read from the physics
+    client at most once per physics step.
+
+    Each tracked body owns one row of `data`: position (3), orientation
+    quaternion (4), linear velocity (3) and angular velocity (3). Tasks call
+    `invalidate()` whenever the world changes (after stepping the simulation or
+    teleporting a body); the next read then refreshes every row and all later
+    reads in the same step are served from the array. This is a per-step cache,
+    not a batched query: PyBullet has no multi-body getter, so a refresh still
+    costs one getBasePositionAndOrientation and one getBaseVelocity call per
+    tracked body. The saving is that step() and the reward, termination and
+    success functions no longer each repeat those calls.
+    """
+
+    POSITION = slice(0, 3)
+    ORIENTATION = slice(3, 7)
+    LINEAR_VELOCITY = slice(7, 10)
+    ANGULAR_VELOCITY = slice(10, 13)
+
+    def __init__(self, p, body_ids=(), capacity=8):
+        self._p = p
+        self.body_ids = []
+        self._rows = {}
+        self._buffer = np.zeros((max(capacity, len(body_ids)), 13))
+        self._stale = True
+        for body_id in body_ids:
+            self.track(body_id)
+
+    @property
+    def data(self):
+        if self._stale:
+            self.refresh()
+        return self._buffer[:len(self.body_ids)]
+
+    def track(self, body_id):
+        if body_id in self._rows:
+            return
+        if len(self.body_ids) == len(self._buffer):
+            self._buffer = np.concatenate([self._buffer, np.zeros_like(self._buffer)])
+        self._rows[body_id] = len(self.body_ids)
+        self.body_ids.append(body_id)
+        self._stale = True
+
+    def untrack(self, body_id):
+        row = self._rows.pop(body_id, None)
+        if row is None:
+            return
+        last = len(self.body_ids) - 1
+        if row != last:
+            moved_id = self.body_ids[last]
+            self.body_ids[row] = moved_id
+            self._rows[moved_id] = row
+            self._buffer[row] = self._buffer[last]
+        self.body_ids.pop()
+
+    def clone_state(self):
+        return list(self.body_ids)
+
+    def restore_state(self, body_ids):
+        """Tracks exactly `body_ids` again, in the same rows as when they were cloned."""
+        if len(body_ids) > len(self._buffer):
+            self._buffer = np.zeros((len(body_ids), 13))
+        self.body_ids[:] = body_ids
+        self._rows = {body_id: row for row, body_id in enumerate(body_ids)}
+        self._stale = True
+
+    def invalidate(self):
+        self._stale = True
+
+    def refresh(self):
+        """Re-reads every tracked body, two client calls per body."""
+        buffer = self._buffer
+        for row, body_id in enumerate(self.body_ids):
+            position, orientation = self._p.getBasePositionAndOrientation(body_id)
+            linear_velocity, angular_velocity = self._p.getBaseVelocity(body_id)
+            buffer[row, 0:3] = position
+            buffer[row, 3:7] = orientation
+            buffer[row, 7:10] = linear_velocity
+            buffer[row, 10:13] = angular_velocity
+        self._stale = False
+
+    def _read(self, body_id, columns):
+        row = self._rows.get(body_id)
+        if row is None:
+            return None
+        if self._stale:
+            self.refresh()
+        return self._buffer[row, columns].copy()
+
+    def position(self, body_id):
+        value = self._read(body_id, self.POSITION)
+        if value is None:
+            return np.asarray(self._p.getBasePositionAndOrientation(body_id)[0])
+        return value
+
+    def orientation(self, body_id):
+        value = self._read(body_id, self.ORIENTATION)
+        if value is None:
+            return np.asarray(self._p.getBasePositionAndOrientation(body_id)[1])
+        return value
+
+    def velocity(self, body_id):
+        value = self._read(body_id, self.LINEAR_VELOCITY)
+        if value is None:
+            return np.asarray(self._p.getBaseVelocity(body_id)[0])
+        return value
+
+    def angular_velocity(self, body_id):
+        value = self._read(body_id, self.ANGULAR_VELOCITY)
+        if value is None:
+            return np.asarray(self._p.getBaseVelocity(body_id)[1])
+        return value
+
+
+class StepValues:
+    """
+    Array-backed storage for the values a task recomputes every step (its
+    own copies of positions and distances). Declared on the task class:
+
+        step_values = StepValues(ball_position=3, distance_to_ball=1)
+
+    Each name becomes an attribute whose value lives in a slice of one
+    float64 array per environment instead of being a NumPy array object and an
+    instance dict entry of its own. Fields of width 1 read as floats, wider
+    ones as array copies, so a read never changes under a later assignment.
+    Unassigned fields read as NaN.
+    """
+
+    def __init__(self, **widths):
+        self.widths = widths
+        self.width = sum(widths.values())
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        offset = 0
+        for field, width in self.widths.items():
+            setattr(owner, field, _StepValue(self, offset, width))
+            offset += width
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        values = obj.__dict__.get(self.name)
+        if values is None:
+            values = obj.__dict__[self.name] = np.full(self.width, np.nan)
+        return values
+
+
+class _StepValue:
+    __slots__ = ('layout', 'start', 'stop')
+
+    def __init__(self, layout, start, width):
+        self.layout = layout
+        self.start = start
+        self.stop = start + width
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        values = self.layout.__get__(obj)
+        if self.stop - self.start == 1:
+            return float(values[self.start])
+        return values[self.start:self.stop].copy()
+
+    def __set__(self, obj, value):
+        self.layout.__get__(obj)[self.start:self.stop] = value
@@ -0,0 +1,175 @@
+"""
+Heightfield terrain: static features (plateaus, patches, boulders) rasterized
+with NumPy into GEOM_HEIGHTFIELD bodies, one per friction value.
+
+Rasterized grids are cached on disk under a hash of the feature list and grid,
+so re-creating a terrain from the same random seed only loads two arrays, and
+terrains with the same key in one process share one read-only copy of them.
+"""
+import hashlib
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+TERRAIN_CACHE_DIR = os.environ.get('ENVKIT_TERRAIN_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'envkit', 'terrain'))
+BOX = 0
+CYLINDER = 1
+# PyBullet's default lateral friction, which primitive bodies get unless changed.
+DEFAULT_FRICTION = 0.5
+# How far a surface is sunk where another material's body takes over; more than PyBullet's contact threshold.
+MATERIAL_DROP = 0.1
+_shared_grids = weakref.WeakValueDictionary()
+
+
+class HeightfieldTerrain:
+    """
+    A size[0] x size[1] field centred on the origin, sampled every `cell_size`
+    metres. Features are added as top surfaces: every grid vertex inside a
+    feature's footprint is raised to the feature's top, and the highest feature
+    at a vertex sets its friction.
+
+    A PyBullet body has one friction value, so `build()` creates a heightfield
+    per material: the base one spans the field, and each other friction value
+    gets a heightfield over the bounding box of its cells. A material's body is
+    at full height on its own cells and on the ring of cells around them, and
+    sunk by MATERIAL_DROP elsewhere; the base is sunk under the material's
+    cells. Together they form exactly the rasterized surface, and friction
+    changes from one material to the next within one cell of their boundary.
+    """
+
+    def __init__(self, size, cell_size=0.5, base_height=0.0, base_friction=DEFAULT_FRICTION, restitution=0.0, cache_dir=None):
+        self.size = [float(size[0]), float(size[1])]
+        self.cell_size = float(cell_size)
+        self.base_height = float(base_height)
+        self.base_friction = float(base_friction)
+        self.restitution = float(restitution)
+        self.cache_dir = cache_dir or TERRAIN_CACHE_DIR
+        self.num_x = int(round(self.size[0] / self.cell_size)) + 1
+        self.num_y = int(round(self.size[1] / self.cell_size)) + 1
+        self.features = []
+        self.heights = None
+        self.friction = None
+        self.body_id = None
+        self.body_ids = []
+        self.body_friction = {}
+
+    def add_box(self, center, half_extents, yaw=0.0, friction=DEFAULT_FRICTION):
+        """A flat-topped block whose top is at center[2] + half_extents[2]."""
+        self.features.append([BOX, center[0], center[1], center[2] + half_extents[2], half_extents[0], half_extents[1], yaw, friction])
+
+    def add_cylinder(self, center, radius, height, friction=DEFAULT_FRICTION):
+        """A flat-topped disc whose top is at center[2] + height / 2."""
+        self.features.append([CYLINDER, center[0], center[1], center[2] + height / 2, radius, radius, 0.0, friction])
+
+    def cache_key(self):
+        digest = hashlib.sha256()
+        digest.update(np.array(self.size + [self.cell_size, self.base_height, self.base_friction], dtype=np.float64).tobytes())
+        digest.update(np.array(self.features, dtype=np.float64).reshape(-1, 8).tobytes())
+        return digest.hexdigest()[:24]
+
+    def rasterize(self):
+        """
+        Returns (heights, friction), both num_y x num_x and read-only, shared
+        with other terrains of the same key or loaded from the cache when
+        possible.
+        """
+        key = self.cache_key()
+        heights, friction = _shared_grids.get((key, 'heights')), _shared_grids.get((key, 'friction'))
+        if heights is not None and friction is not None:
+            self.heights, self.friction = heights, friction
+            return heights, friction
+        path = os.path.join(self.cache_dir, key + '.npz')
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                self.heights, self.friction = data['heights'], data['friction']
+            return self._share(key)
+        except (OSError, KeyError, ValueError):
+            pass
+        xs = np.linspace(-self.size[0] / 2, self.size[0] / 2, self.num_x)
+        ys = np.linspace(-self.size[1] / 2, self.size[1] / 2, self.num_y)
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        heights = np.full((self.num_y, self.num_x), self.base_height)
+        friction = np.full((self.num_y, self.num_x), self.base_friction)
+        for kind, x, y, top, half_x, half_y, yaw, feature_friction in self.features:
+            dx, dy = grid_x - x, grid_y - y
+            if kind == BOX:
+                cos, sin = np.cos(yaw), np.sin(yaw)
+                inside = (np.abs(cos * dx + sin * dy) <= half_x) & (np.abs(-sin * dx + cos * dy) <= half_y)
+            else:
+                inside = dx * dx + dy * dy <= half_x * half_x
+            covered = inside & (top >= heights)
+            heights[covered] = top
+            friction[covered] = feature_friction
+        self.heights, self.friction = heights, friction
+        self._save(path)
+        return self._share(key)
+
+    def _share(self, key):
+        for name in ('heights', 'friction'):
+            grid = getattr(self, name)
+            grid.setflags(write=False)
+            _shared_grids[(key, name)] = grid
+        return self.heights, self.friction
+
+    def _save(self, path):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.npz')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, heights=self.heights, friction=self.friction)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def build(self, p, color=(0.5, 0.5, 0.5, 1.0)):
+        """Creates the heightfield bodies and returns the id of the base one; `body_ids` lists them all."""
+        heights, friction = self.rasterize()
+        materials = [value for value in np.unique(friction).tolist() if value != self.base_friction]
+        base = np.array(heights)
+        for value in materials:
+            base[friction == value] -= MATERIAL_DROP
+        self.body_id = self._heightfield(p, base, 0, 0, self.base_friction, color)
+        for value in materials:
+            covered = _dilate(friction == value)
+            rows, columns = np.nonzero(_dilate(covered))
+            j0, j1, i0, i1 = rows.min(), rows.max() + 1, columns.min(), columns.max() + 1
+            patch = np.where(covered, heights, heights - MATERIAL_DROP)[j0:j1, i0:i1]
+            self._heightfield(p, patch, j0, i0, value, color)
+        return self.body_id
+
+    def _heightfield(self, p, heights, j0, i0, friction, color):
+        """A heightfield body for the block of the grid whose first vertex is (j0, i0)."""
+        num_y, num_x = heights.shape
+        collision_shape_id = p.createCollisionShape(shapeType=p.GEOM_HEIGHTFIELD, meshScale=[self.cell_size, self.cell_size, 1.0], heightfieldData=heights.ravel().tolist(), numHeightfieldRows=num_x, numHeightfieldColumns=num_y)
+        # PyBullet centres a heightfield on the middle of its grid and of its height range.
+        center = [-self.size[0] / 2 + self.cell_size * (i0 + (num_x - 1) / 2), -self.size[1] / 2 + self.cell_size * (j0 + (num_y - 1) / 2), (heights.min() + heights.max()) / 2]
+        body_id = p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=collision_shape_id, basePosition=center)
+        p.changeVisualShape(body_id, -1, rgbaColor=list(color))
+        p.changeDynamics(body_id, -1, lateralFriction=friction, restitution=self.restitution)
+        self.body_ids.append(body_id)
+        self.body_friction[body_id] = friction
+        return body_id
+
+    def cell(self, position):
+        i = int(round((position[0] + self.size[0] / 2) / self.cell_size))
+        j = int(round((position[1] + self.size[1] / 2) / self.cell_size))
+        return min(max(j, 0), self.num_y - 1), min(max(i, 0), self.num_x - 1)
+
+    def height_at(self, position):
+        return float(self.heights[self.cell(position)])
+
+    def friction_at(self, position):
+        return float(self.friction[self.cell(position)])
+
+
+def _dilate(mask):
+    """`mask` grown by one cell in all eight directions."""
+    rows = mask.copy()
+    rows[1:] |= mask[:-1]
+    rows[:-1] |= mask[1:]
+    grown = rows.copy()
+    grown[:, 1:] |= rows[:, :-1]
+    grown[:, :-1] |= rows[:, 1:]
+    return grown
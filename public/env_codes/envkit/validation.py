@@ -0,0 +1,244 @@
+"""
+Sandboxed smoke tests for generated task files.
+
+Each candidate runs in its own spawned process with CPU-time and address-space
+limits: import the task, construct its Env, reset it and take random steps. A
+pool of such processes tests many candidates at once. Verdicts are cached by
+the source hash of the task and of envkit and by the test settings, so
+unchanged tasks are never run again. Only passes and failures that rerunning
+would repeat are cached; a timeout, a sandbox kill, running out of memory or
+being too slow can depend on the load of the machine and is tested again:
+
+    python -m envkit.validation --workers 8 --steps 200
+    python -m envkit.validation candidates/task_*.py --output verdicts.json
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import resource
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from envkit.benchmark import exit_reason, sample_action
+from envkit.loader import envkit_hash, load_env_class, source_hash, task_name, task_paths
+
+VALIDATION_CACHE_DIR = os.environ.get('ENVKIT_VALIDATION_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'envkit', 'validation'))
+
+
+class SmokeTest:
+    """Settings of one smoke test; `key(path)` identifies a verdict in the cache."""
+
+    def __init__(self, steps=200, episode_steps=100, seed=0, min_steps_per_sec=20.0, cpu_seconds=60, memory_mb=4096, timeout=120.0):
+        self.steps = steps
+        self.episode_steps = episode_steps
+        self.seed = seed
+        self.min_steps_per_sec = min_steps_per_sec
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.timeout = timeout
+
+    def settings(self):
+        return {'steps': self.steps, 'episode_steps': self.episode_steps, 'seed': self.seed, 'min_steps_per_sec': self.min_steps_per_sec, 'cpu_seconds': self.cpu_seconds, 'memory_mb': self.memory_mb, 'timeout': self.timeout}
+
+    def key(self, task_hash):
+        return hashlib.sha256((task_hash + envkit_hash() + json.dumps(self.settings(), sort_keys=True)).encode()).hexdigest()[:24]
+
+
+class TooSlow(RuntimeError):
+    pass
+
+
+class VerdictCache:
+    """One JSON file per verdict under `directory`, written atomically."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or VALIDATION_CACHE_DIR
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.directory, key + '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, verdict):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.json')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(verdict, f, indent=2)
+            os.replace(tmp_path, os.path.join(self.directory, key + '.json'))
+        except OSError:
+            pass
+
+
+def run_smoke_test(path, test):
+    """
+    Runs the test in the current process and returns the verdict; exceptions
+    are recorded, not raised. `transient` marks failures that depend on the
+    machine rather than the task (too slow, out of memory, interrupted).
+    """
+    verdict = {'task': task_name(path), 'source_hash': source_hash(path), 'passed': False, 'stage': 'import', 'error': None, 'transient': False, 'steps': 0}
+    try:
+        rng = np.random.default_rng(test.seed)
+        env_class = load_env_class(path)
+        verdict['stage'] = 'construct'
+        start = time.perf_counter()
+        env = env_class(seed=test.seed)
+        verdict['construction_s'] = time.perf_counter() - start
+        verdict['stage'] = 'reset'
+        start = time.perf_counter()
+        env.reset()
+        verdict['reset_s'] = time.perf_counter() - start
+        verdict['stage'] = 'step'
+        step_s = 0.0
+        step_budget_s = test.steps / test.min_steps_per_sec
+        episode_length = 0
+        for _ in range(test.steps):
+            action = sample_action(env.action_space, rng)
+            start = time.perf_counter()
+            _, reward, terminated, truncated, _ = env.step(action)
+            step_s += time.perf_counter() - start
+            verdict['steps'] += 1
+            if not np.isfinite(reward):
+                raise ValueError('Non-finite reward {!r} at step {}'.format(reward, verdict['steps']))
+            if step_s > step_budget_s:
+                raise TooSlow('Too slow: {} steps took {:.1f} s, the budget for {} steps is {:.1f} s'.format(verdict['steps'], step_s, test.steps, step_budget_s))
+            episode_length += 1
+            if terminated or truncated or episode_length >= test.episode_steps:
+                env.reset()
+                episode_length = 0
+        verdict['steps_per_sec'] = test.steps / step_s if step_s > 0.0 else float('inf')
+        if verdict['steps_per_sec'] < test.min_steps_per_sec:
+            raise TooSlow('Too slow: {:.1f} steps/s, need {:.1f}'.format(verdict['steps_per_sec'], test.min_steps_per_sec))
+        verdict['stage'] = 'done'
+        verdict['passed'] = True
+    except BaseException as error:
+        verdict['error'] = traceback.format_exc()
+        verdict['transient'] = isinstance(error, (TooSlow, MemoryError, KeyboardInterrupt))
+    verdict['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return verdict
+
+
+def _sandboxed(remote, path, test):
+    resource.setrlimit(resource.RLIMIT_CPU, (test.cpu_seconds, test.cpu_seconds + 5))
+    memory = test.memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    remote.send(run_smoke_test(path, test))
+    remote.close()
+
+
+def _exit_reason(code):
+    if code is not None and -code == signal.SIGXCPU:
+        return 'CPU limit exceeded'
+    return exit_reason(code)
+
+
+def _failed(path, task_hash, error):
+    return {'task': task_name(path), 'source_hash': task_hash, 'passed': False, 'stage': 'sandbox', 'error': error, 'transient': True, 'steps': 0}
+
+
+def validate(paths, test=None, num_workers=None, cache=None, use_cache=True):
+    """
+    Smoke-tests `paths` in up to `num_workers` sandboxed processes at once and
+    returns their verdicts in order. Cached verdicts are reused and marked
+    `cached`; new ones are stored in `cache` (a VerdictCache) unless they are
+    `transient`: timeouts and kills by the sandbox limits are always transient.
+    """
+    test = test or SmokeTest()
+    cache = cache or VerdictCache()
+    num_workers = num_workers or os.cpu_count()
+    verdicts = [None] * len(paths)
+    pending = []
+    for index, path in enumerate(paths):
+        task_hash = source_hash(path)
+        key = test.key(task_hash)
+        cached = cache.get(key) if use_cache else None
+        if cached is not None:
+            verdicts[index] = dict(cached, cached=True)
+        else:
+            pending.append((index, path, task_hash, key))
+    context = mp.get_context('spawn')
+    running = {}
+    pending.reverse()
+    while pending or running:
+        while pending and len(running) < num_workers:
+            index, path, task_hash, key = pending.pop()
+            reader, writer = context.Pipe(duplex=False)
+            process = context.Process(target=_sandboxed, args=(writer, path, test), daemon=True)
+            process.start()
+            writer.close()
+            running[reader] = (process, index, path, task_hash, key, time.monotonic())
+        now = time.monotonic()
+        deadline = min(started + test.timeout for _, _, _, _, _, started in running.values())
+        ready = wait(list(running) + [entry[0].sentinel for entry in running.values()], timeout=max(deadline - now, 0.0))
+        now = time.monotonic()
+        for reader, (process, index, path, task_hash, key, started) in list(running.items()):
+            verdict = None
+            if reader in ready or process.sentinel in ready:
+                try:
+                    verdict = reader.recv()
+                except (EOFError, OSError):
+                    process.join(1.0)
+                    verdict = _failed(path, task_hash, _exit_reason(process.exitcode))
+            elif now - started > test.timeout:
+                process.kill()
+                verdict = _failed(path, task_hash, 'timed out after {:.0f} s'.format(test.timeout))
+            if verdict is None:
+                continue
+            del running[reader]
+            reader.close()
+            process.join(1.0)
+            if process.is_alive():
+                process.kill()
+            verdict['wall_s'] = now - started
+            if not verdict['transient']:
+                cache.put(key, verdict)
+            verdicts[index] = dict(verdict, cached=False)
+    return verdicts
+
+
+def format_table(verdicts):
+    lines = ['{:<12} {:<6} {:>10} {:>10} {:>9}  {}'.format('task', 'result', 'steps/s', 'build ms', 'rss MB', 'detail')]
+    for verdict in verdicts:
+        detail = verdict['error'].strip().splitlines()[-1] if verdict['error'] else ''
+        if verdict.get('cached'):
+            detail = ('cached ' + detail).strip()
+        lines.append('{:<12} {:<6} {:>10.1f} {:>10.1f} {:>9.1f}  {}'.format(verdict['task'], 'pass' if verdict['passed'] else 'FAIL', verdict.get('steps_per_sec', 0.0), verdict.get('construction_s', 0.0) * 1e3, verdict.get('peak_rss_mb', 0.0), detail))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Smoke-test task files in sandboxed processes.')
+    parser.add_argument('paths', nargs='*', help='task files (default: every task in long_run)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--episode-steps', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-steps-per-sec', type=float, default=20.0)
+    parser.add_argument('--cpu-seconds', type=int, default=60)
+    parser.add_argument('--memory-mb', type=int, default=4096)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--no-cache', action='store_true', help='re-test every task (verdicts are still stored)')
+    parser.add_argument('--output', help='write verdicts as JSON')
+    args = parser.parse_args(argv)
+    test = SmokeTest(args.steps, args.episode_steps, args.seed, args.min_steps_per_sec, args.cpu_seconds, args.memory_mb, args.timeout)
+    verdicts = validate(args.paths or task_paths(), test, args.workers, VerdictCache(args.cache_dir), use_cache=not args.no_cache)
+    print(format_table(verdicts))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(verdicts, f, indent=2)
+    return 0 if all(verdict['passed'] for verdict in verdicts) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
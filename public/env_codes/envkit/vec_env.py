@@ -0,0 +1,216 @@
+import multiprocessing as mp
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from envkit.batched import BatchedRewards
+from envkit.lidar import with_lidar
+from envkit.loader import load_env_class, task_imports
+
+
+def _attach(name, shape, dtype):
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _worker(remote, env_path, env_kwargs, first_index, num_envs, seed, lidar, batched_rewards):
+    envs = []
+    memories = []
+    try:
+        env_class = load_env_class(env_path)
+        if lidar is not None:
+            env_class = with_lidar(env_class, **lidar)
+        envs = [env_class(**env_kwargs) if seed is None else env_class(seed=seed + first_index + i, **env_kwargs) for i in range(num_envs)]
+        batched = BatchedRewards(envs) if batched_rewards else None
+        observations = [np.asarray(env.reset()) for env in envs]
+        remote.send(('spec', (observations[0].shape, observations[0].dtype, getattr(envs[0], 'observation_space', None), getattr(envs[0], 'action_space', None))))
+        layout = remote.recv()
+        buffers = {}
+        for key, (name, shape, dtype) in layout.items():
+            memory, array = _attach(name, shape, dtype)
+            memories.append(memory)
+            buffers[key] = array[first_index:first_index + num_envs]
+        for i, observation in enumerate(observations):
+            buffers['observations'][i] = observation
+        remote.send(('ready', None))
+        while True:
+            command, data = remote.recv()
+            if command == 'step':
+                results = batched.step(buffers['actions']) if batched is not None else [env.step(buffers['actions'][i]) for i, env in enumerate(envs)]
+                infos = []
+                for i, (env, (observation, reward, terminated, truncated, info)) in enumerate(zip(envs, results)):
+                    if terminated or truncated:
+                        info = dict(info, final_observation=np.asarray(observation))
+                        observation = env.reset()
+                    buffers['observations'][i] = observation
+                    buffers['rewards'][i] = reward
+                    buffers['terminated'][i] = terminated
+                    buffers['truncated'][i] = truncated
+                    infos.append(info)
+                remote.send(('infos', infos))
+            elif command == 'reset':
+                for i, env in enumerate(envs):
+                    buffers['observations'][i] = env.reset()
+                remote.send(('ready', None))
+            elif command == 'memory':
+                from envkit.memory import memory_usage
+                remote.send(('memory', memory_usage()))
+            elif command == 'call':
+                method, args, kwargs = data
+                remote.send(('results', [getattr(env, method)(*args, **kwargs) for env in envs]))
+            elif command == 'close':
+                break
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        remote.send(('error', traceback.format_exc()))
+    finally:
+        for env in envs:
+            close = getattr(env, 'close', None)
+            if close is not None:
+                close()
+        for memory in memories:
+            memory.close()
+        remote.close()
+
+
+class VecEnv:
+    """
+    Runs `num_workers * envs_per_worker` copies of a long_run task in lockstep.
+
+    Every worker process hosts `envs_per_worker` environments, each with its own
+    physics client, and writes observations, rewards and done flags straight into
+    shared memory. Finished environments are reset automatically; the last
+    observation of the finished episode is passed back in its info dict under
+    `final_observation`. Arrays returned by `reset()` and `step()` are views
+    into shared memory and are overwritten by the next step. With `seed`, the
+    environment at index i is constructed with seed `seed + i`, so every copy
+    draws from its own RNG stream. With `lidar`, a dict of Lidar arguments,
+    every environment is wrapped by `with_lidar` so observations end with a
+    range scan. With `batched_rewards`, each worker evaluates the rewards,
+    termination and success of its environments together from the task's
+    `reward_terms` (see envkit.batched) after all of them have stepped.
+
+    Each worker holds one Python interpreter plus one physics client per
+    environment, so hosting several environments per worker is the main lever
+    on memory. `low_memory` also starts the workers from a forkserver that has
+    already imported numpy, pybullet, envkit and the task's own imports, so
+    the workers share those pages instead of each importing them again.
+    `memory_usage()` reports what every worker actually uses.
+    """
+
+    def __init__(self, env_path, num_workers=None, envs_per_worker=1, env_kwargs=None, start_method='spawn', seed=None, lidar=None, batched_rewards=False, low_memory=False):
+        self.num_workers = num_workers or mp.cpu_count()
+        self.envs_per_worker = envs_per_worker
+        self.num_envs = self.num_workers * envs_per_worker
+        self.closed = False
+        self._memories = []
+        self._waiting = False
+        if low_memory:
+            from envkit.memory import PRELOAD_MODULES
+            context = mp.get_context('forkserver')
+            context.set_forkserver_preload(list(PRELOAD_MODULES) + task_imports(env_path))
+        else:
+            context = mp.get_context(start_method)
+        self._remotes = []
+        self._processes = []
+        for worker_index in range(self.num_workers):
+            remote, worker_remote = context.Pipe()
+            process = context.Process(target=_worker, args=(worker_remote, env_path, env_kwargs or {}, worker_index * envs_per_worker, envs_per_worker, seed, lidar, batched_rewards), daemon=True)
+            process.start()
+            worker_remote.close()
+            self._remotes.append(remote)
+            self._processes.append(process)
+        observation_shape, observation_dtype, self.observation_space, self.action_space = self._receive_all('spec')[0]
+        action_shape = getattr(self.action_space, 'shape', None) or ()
+        action_dtype = getattr(self.action_space, 'dtype', None) or np.float32
+        layout = {
+            'observations': ((self.num_envs,) + tuple(observation_shape), observation_dtype),
+            'actions': ((self.num_envs,) + tuple(action_shape), action_dtype),
+            'rewards': ((self.num_envs,), np.float64),
+            'terminated': ((self.num_envs,), np.bool_),
+            'truncated': ((self.num_envs,), np.bool_),
+        }
+        shared_layout = {}
+        for key, (shape, dtype) in layout.items():
+            dtype = np.dtype(dtype)
+            memory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+            self._memories.append(memory)
+            setattr(self, key, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+            shared_layout[key] = (memory.name, shape, dtype)
+        for remote in self._remotes:
+            remote.send(shared_layout)
+        self._receive_all('ready')
+
+    def _receive_all(self, expected):
+        results = []
+        for remote in self._remotes:
+            tag, data = remote.recv()
+            if tag == 'error':
+                self.close()
+                raise RuntimeError('VecEnv worker failed:\n{}'.format(data))
+            if tag != expected:
+                raise RuntimeError('VecEnv worker sent {!r}, expected {!r}'.format(tag, expected))
+            results.append(data)
+        return results
+
+    def reset(self):
+        for remote in self._remotes:
+            remote.send(('reset', None))
+        self._receive_all('ready')
+        return self.observations
+
+    def step_async(self, actions):
+        self.actions[...] = actions
+        for remote in self._remotes:
+            remote.send(('step', None))
+        self._waiting = True
+
+    def step_wait(self):
+        infos = [info for worker_infos in self._receive_all('infos') for info in worker_infos]
+        self._waiting = False
+        return self.observations, self.rewards, self.terminated, self.truncated, infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def env_method(self, method, *args, **kwargs):
+        """Calls `method` on every environment and returns the results in env order."""
+        for remote in self._remotes:
+            remote.send(('call', (method, args, kwargs)))
+        return [result for worker_results in self._receive_all('results') for result in worker_results]
+
+    def memory_usage(self):
+        """memory_usage() of every worker process, with its share per environment under `pss_mb_per_env`."""
+        for remote in self._remotes:
+            remote.send(('memory', None))
+        return [dict(usage, envs=self.envs_per_worker, pss_mb_per_env=usage['pss_mb'] / self.envs_per_worker) for usage in self._receive_all('memory')]
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for remote in self._remotes:
+            try:
+                remote.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        for memory in self._memories:
+            memory.close()
+            memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
@@ -1,6 +1,12 @@
 import os
 import numpy as np
 from oped.envs.r2d2.base import R2D2Env
+from envkit.shapes import ShapeFactory
+from envkit.scene import SceneCache
+from envkit.pool import BodyPool
+from envkit.snapshot import ResetSnapshot, reseed
+from envkit.state import StateSnapshot
+from envkit.contacts import ContactCache
 
 class Env(R2D2Env):
     """
@@ -33,8 +39,16 @@ class Env(R2D2Env):
     The episode ends if the robot falls off the platforms or conveyor belt, or if the time limit is reached.
     """
 
-    def __init__(self):
+    fast_reset = False
+    clone_state_attributes = ('time', 'num_items_delivered', 'next_dispense_time', 'item_pool', 'item_targets', 'state')
+    precompiled_scene = False
+    scene_bodies = ('left_platform_id', 'right_platform_id', 'conveyor_id', 'target_ids')
+
+    def __init__(self, seed=None):
         super().__init__()
+        self.rng = np.random.default_rng(seed)
+        self.shapes = ShapeFactory(self._p)
+        self.scene_cache = SceneCache(self.shapes, __file__, enabled=self.precompiled_scene)
         self.platform_size = [5.0, 5.0, 0.5]
         self.conveyor_size = [5.0, 1.0, 0.2]
         self.conveyor_speed = 0.5
@@ -44,76 +58,91 @@ class Env(R2D2Env):
         self.target_positions = [[3.5, 1.5, 0.26], [3.5, 0.0, 0.26], [3.5, -1.5, 0.26]]
         self.dispenser_position = [-2.0, 0.0, 1.0]
         self.dispense_interval_range = [2.0, 5.0]
+        self.item_pool_size = 16
         self.left_platform_position = [-2.5, 0.0, 0.0]
-        self.left_platform_id = self.create_box(0.0, [self.platform_size[0] / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], self.left_platform_position, [0.8, 0.8, 0.8, 1.0])
         self.right_platform_position = [2.5, 0.0, 0.0]
-        self.right_platform_id = self.create_box(0.0, [self.platform_size[0] / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], self.right_platform_position, [0.8, 0.8, 0.8, 1.0])
         self.conveyor_position = [0.0, 0.0, self.platform_size[2] / 2 + self.conveyor_size[2] / 2]
-        self.conveyor_id = self.create_box(0.0, [self.conveyor_size[0] / 2, self.conveyor_size[1] / 2, self.conveyor_size[2] / 2], self.conveyor_position, [0.3, 0.3, 0.3, 1.0])
-        self.target_ids = []
-        for position, color in zip(self.target_positions, self.item_colors):
-            target_id = self.create_box(0.0, [self.target_size[0] / 2, self.target_size[1] / 2, self.target_size[2] / 2], position, color + [0.5])
-            self.target_ids.append(target_id)
-        self.item_ids = []
+        self.scene_cache.build(self, self.build_scene, self.scene_bodies)
+        self.item_pool = BodyPool(self._p, self.shapes, self._p.GEOM_BOX, [self.item_size[0] / 2, self.item_size[1] / 2, self.item_size[2] / 2], mass=1.0, size=self.item_pool_size, grow=self.item_pool_size)
+        self.item_ids = self.item_pool.active
+        # Index of the target matching each active item's colour.
+        self.item_targets = {}
+        self.state = StateSnapshot(self._p)
+        self.contacts = ContactCache(self._p)
+        self.reset_snapshot = ResetSnapshot(self._p, enabled=self.fast_reset)
+        self.target_indices = {target_id: j for j, target_id in enumerate(self.target_ids)}
         self.robot_position_init = [self.left_platform_position[0], self.left_platform_position[1], self.platform_size[2] + self.robot.links['base'].position_init[2] + 0.1]
         self.time_limit = 3 * 60
         self.num_items_delivered = 0
         self.next_dispense_time = None
 
-    def create_box(self, mass, half_extents, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
+    def build_scene(self):
+        self.left_platform_id = self.shapes.create_box(0.0, [self.platform_size[0] / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], self.left_platform_position, [0.8, 0.8, 0.8, 1.0])
+        self.right_platform_id = self.shapes.create_box(0.0, [self.platform_size[0] / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], self.right_platform_position, [0.8, 0.8, 0.8, 1.0])
+        self.conveyor_id = self.shapes.create_box(0.0, [self.conveyor_size[0] / 2, self.conveyor_size[1] / 2, self.conveyor_size[2] / 2], self.conveyor_position, [0.3, 0.3, 0.3, 1.0])
+        self.target_ids = []
+        for position, color in zip(self.target_positions, self.item_colors):
+            target_id = self.shapes.create_box(0.0, [self.target_size[0] / 2, self.target_size[1] / 2, self.target_size[2] / 2], position, color + [0.5])
+            self.target_ids.append(target_id)
+
+    def remove_item(self, item_id):
+        self.item_pool.release(item_id)
+        self.item_targets.pop(item_id, None)
+        self.state.untrack(item_id)
+
+    def place_bodies(self):
+        self._p.resetBasePositionAndOrientation(self.robot.robot_id, self.robot_position_init, self.robot.links['base'].orientation_init)
 
-    def reset(self):
+    def reset(self, seed=None):
+        reseed(self, seed)
         observation = super().reset()
         self.time = 0.0
         self.num_items_delivered = 0
-        self.next_dispense_time = self.time + np.random.uniform(*self.dispense_interval_range)
-        for item_id in self.item_ids:
-            self._p.removeBody(item_id)
-        self.item_ids = []
-        self._p.resetBasePositionAndOrientation(self.robot.robot_id, self.robot_position_init, self.robot.links['base'].orientation_init)
+        self.next_dispense_time = self.time + self.rng.uniform(*self.dispense_interval_range)
+        for item_id in list(self.item_ids):
+            self.remove_item(item_id)
+        self.reset_snapshot.restore_or_place(self.place_bodies)
+        self.state.invalidate()
+        self.contacts.invalidate()
         return observation
 
     def step(self, action):
         self.conveyor_velocity = [self.conveyor_speed, 0.0, 0.0]
-        for item_id in self.item_ids:
-            item_position, _ = self._p.getBasePositionAndOrientation(item_id)
+        for item_id in list(self.item_ids):
+            item_position = self.state.position(item_id)
             self._p.resetBaseVelocity(item_id, self.conveyor_velocity, [0.0, 0.0, 0.0])
             if item_position[0] > self.right_platform_position[0] + self.platform_size[0] / 2:
-                self._p.removeBody(item_id)
-                self.item_ids.remove(item_id)
+                self.remove_item(item_id)
         if self.time >= self.next_dispense_time:
-            self.next_dispense_time += np.random.uniform(*self.dispense_interval_range)
-            color_index = np.random.randint(len(self.item_colors))
-            item_id = self.create_box(1.0, [self.item_size[0] / 2, self.item_size[1] / 2, self.item_size[2] / 2], self.dispenser_position, self.item_colors[color_index] + [1.0])
-            self.item_ids.append(item_id)
+            self.next_dispense_time += self.rng.uniform(*self.dispense_interval_range)
+            color_index = self.rng.integers(len(self.item_colors))
+            item_id = self.item_pool.acquire(self.dispenser_position, color=self.item_colors[color_index] + [1.0])
+            self.item_targets[item_id] = color_index
+            self.state.track(item_id)
+        self.state.invalidate()
+        self.contacts.invalidate()
         observation, reward, terminated, truncated, info = super().step(action)
         self.time += self.dt
         return (observation, reward, terminated, truncated, info)
 
     def get_task_rewards(self, action):
         pick_up_reward = 0.0
-        if len(self._p.getContactPoints(bodyA=self.robot.robot_id, linkIndexA=-1)) > 0:
+        if self.contacts.in_contact(self.robot.robot_id, link_a=-1):
             for item_id in self.item_ids:
-                if len(self._p.getContactPoints(bodyA=self.robot.robot_id, bodyB=item_id, linkIndexA=-1)) > 0:
+                if self.contacts.in_contact(self.robot.robot_id, item_id, link_a=-1):
                     pick_up_reward = 1.0
                     break
         delivery_reward = 0.0
         wrong_delivery_penalty = 0.0
-        for i, item_id in enumerate(self.item_ids):
-            item_position, _ = self._p.getBasePositionAndOrientation(item_id)
-            for j, target_id in enumerate(self.target_ids):
-                if len(self._p.getContactPoints(bodyA=item_id, bodyB=target_id)) > 0:
-                    if i == j:
-                        delivery_reward = 10.0
-                        self.num_items_delivered += 1
-                    else:
-                        wrong_delivery_penalty = -1.0
-                    self._p.removeBody(item_id)
-                    self.item_ids.remove(item_id)
-                    break
+        for item_id in list(self.item_ids):
+            touched_targets = [self.target_indices[body_id] for body_id in self.contacts.touching(item_id) if body_id in self.target_indices]
+            if touched_targets:
+                if self.item_targets[item_id] == min(touched_targets):
+                    delivery_reward = 10.0
+                    self.num_items_delivered += 1
+                else:
+                    wrong_delivery_penalty = -1.0
+                self.remove_item(item_id)
         fall_off_penalty = 0.0
         robot_position = self.robot.links['base'].position
         if robot_position[2] < 0.0:
@@ -1,5 +1,10 @@
 import numpy as np
 from oped.envs.r2d2.base import R2D2Env
+from envkit.shapes import ShapeFactory
+from envkit.kinematics import KinematicTracks, PingPongTrack, RotationTrack
+from envkit.snapshot import ResetSnapshot, reseed
+from envkit.state import StateSnapshot, StepValues
+from envkit.contacts import ContactCache
 
 class Env(R2D2Env):
     """
@@ -18,15 +23,21 @@ class Env(R2D2Env):
     Passing through a gate awards 2 points if the ball subsequently stops in the correct target zone, and 1 point otherwise. The episode ends when the ball passes through all gates, or a maximum time limit is reached. The robot should aim to maximize its total score.
     """
 
-    def __init__(self):
+    fast_reset = False
+    clone_state_attributes = ('time', 'steps', 'gate_counter', 'score', 'ball_velocity_init', 'ball_delay', 'kinematics')
+    step_values = StepValues(ball_position=3, ball_velocity=3)
+
+    def __init__(self, seed=None):
         super().__init__()
+        self.rng = np.random.default_rng(seed)
+        self.shapes = ShapeFactory(self._p)
         self.ground_size = [100.0, 100.0, 0.1]
         self.ground_position = [0.0, 0.0, 0.0]
-        self.ground_id = self.create_box(mass=0.0, half_extents=[self.ground_size[0] / 2, self.ground_size[1] / 2, self.ground_size[2] / 2], position=self.ground_position, color=[0.5, 0.5, 0.5, 1.0])
-        self._p.changeDynamics(bodyUniqueId=self.ground_id, linkIndex=-1, lateralFriction=0.8, restitution=0.5)
+        self.ground_id = self.shapes.create_box(mass=0.0, half_extents=[self.ground_size[0] / 2, self.ground_size[1] / 2, self.ground_size[2] / 2], position=self.ground_position, color=[0.5, 0.5, 0.5, 1.0])
+        self.shapes.change_dynamics(self.ground_id, lateralFriction=0.8, restitution=0.5)
         self.ball_radius = 0.5
         self.ball_position_init = [0.0, 0.0, self.ground_size[2] / 2 + self.ball_radius]
-        self.ball_id = self.create_sphere(mass=1.0, radius=self.ball_radius, position=self.ball_position_init, color=[1.0, 0.0, 0.0, 1.0])
+        self.ball_id = self.shapes.create_sphere(mass=1.0, radius=self.ball_radius, position=self.ball_position_init, color=[1.0, 0.0, 0.0, 1.0])
         self.num_gates = 5
         self.gate_width = 1.0
         self.gate_height = 3.0
@@ -34,16 +45,18 @@ class Env(R2D2Env):
         self.gate_ids = []
         self.gate_positions_init = []
         self.gate_velocities = []
+        gate_post_positions = []
         for _ in range(self.num_gates):
-            gate_x = np.random.uniform(5.0, 25.0)
-            gate_y = np.random.uniform(-5.0, 5.0)
+            gate_x = self.rng.uniform(5.0, 25.0)
+            gate_y = self.rng.uniform(-5.0, 5.0)
             gate_position_init = [gate_x, gate_y, self.ground_size[2] / 2 + self.gate_height / 2]
             self.gate_positions_init.append(gate_position_init)
-            gate_left_id = self.create_box(mass=0.0, half_extents=[self.gate_thickness / 2, self.gate_width / 2, self.gate_height / 2], position=[gate_position_init[0], gate_position_init[1] - self.gate_width / 2, gate_position_init[2]], color=[0.0, 0.0, 1.0, 1.0])
-            gate_right_id = self.create_box(mass=0.0, half_extents=[self.gate_thickness / 2, self.gate_width / 2, self.gate_height / 2], position=[gate_position_init[0], gate_position_init[1] + self.gate_width / 2, gate_position_init[2]], color=[0.0, 0.0, 1.0, 1.0])
-            self.gate_ids.append((gate_left_id, gate_right_id))
-            gate_velocity = np.random.uniform(0.2, 1.0) * np.random.choice([-1.0, 1.0])
+            gate_post_positions.append([gate_position_init[0], gate_position_init[1] - self.gate_width / 2, gate_position_init[2]])
+            gate_post_positions.append([gate_position_init[0], gate_position_init[1] + self.gate_width / 2, gate_position_init[2]])
+            gate_velocity = self.rng.uniform(0.2, 1.0) * self.rng.choice([-1.0, 1.0])
             self.gate_velocities.append(gate_velocity)
+        gate_post_ids = self.shapes.create_boxes(mass=0.0, half_extents=[self.gate_thickness / 2, self.gate_width / 2, self.gate_height / 2], positions=gate_post_positions, color=[0.0, 0.0, 1.0, 1.0])
+        self.gate_ids = list(zip(gate_post_ids[0::2], gate_post_ids[1::2]))
         self.num_targets = 5
         self.target_radius = 2.0
         self.target_height = 0.1
@@ -51,55 +64,54 @@ class Env(R2D2Env):
         self.target_positions_init = []
         self.target_angular_velocities = []
         for _ in range(self.num_targets):
-            target_x = np.random.uniform(10.0, 30.0)
-            target_y = np.random.uniform(-10.0, 10.0)
+            target_x = self.rng.uniform(10.0, 30.0)
+            target_y = self.rng.uniform(-10.0, 10.0)
             target_position_init = [target_x, target_y, self.ground_size[2] / 2 + self.target_height / 2]
             self.target_positions_init.append(target_position_init)
-            target_id = self.create_cylinder(mass=0.0, radius=self.target_radius, height=self.target_height, position=target_position_init, color=[0.0, 1.0, 0.0, 1.0])
+            target_id = self.shapes.create_cylinder(mass=0.0, radius=self.target_radius, height=self.target_height, position=target_position_init, color=[0.0, 1.0, 0.0, 1.0])
             self.target_ids.append(target_id)
-            target_angular_velocity = np.random.uniform(0.1, 0.5) * np.random.choice([-1.0, 1.0])
+            target_angular_velocity = self.rng.uniform(0.1, 0.5) * self.rng.choice([-1.0, 1.0])
             self.target_angular_velocities.append(target_angular_velocity)
+        self.kinematics = KinematicTracks(self._p)
+        self.gate_track = self.kinematics.add(PingPongTrack(self.gate_positions_init, axis=[0.0, 1.0, 0.0], speeds=self.gate_velocities, extents=5.0))
+        for i, (gate_left_id, gate_right_id) in enumerate(self.gate_ids):
+            self.gate_track.attach(i, gate_left_id, [0.0, -self.gate_width / 2, 0.0])
+            self.gate_track.attach(i, gate_right_id, [0.0, self.gate_width / 2, 0.0])
+        self.gate_velocities = self.gate_track.speeds
+        self.target_track = self.kinematics.add(RotationTrack(self.target_positions_init, self.target_angular_velocities))
+        for i, target_id in enumerate(self.target_ids):
+            self.target_track.attach(i, target_id)
+        self.target_angular_velocities = self.target_track.angular_velocities
         self.robot_position_init = [self.ball_position_init[0] - 3.0, self.ball_position_init[1], self.ground_size[2] / 2 + self.robot.links['base'].position_init[2]]
         self.robot_orientation_init = self._p.getQuaternionFromEuler([0.0, 0.0, 0.0])
         self.max_steps = 2000
+        self.contacts = ContactCache(self._p)
+        self.reset_snapshot = ResetSnapshot(self._p, enabled=self.fast_reset)
+        self.state = StateSnapshot(self._p, [self.ball_id])
         self.gate_counter = 0
         self.score = 0
 
-    def create_box(self, mass, half_extents, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
-
-    def create_sphere(self, mass, radius, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_SPHERE, radius=radius)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_SPHERE, radius=radius, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
-
-    def create_cylinder(self, mass, radius, height, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_CYLINDER, radius=radius, height=height)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_CYLINDER, radius=radius, length=height, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
-
     def get_object_position(self, object_id):
-        return np.asarray(self._p.getBasePositionAndOrientation(object_id)[0])
+        return self.state.position(object_id)
 
     def get_object_velocity(self, object_id):
-        return np.asarray(self._p.getBaseVelocity(object_id)[0])
+        return self.state.velocity(object_id)
 
-    def reset(self):
-        observation = super().reset()
-        self.ball_velocity_init = [np.random.uniform(1.0, 2.0), 0.0, 0.0]
-        self.ball_delay = np.random.uniform(1.0, 2.0)
+    def place_bodies(self):
         self._p.resetBasePositionAndOrientation(self.ball_id, self.ball_position_init, [0.0, 0.0, 0.0, 1.0])
         self._p.resetBaseVelocity(self.ball_id, [0.0, 0.0, 0.0], [0.0, 0.0, 0.0])
-        for i, (gate_left_id, gate_right_id) in enumerate(self.gate_ids):
-            gate_position_init = self.gate_positions_init[i]
-            self._p.resetBasePositionAndOrientation(gate_left_id, [gate_position_init[0], gate_position_init[1] - self.gate_width / 2, gate_position_init[2]], [0.0, 0.0, 0.0, 1.0])
-            self._p.resetBasePositionAndOrientation(gate_right_id, [gate_position_init[0], gate_position_init[1] + self.gate_width / 2, gate_position_init[2]], [0.0, 0.0, 0.0, 1.0])
-        for i, target_id in enumerate(self.target_ids):
-            target_position_init = self.target_positions_init[i]
-            self._p.resetBasePositionAndOrientation(target_id, target_position_init, [0.0, 0.0, 0.0, 1.0])
+        self.kinematics.apply()
         self._p.resetBasePositionAndOrientation(self.robot.robot_id, self.robot_position_init, self.robot_orientation_init)
+
+    def reset(self, seed=None):
+        reseed(self, seed)
+        observation = super().reset()
+        self.ball_velocity_init = [self.rng.uniform(1.0, 2.0), 0.0, 0.0]
+        self.ball_delay = self.rng.uniform(1.0, 2.0)
+        self.kinematics.reset()
+        self.reset_snapshot.restore_or_place(self.place_bodies)
+        self.state.invalidate()
+        self.contacts.invalidate()
         self.time = 0.0
         self.steps = 0
         self.gate_counter = 0
@@ -109,32 +121,22 @@ class Env(R2D2Env):
     def step(self, action):
         self.ball_position = self.get_object_position(self.ball_id)
         self.ball_velocity = self.get_object_velocity(self.ball_id)
+        self.state.invalidate()
+        self.contacts.invalidate()
         observation, reward, terminated, truncated, info = super().step(action)
         self.time += self.dt
         self.steps += 1
         if self.time > self.ball_delay:
             self._p.resetBaseVelocity(self.ball_id, self.ball_velocity_init, [0.0, 0.0, 0.0])
-        for i, (gate_left_id, gate_right_id) in enumerate(self.gate_ids):
-            gate_position = self.get_object_position(gate_left_id)
-            gate_velocity = self.gate_velocities[i]
-            if abs(gate_position[1] - self.gate_positions_init[i][1]) > 5.0:
-                gate_velocity *= -1.0
-                self.gate_velocities[i] = gate_velocity
-            new_gate_position = [gate_position[0], gate_position[1] + gate_velocity * self.dt, gate_position[2]]
-            self._p.resetBasePositionAndOrientation(gate_left_id, [new_gate_position[0], new_gate_position[1] - self.gate_width / 2, new_gate_position[2]], [0.0, 0.0, 0.0, 1.0])
-            self._p.resetBasePositionAndOrientation(gate_right_id, [new_gate_position[0], new_gate_position[1] + self.gate_width / 2, new_gate_position[2]], [0.0, 0.0, 0.0, 1.0])
-        for i, target_id in enumerate(self.target_ids):
-            target_position = self.get_object_position(target_id)
-            target_angular_velocity = self.target_angular_velocities[i]
-            target_orientation = self._p.getQuaternionFromEuler([0.0, 0.0, target_angular_velocity * self.time])
-            self._p.resetBasePositionAndOrientation(target_id, target_position, target_orientation)
+        self.kinematics.update(self.time, self.dt)
+        self.state.invalidate()
         return (observation, reward, terminated, truncated, info)
 
     def get_task_rewards(self, action):
         gate_reward = 0.0
         if self.gate_counter < self.num_gates:
             gate_left_id, gate_right_id = self.gate_ids[self.gate_counter]
-            if len(self._p.getContactPoints(bodyA=self.ball_id, bodyB=gate_left_id)) > 0 or len(self._p.getContactPoints(bodyA=self.ball_id, bodyB=gate_right_id)) > 0:
+            if self.contacts.in_contact(self.ball_id, gate_left_id) or self.contacts.in_contact(self.ball_id, gate_right_id):
                 self.gate_counter += 1
                 if self.gate_counter < self.num_targets:
                     target_id = self.target_ids[self.gate_counter - 1]
@@ -1,5 +1,11 @@
 import numpy as np
 from oped.envs.r2d2.base import R2D2Env
+from envkit.shapes import ShapeFactory
+from envkit.scene import SceneCache
+from envkit.snapshot import ResetSnapshot, reseed
+from envkit.compaction import StaticScenery
+from envkit.batched import RewardTerms
+from envkit.state import StepValues
 
 class Env(R2D2Env):
     """
@@ -29,29 +35,54 @@ class Env(R2D2Env):
     The episode ends if the robot falls into a gap, flips over, or reaches the end of the platform.
     """
 
-    def __init__(self):
+    fast_reset = False
+    clone_state_attributes = ('time',)
+    compact_static = False
+    precompiled_scene = False
+    scene_bodies = ('platform_id', 'gap_ids')
+    step_values = StepValues(position=3)
+    reward_terms = RewardTerms(
+        fields={'position': lambda env: env.robot.links['base'].position, 'previous_position': 'position'},
+        constants={'gap_x': lambda env: [gap_position[0] for gap_position in env.gap_positions], 'end_x': lambda env: env.platform_size[0] / 2, 'floor_z': lambda env: env.platform_position[2]},
+        derived={'at_end': lambda b: b.position[:, 0] > b.end_x},
+        rewards={
+            'survival': lambda b: 1.0,
+            'gap_reward': lambda b: np.sum((b.previous_position[:, :1] < b.gap_x) & (b.position[:, :1] >= b.gap_x), axis=1),
+            'end_reward': lambda b: np.where(b.at_end, 10.0, 0.0)},
+        terminated=lambda b: (b.position[:, 2] < b.floor_z) | b.at_end,
+        success=lambda b: b.at_end)
+
+    def __init__(self, seed=None):
         super().__init__()
+        self.shapes = ShapeFactory(self._p)
+        self.scene_cache = SceneCache(self.shapes, __file__, enabled=self.precompiled_scene)
         self.platform_size = [10.0, 10.0, 0.1]
         self.platform_position = [0.0, 0.0, 0.0]
-        self.platform_id = self.create_box(mass=0.0, half_extents=[self.platform_size[0] / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], position=self.platform_position, color=[0.5, 0.5, 0.5, 1.0])
-        self._p.changeDynamics(bodyUniqueId=self.platform_id, linkIndex=-1, lateralFriction=0.8, restitution=0.5)
         self.gap_widths = [0.5, 0.5, 0.5, 1.0, 1.0, 1.5]
         self.gap_positions = [[1.5, 0.0, self.platform_position[2] + self.platform_size[2] / 2], [3.5, 0.0, self.platform_position[2] + self.platform_size[2] / 2], [5.5, 0.0, self.platform_position[2] + self.platform_size[2] / 2], [8.0, 0.0, self.platform_position[2] + self.platform_size[2] / 2], [11.0, 0.0, self.platform_position[2] + self.platform_size[2] / 2], [15.0, 0.0, self.platform_position[2] + self.platform_size[2] / 2]]
+        self.scene_cache.build(self, self.build_scene, self.scene_bodies)
+        self.static_scenery = StaticScenery(self._p, self.shapes, [self.platform_id] + self.gap_ids, enabled=self.compact_static)
+        self.platform_id = self.static_scenery.logical_id(self.platform_id)
+        self.gap_ids = self.static_scenery.remap(self.gap_ids)
+        self.robot_position_init = [self.platform_position[0] - self.platform_size[0] / 2 + 0.5, self.platform_position[1], self.platform_position[2] + self.platform_size[2] / 2 + self.robot.links['base'].position_init[2]]
+        self.reset_snapshot = ResetSnapshot(self._p, enabled=self.fast_reset)
+
+    def build_scene(self):
+        self.platform_id = self.shapes.create_box(mass=0.0, half_extents=[self.platform_size[0] / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], position=self.platform_position, color=[0.5, 0.5, 0.5, 1.0])
+        self.shapes.change_dynamics(self.platform_id, lateralFriction=0.8, restitution=0.5)
         self.gap_ids = []
         for i, gap_width in enumerate(self.gap_widths):
-            gap_id = self.create_box(mass=0.0, half_extents=[gap_width / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], position=self.gap_positions[i], color=[0.0, 0.0, 0.0, 1.0])
+            gap_id = self.shapes.create_box(mass=0.0, half_extents=[gap_width / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], position=self.gap_positions[i], color=[0.0, 0.0, 0.0, 1.0])
             self.gap_ids.append(gap_id)
-        self.robot_position_init = [self.platform_position[0] - self.platform_size[0] / 2 + 0.5, self.platform_position[1], self.platform_position[2] + self.platform_size[2] / 2 + self.robot.links['base'].position_init[2]]
 
-    def create_box(self, mass, half_extents, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
+    def place_bodies(self):
+        self._p.resetBasePositionAndOrientation(self.robot.robot_id, self.robot_position_init, self.robot.links['base'].orientation_init)
 
-    def reset(self):
+    def reset(self, seed=None):
+        reseed(self, seed)
         observation = super().reset()
         self.time = 0.0
-        self._p.resetBasePositionAndOrientation(self.robot.robot_id, self.robot_position_init, self.robot.links['base'].orientation_init)
+        self.reset_snapshot.restore_or_place(self.place_bodies)
         return observation
 
     def step(self, action):
@@ -1,5 +1,15 @@
 import numpy as np
 from oped.envs.r2d2.base import R2D2Env
+from envkit.shapes import ShapeFactory
+from envkit.scene import SceneCache
+from envkit.kinematics import ChaseTrack, KinematicTracks
+from envkit.snapshot import ResetSnapshot, reseed
+from envkit.state import StateSnapshot, StepValues
+from envkit.contacts import ContactCache
+from envkit.spatial import SpatialHash
+from envkit.evaluation import StepContext
+from envkit.batched import RewardTerms, distances_xy
+
 
 class Env(R2D2Env):
     """
@@ -28,69 +38,116 @@ class Env(R2D2Env):
     The task is terminated if a goal is scored by either side, if the ball goes out of bounds, or if a time limit is reached.
     """
 
-    def __init__(self):
+    fast_reset = False
+    clone_state_attributes = ('steps', 'kinematics')
+    # 1: the opponent stays where it starts; 2: it chases the ball.
+    stage = 1
+    precompiled_scene = False
+    step_values = StepValues(ball_position=3, ball_velocity=3, robot_position=3, opponent_position=3, distance_to_ball=1, opponent_distance_to_ball=1)
+    scene_bodies = ('field_id', 'ball_id', 'goal_1_post_left_id', 'goal_1_post_right_id', 'goal_2_post_left_id', 'goal_2_post_right_id', 'opponent_id')
+    reward_terms = RewardTerms(
+        fields={'ball_position': lambda env: env.get_object_position(env.ball_id), 'ball_velocity': lambda env: env.get_object_velocity(env.ball_id), 'previous_ball_position': 'ball_position', 'robot_position': lambda env: env.robot.links['base'].position, 'opponent_position': lambda env: env.get_object_position(env.opponent_id), 'kick_contact': lambda env: env.contacts.in_contact(env.robot.robot_id, env.ball_id), 'steps': 'steps'},
+        constants={'dt': 'dt', 'possession_distance': 'possession_distance', 'goal_width': 'goal_width', 'goal_1_position': 'goal_1_position', 'goal_2_position': 'goal_2_position', 'field_size': 'field_size', 'max_steps': 'max_steps'},
+        derived={
+            'robot_near_ball': lambda b: distances_xy(b.robot_position, b.ball_position) < b.possession_distance,
+            'opponent_near_ball': lambda b: distances_xy(b.opponent_position, b.ball_position) < b.possession_distance,
+            'is_robot_goal': lambda b: (b.goal_1_position[:, 1] - b.goal_width / 2 < b.ball_position[:, 1]) & (b.ball_position[:, 1] < b.goal_1_position[:, 1] + b.goal_width / 2) & (b.ball_position[:, 0] > b.goal_1_position[:, 0]),
+            'is_opponent_goal': lambda b: (b.goal_2_position[:, 1] - b.goal_width / 2 < b.ball_position[:, 1]) & (b.ball_position[:, 1] < b.goal_2_position[:, 1] + b.goal_width / 2) & (b.ball_position[:, 0] < b.goal_2_position[:, 0]),
+            'is_ball_out_of_bounds': lambda b: (np.abs(b.ball_position[:, 0]) > b.field_size[:, 0] / 2) | (np.abs(b.ball_position[:, 1]) > b.field_size[:, 1] / 2)},
+        rewards={
+            'possession': lambda b: np.where(b.robot_near_ball & ~b.opponent_near_ball, 1.0, 0.0),
+            'ball_progress': lambda b: (b.previous_ball_position[:, 0] - b.ball_position[:, 0]) / b.dt,
+            'kick_velocity': lambda b: np.where(b.kick_contact, b.ball_velocity[:, 0], 0.0),
+            'opponent_possession': lambda b: np.where(b.opponent_near_ball & ~b.robot_near_ball, -1.0, 0.0),
+            'ball_out_of_bounds': lambda b: np.where(b.is_ball_out_of_bounds, -1.0, 0.0),
+            'robot_goal': lambda b: np.where(b.is_robot_goal, 10.0, 0.0),
+            'opponent_goal': lambda b: np.where(b.is_opponent_goal, -10.0, 0.0)},
+        terminated=lambda b: b.is_robot_goal | b.is_opponent_goal | b.is_ball_out_of_bounds | (b.steps >= b.max_steps),
+        success=lambda b: b.is_robot_goal & ~b.is_opponent_goal)
+
+    def __init__(self, seed=None):
         super().__init__()
+        self.shapes = ShapeFactory(self._p)
+        self.scene_cache = SceneCache(self.shapes, __file__, enabled=self.precompiled_scene)
         self.field_size = [40.0, 20.0, 10.0]
         self.field_position = [0.0, 0.0, 0.0]
-        self.field_id = self.create_box(mass=0.0, half_extents=[self.field_size[0] / 2, self.field_size[1] / 2, self.field_size[2] / 2], position=self.field_position, color=[0.0, 0.5, 0.0, 1.0])
-        self._p.changeDynamics(bodyUniqueId=self.field_id, linkIndex=-1, lateralFriction=0.8, restitution=0.5)
         self.ball_radius = 0.5
         self.ball_position_init = [0.0, 0.0, self.field_size[2] / 2 + self.ball_radius]
-        self.ball_id = self.create_sphere(mass=1.0, radius=self.ball_radius, position=self.ball_position_init, color=[1.0, 1.0, 1.0, 1.0])
         self.goal_post_height = 2.0
         self.goal_post_radius = 0.1
         self.goal_width = 3.0
         self.goal_1_position = [self.field_size[0] / 2, 0.0, self.field_size[2] / 2 + self.goal_post_height / 2]
-        self.goal_1_post_left_id = self.create_cylinder(mass=0.0, radius=self.goal_post_radius, height=self.goal_post_height, position=[self.goal_1_position[0], self.goal_1_position[1] - self.goal_width / 2, self.goal_1_position[2]], color=[1.0, 0.0, 0.0, 1.0])
-        self.goal_1_post_right_id = self.create_cylinder(mass=0.0, radius=self.goal_post_radius, height=self.goal_post_height, position=[self.goal_1_position[0], self.goal_1_position[1] + self.goal_width / 2, self.goal_1_position[2]], color=[1.0, 0.0, 0.0, 1.0])
         self.goal_2_position = [-self.field_size[0] / 2, 0.0, self.field_size[2] / 2 + self.goal_post_height / 2]
-        self.goal_2_post_left_id = self.create_cylinder(mass=0.0, radius=self.goal_post_radius, height=self.goal_post_height, position=[self.goal_2_position[0], self.goal_2_position[1] - self.goal_width / 2, self.goal_2_position[2]], color=[0.0, 0.0, 1.0, 1.0])
-        self.goal_2_post_right_id = self.create_cylinder(mass=0.0, radius=self.goal_post_radius, height=self.goal_post_height, position=[self.goal_2_position[0], self.goal_2_position[1] + self.goal_width / 2, self.goal_2_position[2]], color=[0.0, 0.0, 1.0, 1.0])
         self.robot_position_init = [-self.field_size[0] / 4, 0.0, self.field_size[2] / 2 + self.robot.links['base'].position_init[2]]
         self.robot_orientation_init = self._p.getQuaternionFromEuler([0.0, 0.0, np.pi])
         self.opponent_position_init = [self.field_size[0] / 4, 0.0, self.field_size[2] / 2 + self.robot.links['base'].position_init[2]]
         self.opponent_orientation_init = self._p.getQuaternionFromEuler([0.0, 0.0, 0.0])
-        self.opponent_id = self.create_opponent()
+        self.scene_cache.build(self, self.build_scene, self.scene_bodies)
+        self.state = StateSnapshot(self._p, [self.ball_id, self.opponent_id])
+        self.contacts = ContactCache(self._p)
         self.possession_distance = 1.0
+        self.spatial = SpatialHash(self.state, cell_size=self.possession_distance)
+        self.spatial.track(self.ball_id, 'ball')
+        self.spatial.track(self.opponent_id, 'opponent')
+        self.spatial.track(self.robot.robot_id, 'robot', position=lambda: self.robot.links['base'].position)
+        self.step_context = StepContext(self.state, self.contacts, self.spatial)
+        self.reset_snapshot = ResetSnapshot(self._p, enabled=self.fast_reset)
         self.max_steps = 1000
-
-    def create_box(self, mass, half_extents, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
-
-    def create_sphere(self, mass, radius, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_SPHERE, radius=radius)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_SPHERE, radius=radius, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
-
-    def create_cylinder(self, mass, radius, height, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_CYLINDER, radius=radius, height=height)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_CYLINDER, radius=radius, length=height, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
+        self.opponent_speed = 1.0
+        self.kinematics = KinematicTracks(self._p)
+        self.opponent_track = self.kinematics.add(ChaseTrack(self._p, [self.opponent_position_init], [self.ball_id], speeds=self.opponent_speed, stop_distance=self.ball_radius, state=self.state))
+        self.opponent_track.attach(0, self.opponent_id)
+
+    def build_scene(self):
+        self.field_id = self.shapes.create_box(mass=0.0, half_extents=[self.field_size[0] / 2, self.field_size[1] / 2, self.field_size[2] / 2], position=self.field_position, color=[0.0, 0.5, 0.0, 1.0])
+        self.shapes.change_dynamics(self.field_id, lateralFriction=0.8, restitution=0.5)
+        self.ball_id = self.shapes.create_sphere(mass=1.0, radius=self.ball_radius, position=self.ball_position_init, color=[1.0, 1.0, 1.0, 1.0])
+        self.goal_1_post_left_id = self.shapes.create_cylinder(mass=0.0, radius=self.goal_post_radius, height=self.goal_post_height, position=[self.goal_1_position[0], self.goal_1_position[1] - self.goal_width / 2, self.goal_1_position[2]], color=[1.0, 0.0, 0.0, 1.0])
+        self.goal_1_post_right_id = self.shapes.create_cylinder(mass=0.0, radius=self.goal_post_radius, height=self.goal_post_height, position=[self.goal_1_position[0], self.goal_1_position[1] + self.goal_width / 2, self.goal_1_position[2]], color=[1.0, 0.0, 0.0, 1.0])
+        self.goal_2_post_left_id = self.shapes.create_cylinder(mass=0.0, radius=self.goal_post_radius, height=self.goal_post_height, position=[self.goal_2_position[0], self.goal_2_position[1] - self.goal_width / 2, self.goal_2_position[2]], color=[0.0, 0.0, 1.0, 1.0])
+        self.goal_2_post_right_id = self.shapes.create_cylinder(mass=0.0, radius=self.goal_post_radius, height=self.goal_post_height, position=[self.goal_2_position[0], self.goal_2_position[1] + self.goal_width / 2, self.goal_2_position[2]], color=[0.0, 0.0, 1.0, 1.0])
+        self.opponent_id = self.create_opponent()
 
     def create_opponent(self):
         opponent_size = [0.5, 0.5, 1.0]
-        opponent_id = self.create_box(mass=1.0, half_extents=[opponent_size[0] / 2, opponent_size[1] / 2, opponent_size[2] / 2], position=self.opponent_position_init, color=[0.0, 0.0, 0.0, 1.0])
+        opponent_id = self.shapes.create_box(mass=1.0, half_extents=[opponent_size[0] / 2, opponent_size[1] / 2, opponent_size[2] / 2], position=self.opponent_position_init, color=[0.0, 0.0, 0.0, 1.0])
         return opponent_id
 
     def get_object_position(self, object_id):
-        return np.asarray(self._p.getBasePositionAndOrientation(object_id)[0])
+        return self.state.position(object_id)
 
     def get_object_velocity(self, object_id):
-        return np.asarray(self._p.getBaseVelocity(object_id)[0])
+        return self.state.velocity(object_id)
 
     def get_distance_to_object(self, object_id):
-        object_position = self.get_object_position(object_id)
         robot_position = self.robot.links['base'].position
+        if object_id in self.spatial:
+            return self.spatial.distance(object_id, robot_position)
+        object_position = self.get_object_position(object_id)
         return np.linalg.norm(object_position[:2] - robot_position[:2])
 
-    def reset(self):
-        observation = super().reset()
+    def get_ball_events(self):
+        return self.step_context.get('ball_events', self._compute_ball_events)
+
+    def _compute_ball_events(self):
+        ball_position = self.get_object_position(self.ball_id)
+        robot_goal = self.goal_1_position[1] - self.goal_width / 2 < ball_position[1] < self.goal_1_position[1] + self.goal_width / 2 and ball_position[0] > self.goal_1_position[0]
+        opponent_goal = self.goal_2_position[1] - self.goal_width / 2 < ball_position[1] < self.goal_2_position[1] + self.goal_width / 2 and ball_position[0] < self.goal_2_position[0]
+        ball_out_of_bounds = np.abs(ball_position[0]) > self.field_size[0] / 2 or np.abs(ball_position[1]) > self.field_size[1] / 2
+        return robot_goal, opponent_goal, ball_out_of_bounds
+
+    def place_bodies(self):
         self._p.resetBasePositionAndOrientation(self.ball_id, self.ball_position_init, [0.0, 0.0, 0.0, 1.0])
         self._p.resetBaseVelocity(self.ball_id, [0.0, 0.0, 0.0], [0.0, 0.0, 0.0])
         self._p.resetBasePositionAndOrientation(self.robot.robot_id, self.robot_position_init, self.robot_orientation_init)
         self._p.resetBasePositionAndOrientation(self.opponent_id, self.opponent_position_init, self.opponent_orientation_init)
+
+    def reset(self, seed=None):
+        reseed(self, seed)
+        observation = super().reset()
+        self.kinematics.reset()
+        self.reset_snapshot.restore_or_place(self.place_bodies)
+        self.step_context.invalidate()
         self.steps = 0
         return observation
 
@@ -100,39 +157,39 @@ class Env(R2D2Env):
         self.robot_position = self.robot.links['base'].position
         self.opponent_position = self.get_object_position(self.opponent_id)
         self.distance_to_ball = self.get_distance_to_object(self.ball_id)
-        self.opponent_distance_to_ball = np.linalg.norm(self.opponent_position[:2] - self.ball_position[:2])
+        self.opponent_distance_to_ball = self.spatial.distance(self.opponent_id, self.ball_position)
+        self.step_context.invalidate()
         observation, reward, terminated, truncated, info = super().step(action)
         self.steps += 1
+        if self.stage >= 2:
+            self.kinematics.update(self.steps * self.dt, self.dt)
+            self.step_context.invalidate()
         return (observation, reward, terminated, truncated, info)
 
     def get_task_rewards(self, action):
         new_ball_position = self.get_object_position(self.ball_id)
         new_ball_velocity = self.get_object_velocity(self.ball_id)
         new_robot_position = self.robot.links['base'].position
-        new_opponent_position = self.get_object_position(self.opponent_id)
-        new_distance_to_ball = self.get_distance_to_object(self.ball_id)
-        new_opponent_distance_to_ball = np.linalg.norm(new_opponent_position[:2] - new_ball_position[:2])
-        possession = 1.0 if new_distance_to_ball < self.possession_distance and new_opponent_distance_to_ball >= self.possession_distance else 0.0
+        near_ball = self.spatial.within(new_ball_position, self.possession_distance)
+        robot_near_ball = self.robot.robot_id in near_ball
+        opponent_near_ball = self.opponent_id in near_ball
+        possession = 1.0 if robot_near_ball and not opponent_near_ball else 0.0
         ball_progress = (self.ball_position[0] - new_ball_position[0]) / self.dt
         kick_velocity = 0.0
-        if len(self._p.getContactPoints(bodyA=self.robot.robot_id, bodyB=self.ball_id)) > 0:
+        if self.contacts.in_contact(self.robot.robot_id, self.ball_id):
             kick_velocity = np.dot(new_ball_velocity, [1.0, 0.0, 0.0])
-        opponent_possession = -1.0 if new_opponent_distance_to_ball < self.possession_distance and new_distance_to_ball >= self.possession_distance else 0.0
-        ball_out_of_bounds = -1.0 if np.abs(new_ball_position[0]) > self.field_size[0] / 2 or np.abs(new_ball_position[1]) > self.field_size[1] / 2 else 0.0
-        robot_goal = 10.0 if self.goal_1_position[1] - self.goal_width / 2 < new_ball_position[1] < self.goal_1_position[1] + self.goal_width / 2 and new_ball_position[0] > self.goal_1_position[0] else 0.0
-        opponent_goal = -10.0 if self.goal_2_position[1] - self.goal_width / 2 < new_ball_position[1] < self.goal_2_position[1] + self.goal_width / 2 and new_ball_position[0] < self.goal_2_position[0] else 0.0
+        opponent_possession = -1.0 if opponent_near_ball and not robot_near_ball else 0.0
+        is_robot_goal, is_opponent_goal, is_ball_out_of_bounds = self.get_ball_events()
+        ball_out_of_bounds = -1.0 if is_ball_out_of_bounds else 0.0
+        robot_goal = 10.0 if is_robot_goal else 0.0
+        opponent_goal = -10.0 if is_opponent_goal else 0.0
         return {'possession': possession, 'ball_progress': ball_progress, 'kick_velocity': kick_velocity, 'opponent_possession': opponent_possession, 'ball_out_of_bounds': ball_out_of_bounds, 'robot_goal': robot_goal, 'opponent_goal': opponent_goal}
 
     def get_terminated(self, action):
-        ball_position = self.get_object_position(self.ball_id)
-        robot_goal = self.goal_1_position[1] - self.goal_width / 2 < ball_position[1] < self.goal_1_position[1] + self.goal_width / 2 and ball_position[0] > self.goal_1_position[0]
-        opponent_goal = self.goal_2_position[1] - self.goal_width / 2 < ball_position[1] < self.goal_2_position[1] + self.goal_width / 2 and ball_position[0] < self.goal_2_position[0]
-        ball_out_of_bounds = np.abs(ball_position[0]) > self.field_size[0] / 2 or np.abs(ball_position[1]) > self.field_size[1] / 2
+        robot_goal, opponent_goal, ball_out_of_bounds = self.get_ball_events()
         time_limit_reached = self.steps >= self.max_steps
         return robot_goal or opponent_goal or ball_out_of_bounds or time_limit_reached
 
     def get_success(self):
-        ball_position = self.get_object_position(self.ball_id)
-        robot_goal = self.goal_1_position[1] - self.goal_width / 2 < ball_position[1] < self.goal_1_position[1] + self.goal_width / 2 and ball_position[0] > self.goal_1_position[0]
-        opponent_goal = self.goal_2_position[1] - self.goal_width / 2 < ball_position[1] < self.goal_2_position[1] + self.goal_width / 2 and ball_position[0] < self.goal_2_position[0]
+        robot_goal, opponent_goal, _ = self.get_ball_events()
         return robot_goal and (not opponent_goal)
\ No newline at end of file
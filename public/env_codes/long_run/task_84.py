@@ -1,5 +1,13 @@
 import numpy as np
 from oped.envs.r2d2.base import R2D2Env
+from envkit.shapes import ShapeFactory
+from envkit.scene import SceneCache
+from envkit.snapshot import ResetSnapshot, reseed
+from envkit.state import StateSnapshot, StepValues
+from envkit.contacts import ContactCache
+from envkit.compaction import StaticScenery
+from envkit.evaluation import StepContext, in_box_xy, is_upright
+from envkit.batched import RewardTerms, distances_xy, in_boxes_xy, up_alignments
 
 class Env(R2D2Env):
     """
@@ -34,8 +42,28 @@ class Env(R2D2Env):
     The episode ends if the robot crashes into a patron or furniture, or if the time limit is reached. The episode is considered successful if the robot consistently performs both table setting and busing throughout the full time period with no collisions or broken dishes.
     """
 
-    def __init__(self):
+    fast_reset = False
+    clone_state_attributes = ('time',)
+    compact_static = False
+    precompiled_scene = False
+    step_values = StepValues(robot_position=3, target_object_position=3, distance_to_target_object=1)
+    scene_bodies = ('target_object_id', 'goal_id', 'platform_ids', 'ramp_ids', 'wall_ids', 'cylinder_ids')
+    reward_terms = RewardTerms(
+        fields={'robot_position': lambda env: env.robot.links['base'].position, 'robot_orientation': lambda env: env.robot.links['base'].orientation, 'previous_robot_position': 'robot_position', 'target_object_position': lambda env: env.get_object_position(env.target_object_id), 'target_object_velocity': lambda env: env.state.velocity(env.target_object_id), 'previous_distance_to_target_object': 'distance_to_target_object', 'collisions': lambda env: len(env.obstacle_ids & env.contacts.touching(env.robot.robot_id)), 'time': 'time'},
+        constants={'dt': 'dt', 'course_size': 'course_size', 'level_height': 'level_height', 'goal_position': 'goal_position', 'goal_size': 'goal_size', 'time_limit': 'time_limit'},
+        derived={'distance_to_target_object': lambda b: distances_xy(b.target_object_position, b.robot_position), 'target_object_in_goal': lambda b: in_boxes_xy(b.target_object_position, b.goal_position, b.goal_size)},
+        rewards={
+            'forward_progression_reward': lambda b: 0.1 * ((b.robot_position[:, 0] - b.previous_robot_position[:, 0]) / b.dt) * (b.robot_position[:, 2] / b.course_size[:, 2]),
+            'reached_target_object_reward': lambda b: np.where((b.distance_to_target_object < 1.0) & (b.previous_distance_to_target_object >= 1.0), 10.0, 0.0),
+            'target_object_in_goal_reward': lambda b: np.where(b.target_object_in_goal, 100.0, 0.0),
+            'collision_penalty': lambda b: -b.collisions},
+        terminated=lambda b: (b.robot_position[:, 2] < b.course_size[:, 2] / 2 - b.level_height) | (up_alignments(b.robot_orientation) < 0.5) | (b.time >= b.time_limit),
+        success=lambda b: b.target_object_in_goal & in_boxes_xy(b.robot_position, b.goal_position, b.goal_size) & (np.sqrt(np.sum(b.target_object_velocity * b.target_object_velocity, axis=1)) < 0.1))
+
+    def __init__(self, seed=None):
         super().__init__()
+        self.shapes = ShapeFactory(self._p)
+        self.scene_cache = SceneCache(self.shapes, __file__, enabled=self.precompiled_scene)
         self.course_size = [20.0, 20.0, 10.0]
         self.course_position = [0.0, 0.0, 0.0]
         self.num_levels = 5
@@ -48,77 +76,91 @@ class Env(R2D2Env):
         self.cylinder_height = 2.0
         self.target_object_size = [1.0, 1.0, 1.0]
         self.target_object_position_init = [0.0, 0.0, self.course_size[2] - self.level_height / 2 - self.target_object_size[2] / 2]
-        self.target_object_id = self.create_box(mass=1.0, half_extents=[self.target_object_size[0] / 2, self.target_object_size[1] / 2, self.target_object_size[2] / 2], position=self.target_object_position_init, color=[1.0, 0.0, 0.0, 1.0])
         self.goal_size = [2.0, 2.0, 0.01]
         self.goal_position = [self.course_size[0] / 2 - self.goal_size[0] / 2, 0.0, self.course_size[2] / 2 - self.level_height / 2 - self.goal_size[2] / 2]
-        self.goal_id = self.create_box(mass=0.0, half_extents=[self.goal_size[0] / 2, self.goal_size[1] / 2, self.goal_size[2] / 2], position=self.goal_position, color=[0.0, 1.0, 0.0, 1.0])
         self.time_limit = 300.0
+        self.scene_cache.build(self, self.build_scene, self.scene_bodies)
+        self.static_scenery = StaticScenery(self._p, self.shapes, self.platform_ids + self.ramp_ids + self.wall_ids + self.cylinder_ids + [self.goal_id], enabled=self.compact_static)
+        self.platform_ids = self.static_scenery.remap(self.platform_ids)
+        self.ramp_ids = self.static_scenery.remap(self.ramp_ids)
+        self.wall_ids = self.static_scenery.remap(self.wall_ids)
+        self.cylinder_ids = self.static_scenery.remap(self.cylinder_ids)
+        self.goal_id = self.static_scenery.logical_id(self.goal_id)
+        self.state = StateSnapshot(self._p, [self.target_object_id])
+        self.contacts = ContactCache(self._p, self.static_scenery)
+        self.step_context = StepContext(self.state, self.contacts)
+        self.reset_snapshot = ResetSnapshot(self._p, enabled=self.fast_reset)
+        self.obstacle_ids = set(self.wall_ids + self.cylinder_ids)
+        self.robot_position_init = [-self.course_size[0] / 2 + 1.0, 0.0, self.course_size[2] / 2 - self.level_height / 2 + self.robot.links['base'].position_init[2]]
+
+    def build_scene(self):
+        self.target_object_id = self.shapes.create_box(mass=1.0, half_extents=[self.target_object_size[0] / 2, self.target_object_size[1] / 2, self.target_object_size[2] / 2], position=self.target_object_position_init, color=[1.0, 0.0, 0.0, 1.0])
+        self.goal_id = self.shapes.create_box(mass=0.0, half_extents=[self.goal_size[0] / 2, self.goal_size[1] / 2, self.goal_size[2] / 2], position=self.goal_position, color=[0.0, 1.0, 0.0, 1.0])
         self.platform_ids = []
         self.ramp_ids = []
         self.wall_ids = []
         self.cylinder_ids = []
         self.create_course()
-        self.robot_position_init = [-self.course_size[0] / 2 + 1.0, 0.0, self.course_size[2] / 2 - self.level_height / 2 + self.robot.links['base'].position_init[2]]
-
-    def create_box(self, mass, half_extents, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
-
-    def create_cylinder(self, mass, radius, height, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_CYLINDER, radius=radius, height=height)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_CYLINDER, radius=radius, length=height, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
 
     def create_course(self):
+        platform_positions, ramp_positions, wall_positions, cylinder_positions = [], [], [], []
         for i in range(self.num_levels):
             level_position = [0.0, 0.0, self.course_size[2] / 2 - self.level_height * (i + 0.5)]
             platform_position = [level_position[0] + (i - self.num_levels / 2 + 0.5) * 5.0, level_position[1], level_position[2]]
-            platform_id = self.create_box(mass=0.0, half_extents=[self.platform_size[0] / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], position=platform_position, color=[0.5, 0.5, 0.5, 1.0])
-            self.platform_ids.append(platform_id)
+            platform_positions.append(platform_position)
             if i < self.num_levels - 1:
                 ramp_position = [platform_position[0] + self.platform_size[0] / 2 + self.ramp_size[0] / 2, platform_position[1], platform_position[2] + self.level_height / 2 - self.ramp_size[2] / 2]
-                ramp_id = self.create_box(mass=0.0, half_extents=[self.ramp_size[0] / 2, self.ramp_size[1] / 2, self.ramp_size[2] / 2], position=ramp_position, color=[0.6, 0.4, 0.2, 1.0])
-                self.ramp_ids.append(ramp_id)
+                ramp_positions.append(ramp_position)
             if i > 0:
                 gap_position = [platform_position[0] - self.platform_size[0] / 2 - self.gap_size / 2, platform_position[1], platform_position[2]]
                 wall_position_left = [gap_position[0] - self.gap_size / 2 - self.wall_size[0] / 2, gap_position[1] - self.platform_size[1] / 2 - self.wall_size[1] / 2, gap_position[2] + self.wall_size[2] / 2]
                 wall_position_right = [gap_position[0] - self.gap_size / 2 - self.wall_size[0] / 2, gap_position[1] + self.platform_size[1] / 2 + self.wall_size[1] / 2, gap_position[2] + self.wall_size[2] / 2]
-                wall_id_left = self.create_box(mass=0.0, half_extents=[self.wall_size[0] / 2, self.wall_size[1] / 2, self.wall_size[2] / 2], position=wall_position_left, color=[0.2, 0.2, 0.2, 1.0])
-                wall_id_right = self.create_box(mass=0.0, half_extents=[self.wall_size[0] / 2, self.wall_size[1] / 2, self.wall_size[2] / 2], position=wall_position_right, color=[0.2, 0.2, 0.2, 1.0])
-                self.wall_ids.append(wall_id_left)
-                self.wall_ids.append(wall_id_right)
+                wall_positions.extend([wall_position_left, wall_position_right])
             if i < self.num_levels - 1:
                 cylinder_position = [platform_position[0], platform_position[1] - self.platform_size[1] / 4, platform_position[2] + self.level_height / 2 - self.cylinder_height / 2]
-                cylinder_id = self.create_cylinder(mass=0.0, radius=self.cylinder_radius, height=self.cylinder_height, position=cylinder_position, color=[0.8, 0.8, 0.8, 1.0])
-                self.cylinder_ids.append(cylinder_id)
+                cylinder_positions.append(cylinder_position)
+        self.platform_ids.extend(self.shapes.create_boxes(mass=0.0, half_extents=[self.platform_size[0] / 2, self.platform_size[1] / 2, self.platform_size[2] / 2], positions=platform_positions, color=[0.5, 0.5, 0.5, 1.0]))
+        self.ramp_ids.extend(self.shapes.create_boxes(mass=0.0, half_extents=[self.ramp_size[0] / 2, self.ramp_size[1] / 2, self.ramp_size[2] / 2], positions=ramp_positions, color=[0.6, 0.4, 0.2, 1.0]))
+        self.wall_ids.extend(self.shapes.create_boxes(mass=0.0, half_extents=[self.wall_size[0] / 2, self.wall_size[1] / 2, self.wall_size[2] / 2], positions=wall_positions, color=[0.2, 0.2, 0.2, 1.0]))
+        self.cylinder_ids.extend(self.shapes.create_cylinders(mass=0.0, radius=self.cylinder_radius, height=self.cylinder_height, positions=cylinder_positions, color=[0.8, 0.8, 0.8, 1.0]))
 
     def get_object_position(self, object_id):
-        return np.asarray(self._p.getBasePositionAndOrientation(object_id)[0])
+        return self.state.position(object_id)
 
     def get_distance_to_object(self, object_id):
         object_position = self.get_object_position(object_id)
         robot_position = self.robot.links['base'].position
         return np.linalg.norm(object_position[:2] - robot_position[:2])
 
-    def reset(self):
-        observation = super().reset()
-        self.time = 0.0
+    def is_target_object_in_goal(self):
+        return self.step_context.get('target_object_in_goal', lambda: in_box_xy(self.get_object_position(self.target_object_id), self.goal_position, self.goal_size))
+
+    def is_robot_upright(self):
+        return self.step_context.get('robot_upright', lambda: is_upright(self.robot.links['base'].orientation))
+
+    def place_bodies(self):
         self._p.resetBasePositionAndOrientation(self.target_object_id, self.target_object_position_init, [0.0, 0.0, 0.0, 1.0])
         self._p.resetBasePositionAndOrientation(self.robot.robot_id, self.robot_position_init, self.robot.links['base'].orientation_init)
+
+    def reset(self, seed=None):
+        reseed(self, seed)
+        observation = super().reset()
+        self.time = 0.0
+        self.reset_snapshot.restore_or_place(self.place_bodies)
+        self.step_context.invalidate()
         return observation
 
     def step(self, action):
         self.robot_position = self.robot.links['base'].position
         self.target_object_position = self.get_object_position(self.target_object_id)
         self.distance_to_target_object = self.get_distance_to_object(self.target_object_id)
+        self.step_context.invalidate()
         observation, reward, terminated, truncated, info = super().step(action)
         self.time += self.dt
         return (observation, reward, terminated, truncated, info)
 
     def get_task_rewards(self, action):
         new_robot_position = self.robot.links['base'].position
-        new_target_object_position = self.get_object_position(self.target_object_id)
         new_distance_to_target_object = self.get_distance_to_object(self.target_object_id)
         forward_progression = (new_robot_position[0] - self.robot_position[0]) / self.dt
         elevation_scale = new_robot_position[2] / self.course_size[2]
@@ -127,28 +169,23 @@ class Env(R2D2Env):
         if new_distance_to_target_object < 1.0 and self.distance_to_target_object >= 1.0:
             reached_target_object_reward = 10.0
         target_object_in_goal_reward = 0.0
-        if self.goal_position[0] - self.goal_size[0] / 2 < new_target_object_position[0] < self.goal_position[0] + self.goal_size[0] / 2 and self.goal_position[1] - self.goal_size[1] / 2 < new_target_object_position[1] < self.goal_position[1] + self.goal_size[1] / 2:
+        if self.is_target_object_in_goal():
             target_object_in_goal_reward = 100.0
-        collision_penalty = 0.0
-        for object_id in self.wall_ids + self.cylinder_ids:
-            if len(self._p.getContactPoints(bodyA=self.robot.robot_id, bodyB=object_id)) > 0:
-                collision_penalty -= 1.0
+        collision_penalty = -float(len(self.obstacle_ids & self.contacts.touching(self.robot.robot_id)))
         return {'forward_progression_reward': forward_progression_reward, 'reached_target_object_reward': reached_target_object_reward, 'target_object_in_goal_reward': target_object_in_goal_reward, 'collision_penalty': collision_penalty}
 
     def get_terminated(self, action):
         robot_position = self.robot.links['base'].position
         if robot_position[2] < self.course_size[2] / 2 - self.level_height:
             return True
-        if np.dot(np.asarray([0, 0, 1]), np.asarray(self._p.getMatrixFromQuaternion(self.robot.links['base'].orientation)).reshape(3, 3)[:, 2]) < 0.5:
+        if not self.is_robot_upright():
             return True
         if self.time >= self.time_limit:
             return True
         return False
 
     def get_success(self):
-        target_object_position = self.get_object_position(self.target_object_id)
         robot_position = self.robot.links['base'].position
-        target_object_velocity = np.linalg.norm(self._p.getBaseVelocity(self.target_object_id)[0])
-        is_target_object_in_goal = self.goal_position[0] - self.goal_size[0] / 2 < target_object_position[0] < self.goal_position[0] + self.goal_size[0] / 2 and self.goal_position[1] - self.goal_size[1] / 2 < target_object_position[1] < self.goal_position[1] + self.goal_size[1] / 2
-        is_robot_in_goal = self.goal_position[0] - self.goal_size[0] / 2 < robot_position[0] < self.goal_position[0] + self.goal_size[0] / 2 and self.goal_position[1] - self.goal_size[1] / 2 < robot_position[1] < self.goal_position[1] + self.goal_size[1] / 2
-        return is_target_object_in_goal and is_robot_in_goal and (target_object_velocity < 0.1)
\ No newline at end of file
+        target_object_velocity = np.linalg.norm(self.state.velocity(self.target_object_id))
+        is_robot_in_goal = in_box_xy(robot_position, self.goal_position, self.goal_size)
+        return self.is_target_object_in_goal() and is_robot_in_goal and (target_object_velocity < 0.1)
\ No newline at end of file
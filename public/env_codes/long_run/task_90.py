@@ -1,5 +1,14 @@
 import numpy as np
 from oped.envs.r2d2.base import R2D2Env
+from envkit.shapes import ShapeFactory
+from envkit.snapshot import ResetSnapshot, reseed
+from envkit.state import StateSnapshot, StepValues
+from envkit.contacts import ContactCache
+from envkit.compaction import StaticScenery
+from envkit.spatial import SpatialHash
+from envkit.terrain import HeightfieldTerrain
+from envkit.evaluation import StepContext, is_upright
+from envkit.batched import RewardTerms, distances_xy, up_alignments
 
 class Env(R2D2Env):
     """
@@ -33,124 +42,176 @@ class Env(R2D2Env):
     The episode ends if the robot flips over and can't right itself, or if the time limit is exceeded.
     """
 
-    def __init__(self):
+    fast_reset = False
+    clone_state_attributes = ('time', 'ball_start_position')
+    compact_static = False
+    heightfield_terrain = False
+    terrain_cell_size = 0.5
+    spatial_cell_size = 2.0
+    step_values = StepValues(ball_position=3, robot_position=3, distance_to_ball=1)
+    reward_terms = RewardTerms(
+        fields={'ball_position': lambda env: env.get_object_position(env.ball_id), 'distance_to_ball': lambda env: env.get_distance_to_ball(), 'previous_distance_to_ball': 'distance_to_ball', 'ball_contact': lambda env: env.contacts.in_contact(env.robot.robot_id, env.ball_id), 'robot_position': lambda env: env.robot.links['base'].position, 'robot_orientation': lambda env: env.robot.links['base'].orientation, 'time': 'time'},
+        constants={'dt': 'dt', 'ball_radius': 'ball_radius', 'success_distance': 'success_distance', 'ball_lost_distance': 'ball_lost_distance', 'robot_start_position': 'robot_start_position', 'time_limit': 'time_limit'},
+        derived={'near_start': lambda b: distances_xy(b.robot_position, b.robot_start_position) < b.success_distance, 'ball_lifted': lambda b: b.ball_position[:, 2] > b.ball_radius},
+        rewards={
+            'explore_reward': lambda b: 0.1 * (b.previous_distance_to_ball - b.distance_to_ball) / b.dt,
+            'pickup_reward': lambda b: np.where(b.ball_contact & b.ball_lifted, 10.0, 0.0),
+            'return_reward': lambda b: np.where((b.distance_to_ball < b.success_distance) & b.near_start, 100.0, 0.0),
+            'drop_penalty': lambda b: np.where(b.distance_to_ball > b.ball_lost_distance, -1.0, 0.0)},
+        terminated=lambda b: (up_alignments(b.robot_orientation) < 0.5) | (b.time >= b.time_limit),
+        success=lambda b: (b.distance_to_ball < b.success_distance) & b.near_start & b.ball_lifted)
+
+    def __init__(self, seed=None):
         super().__init__()
+        self.rng = np.random.default_rng(seed)
+        self.shapes = ShapeFactory(self._p)
         self.field_size = [50.0, 50.0, 0.0]
         self.robot_start_position = [0.0, 0.0, 0.0]
         self.ground_thickness = 0.2
-        self.ground_id = self.create_box(mass=0.0, half_extents=[self.field_size[0] / 2, self.field_size[1] / 2, self.ground_thickness / 2], position=[0.0, 0.0, -self.ground_thickness / 2], orientation=[0.0, 0.0, 0.0, 1.0], color=[0.5, 0.5, 0.5, 1.0])
-        self._p.changeDynamics(bodyUniqueId=self.ground_id, linkIndex=-1, lateralFriction=0.8, restitution=0.2)
+        self.terrain = HeightfieldTerrain(self.field_size, cell_size=self.terrain_cell_size, base_friction=0.8, restitution=0.2) if self.heightfield_terrain else None
+        if self.terrain is None:
+            self.ground_id = self.shapes.create_box(mass=0.0, half_extents=[self.field_size[0] / 2, self.field_size[1] / 2, self.ground_thickness / 2], position=[0.0, 0.0, -self.ground_thickness / 2], orientation=[0.0, 0.0, 0.0, 1.0], color=[0.5, 0.5, 0.5, 1.0])
+            self.shapes.change_dynamics(self.ground_id, lateralFriction=0.8, restitution=0.2)
         self.ball_radius = 0.25
         self.ball_mass = 1.0
         self.ball_start_distance_range = [10.0, 20.0]
         self.ball_start_position = self.get_random_ball_start_position()
-        self.ball_id = self.create_sphere(mass=self.ball_mass, radius=self.ball_radius, position=self.ball_start_position, color=[1.0, 1.0, 1.0, 1.0])
+        self.ball_id = self.shapes.create_sphere(mass=self.ball_mass, radius=self.ball_radius, position=self.ball_start_position, color=[1.0, 1.0, 1.0, 1.0])
         self.ball_lost_distance = 5.0
         self.success_distance = 2.0
         self.time_limit = 600.0
         self.terrain_ids = []
+        self.terrain_features = []
         self.create_terrain()
-
-    def create_sphere(self, mass, radius, position, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_SPHERE, radius=radius)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_SPHERE, radius=radius, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position)
-
-    def create_box(self, mass, half_extents, position, orientation, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_BOX, halfExtents=half_extents, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position, baseOrientation=orientation)
-
-    def create_cylinder(self, mass, radius, height, position, orientation, color):
-        collision_shape_id = self._p.createCollisionShape(shapeType=self._p.GEOM_CYLINDER, radius=radius, height=height)
-        visual_shape_id = self._p.createVisualShape(shapeType=self._p.GEOM_CYLINDER, radius=radius, length=height, rgbaColor=color)
-        return self._p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=collision_shape_id, baseVisualShapeIndex=visual_shape_id, basePosition=position, baseOrientation=orientation)
+        self.static_scenery = StaticScenery(self._p, self.shapes, [self.ground_id] + self.terrain_ids, enabled=self.compact_static and self.terrain is None)
+        self.ground_id = self.static_scenery.logical_id(self.ground_id)
+        self.terrain_ids = self.static_scenery.remap(self.terrain_ids)
+        self.state = StateSnapshot(self._p, [self.ball_id])
+        self.contacts = ContactCache(self._p, self.static_scenery)
+        self.spatial = SpatialHash(self.state, cell_size=self.spatial_cell_size)
+        self.spatial.track(self.ball_id, 'ball')
+        for index, (label, position, radius) in enumerate(self.terrain_features):
+            self.spatial.add_fixed(('terrain', index), position, label, radius)
+        self.step_context = StepContext(self.state, self.contacts, self.spatial)
+        self.reset_snapshot = ResetSnapshot(self._p, enabled=self.fast_reset)
 
     def create_terrain(self):
         hill_height = 5.0
         hill_half_extents = [10.0, 10.0, hill_height / 2]
         hill_position = [15.0, 15.0, hill_height / 2]
-        hill_orientation = self._p.getQuaternionFromEuler([0.0, 0.0, np.random.uniform(0.0, 2 * np.pi)])
-        hill_id = self.create_box(mass=0.0, half_extents=hill_half_extents, position=hill_position, orientation=hill_orientation, color=[0.5, 0.5, 0.5, 1.0])
-        self.terrain_ids.append(hill_id)
+        self.add_terrain_box(hill_half_extents, hill_position, self.rng.uniform(0.0, 2 * np.pi), [0.5, 0.5, 0.5, 1.0], 'hill')
         stream_depth = 0.5
         stream_half_extents = [2.5, 25.0, stream_depth / 2]
         stream_position = [-15.0, 0.0, stream_depth / 2]
-        stream_orientation = self._p.getQuaternionFromEuler([0.0, 0.0, 0.0])
-        stream_id = self.create_box(mass=0.0, half_extents=stream_half_extents, position=stream_position, orientation=stream_orientation, color=[0.0, 0.0, 1.0, 0.5])
-        self.terrain_ids.append(stream_id)
+        self.add_terrain_box(stream_half_extents, stream_position, 0.0, [0.0, 0.0, 1.0, 0.5], 'stream')
         num_patches = 10
         patch_radius = 3.0
         for _ in range(num_patches):
-            patch_position = [np.random.uniform(-25.0, 25.0), np.random.uniform(-25.0, 25.0), 0.05]
-            patch_orientation = self._p.getQuaternionFromEuler([0.0, 0.0, np.random.uniform(0.0, 2 * np.pi)])
-            patch_id = self.create_cylinder(mass=0.0, radius=patch_radius, height=0.1, position=patch_position, orientation=patch_orientation, color=[0.8, 0.8, 0.4, 1.0])
-            self.terrain_ids.append(patch_id)
+            patch_position = [self.rng.uniform(-25.0, 25.0), self.rng.uniform(-25.0, 25.0), 0.05]
+            self.add_terrain_cylinder(patch_radius, 0.1, patch_position, self.rng.uniform(0.0, 2 * np.pi), [0.8, 0.8, 0.4, 1.0], 'patch')
         num_obstacles = 20
         obstacle_radius_range = [0.5, 1.0]
         obstacle_height_range = [1.0, 2.0]
         for _ in range(num_obstacles):
-            obstacle_radius = np.random.uniform(obstacle_radius_range[0], obstacle_radius_range[1])
-            obstacle_height = np.random.uniform(obstacle_height_range[0], obstacle_height_range[1])
-            obstacle_position = [np.random.uniform(-25.0, 25.0), np.random.uniform(-25.0, 25.0), obstacle_height / 2]
-            obstacle_orientation = self._p.getQuaternionFromEuler([0.0, 0.0, np.random.uniform(0.0, 2 * np.pi)])
-            if np.random.rand() < 0.5:
-                obstacle_id = self.create_cylinder(mass=0.0, radius=obstacle_radius, height=obstacle_height, position=obstacle_position, orientation=obstacle_orientation, color=[0.4, 0.2, 0.0, 1.0])
+            obstacle_radius = self.rng.uniform(obstacle_radius_range[0], obstacle_radius_range[1])
+            obstacle_height = self.rng.uniform(obstacle_height_range[0], obstacle_height_range[1])
+            obstacle_position = [self.rng.uniform(-25.0, 25.0), self.rng.uniform(-25.0, 25.0), obstacle_height / 2]
+            obstacle_yaw = self.rng.uniform(0.0, 2 * np.pi)
+            if self.rng.random() < 0.5:
+                self.add_terrain_cylinder(obstacle_radius, obstacle_height, obstacle_position, obstacle_yaw, [0.4, 0.2, 0.0, 1.0], 'obstacle')
             else:
-                obstacle_id = self.create_box(mass=0.0, half_extents=[obstacle_radius, obstacle_radius, obstacle_height / 2], position=obstacle_position, orientation=obstacle_orientation, color=[0.5, 0.5, 0.5, 1.0])
-            self.terrain_ids.append(obstacle_id)
+                self.add_terrain_box([obstacle_radius, obstacle_radius, obstacle_height / 2], obstacle_position, obstacle_yaw, [0.5, 0.5, 0.5, 1.0], 'obstacle')
+        if self.terrain is not None:
+            self.ground_id = self.terrain.build(self._p, color=[0.5, 0.5, 0.5, 1.0])
+
+    def add_terrain_box(self, half_extents, position, yaw, color, label):
+        self.terrain_features.append((label, position, float(np.hypot(half_extents[0], half_extents[1]))))
+        if self.terrain is not None:
+            self.terrain.add_box(position, half_extents, yaw=yaw)
+            return
+        orientation = self._p.getQuaternionFromEuler([0.0, 0.0, yaw])
+        self.terrain_ids.append(self.shapes.create_box(mass=0.0, half_extents=half_extents, position=position, orientation=orientation, color=color))
+
+    def add_terrain_cylinder(self, radius, height, position, yaw, color, label):
+        self.terrain_features.append((label, position, radius))
+        if self.terrain is not None:
+            self.terrain.add_cylinder(position, radius, height)
+            return
+        orientation = self._p.getQuaternionFromEuler([0.0, 0.0, yaw])
+        self.terrain_ids.append(self.shapes.create_cylinder(mass=0.0, radius=radius, height=height, position=position, orientation=orientation, color=color))
 
     def get_random_ball_start_position(self):
-        angle = np.random.uniform(0.0, 2 * np.pi)
-        distance = np.random.uniform(self.ball_start_distance_range[0], self.ball_start_distance_range[1])
+        angle = self.rng.uniform(0.0, 2 * np.pi)
+        distance = self.rng.uniform(self.ball_start_distance_range[0], self.ball_start_distance_range[1])
         x = self.robot_start_position[0] + distance * np.cos(angle)
         y = self.robot_start_position[1] + distance * np.sin(angle)
         z = self.ball_radius
         return [x, y, z]
 
     def get_object_position(self, object_id):
-        return np.asarray(self._p.getBasePositionAndOrientation(object_id)[0])
+        return self.state.position(object_id)
 
     def get_distance_to_object(self, object_id):
-        object_position = self.get_object_position(object_id)
         robot_position = self.robot.links['base'].position
+        if object_id in self.spatial:
+            return self.spatial.distance(object_id, robot_position)
+        object_position = self.get_object_position(object_id)
         return np.linalg.norm(object_position[:2] - robot_position[:2])
 
-    def reset(self):
+    def get_terrain_near_robot(self, distance, label=None):
+        """Indices into terrain_features (e.g. label 'obstacle' or 'patch') whose footprint is within `distance` of the robot, nearest first."""
+        return [key[1] for key in self.spatial.within(self.robot.links['base'].position, distance, label) if key != self.ball_id]
+
+    def get_distance_to_ball(self):
+        return self.step_context.get('distance_to_ball', lambda: self.get_distance_to_object(self.ball_id))
+
+    def is_robot_near_start(self):
+        return self.step_context.get('robot_near_start', lambda: np.linalg.norm(self.robot.links['base'].position[:2] - self.robot_start_position[:2]) < self.success_distance)
+
+    def is_robot_upright(self):
+        return self.step_context.get('robot_upright', lambda: is_upright(self.robot.links['base'].orientation))
+
+    def place_bodies(self):
+        self._p.resetBasePositionAndOrientation(self.robot.robot_id, [self.robot_start_position[0], self.robot_start_position[1], self.ground_thickness / 2 + self.robot.links['base'].position_init[2]], self.robot.links['base'].orientation_init)
+
+    def reset(self, seed=None):
+        reseed(self, seed)
         observation = super().reset()
         self.time = 0.0
+        self.reset_snapshot.restore_or_place(self.place_bodies)
         self.ball_start_position = self.get_random_ball_start_position()
         self._p.resetBasePositionAndOrientation(self.ball_id, self.ball_start_position, [0.0, 0.0, 0.0, 1.0])
-        self._p.resetBasePositionAndOrientation(self.robot.robot_id, [self.robot_start_position[0], self.robot_start_position[1], self.ground_thickness / 2 + self.robot.links['base'].position_init[2]], self.robot.links['base'].orientation_init)
+        self.step_context.invalidate()
         return observation
 
     def step(self, action):
         self.ball_position = self.get_object_position(self.ball_id)
         self.robot_position = self.robot.links['base'].position
         self.distance_to_ball = self.get_distance_to_object(self.ball_id)
+        self.step_context.invalidate()
         observation, reward, terminated, truncated, info = super().step(action)
         self.time += self.dt
         if self.distance_to_ball > self.ball_lost_distance:
             self.ball_start_position = self.get_random_ball_start_position()
             self._p.resetBasePositionAndOrientation(self.ball_id, self.ball_start_position, [0.0, 0.0, 0.0, 1.0])
+            self.step_context.invalidate()
         return (observation, reward, terminated, truncated, info)
 
     def get_task_rewards(self, action):
         new_ball_position = self.get_object_position(self.ball_id)
-        new_robot_position = self.robot.links['base'].position
-        new_distance_to_ball = self.get_distance_to_object(self.ball_id)
+        new_distance_to_ball = self.get_distance_to_ball()
         explore_reward = 0.1 * (self.distance_to_ball - new_distance_to_ball) / self.dt
         pickup_reward = 0.0
-        if self._p.getContactPoints(bodyA=self.robot.robot_id, bodyB=self.ball_id) and new_ball_position[2] > self.ball_radius:
+        if self.contacts.in_contact(self.robot.robot_id, self.ball_id) and new_ball_position[2] > self.ball_radius:
             pickup_reward = 10.0
         return_reward = 0.0
-        if new_distance_to_ball < self.success_distance and np.linalg.norm(new_robot_position[:2] - self.robot_start_position[:2]) < self.success_distance:
+        if new_distance_to_ball < self.success_distance and self.is_robot_near_start():
             return_reward = 100.0
         drop_penalty = -1.0 if new_distance_to_ball > self.ball_lost_distance else 0.0
         return {'explore_reward': explore_reward, 'pickup_reward': pickup_reward, 'return_reward': return_reward, 'drop_penalty': drop_penalty}
 
     def get_terminated(self, action):
-        if np.dot(np.asarray([0, 0, 1]), np.asarray(self._p.getMatrixFromQuaternion(self.robot.links['base'].orientation)).reshape(3, 3)[:, 2]) < 0.5:
+        if not self.is_robot_upright():
             return True
         if self.time >= self.time_limit:
             return True
@@ -158,6 +219,4 @@ class Env(R2D2Env):
 
     def get_success(self):
         ball_position = self.get_object_position(self.ball_id)
-        robot_position = self.robot.links['base'].position
-        distance_to_ball = self.get_distance_to_object(self.ball_id)
-        return distance_to_ball < self.success_distance and np.linalg.norm(robot_position[:2] - self.robot_start_position[:2]) < self.success_distance and (ball_position[2] > self.ball_radius)
\ No newline at end of file
+        return self.get_distance_to_ball() < self.success_distance and self.is_robot_near_start() and (ball_position[2] > self.ball_radius)
\ No newline at end of file
@@ -0,0 +1,177 @@
+import importlib.util
+import os
+import sys
+import types
+
+import pybullet
+import pytest
+from pybullet_utils import bullet_client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LONG_RUN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'long_run')
+
+
+def task_path(name):
+    return os.path.join(LONG_RUN, name + '.py')
+
+
+@pytest.fixture
+def p():
+    client = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+    client.setGravity(0.0, 0.0, -9.81)
+    yield client
+    client.disconnect()
+
+
+BALL_TASK = '''
+import types
+
+import numpy as np
+import pybullet
+from pybullet_utils import bullet_client
+
+from envkit.batched import RewardTerms, distances_xy
+from envkit.snapshot import ResetSnapshot, reseed
+from envkit.state import StateSnapshot
+
+
+class Env:
+    action_space = types.SimpleNamespace(shape=(2,), dtype=np.float32, low=-np.ones(2, dtype=np.float32), high=np.ones(2, dtype=np.float32))
+    fast_reset = False
+    reward_terms = RewardTerms(
+        fields={'ball_position': lambda env: env.state.position(env.ball_id), 'previous_x': 'previous_x', 'steps': 'steps'},
+        constants={'goal': 'goal', 'max_steps': 'max_steps'},
+        derived={'distance': lambda b: distances_xy(b.ball_position, b.goal)},
+        rewards={'progress': lambda b: b.ball_position[:, 0] - b.previous_x, 'near_goal': lambda b: np.where(b.distance < 1.0, 1.0, 0.0)},
+        terminated=lambda b: (b.distance < 0.5) | (b.steps >= b.max_steps),
+        success=lambda b: b.distance < 0.5)
+
+    def __init__(self, seed=None):
+        self._p = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+        self._p.setGravity(0.0, 0.0, -9.81)
+        self.rng = np.random.default_rng(seed)
+        self.goal = [1.0, 0.0, 0.0]
+        self.max_steps = 40
+        self.ground_id = self._p.createMultiBody(0.0, self._p.createCollisionShape(self._p.GEOM_BOX, halfExtents=[5.0, 5.0, 0.1]), basePosition=[0.0, 0.0, -0.1])
+        self.ball_id = self._p.createMultiBody(1.0, self._p.createCollisionShape(self._p.GEOM_SPHERE, radius=0.2), basePosition=[0.0, 0.0, 0.2])
+        self.state = StateSnapshot(self._p, [self.ball_id])
+        self.reset_snapshot = ResetSnapshot(self._p, enabled=self.fast_reset)
+
+    def place_bodies(self):
+        self._p.resetBasePositionAndOrientation(self.ball_id, [0.0, 0.0, 0.2], [0.0, 0.0, 0.0, 1.0])
+        self._p.resetBaseVelocity(self.ball_id, [0.0, 0.0, 0.0], [0.0, 0.0, 0.0])
+
+    def reset(self, seed=None):
+        reseed(self, seed)
+        self.steps = 0
+        self.reset_snapshot.restore_or_place(self.place_bodies)
+        self._p.resetBaseVelocity(self.ball_id, [self.rng.uniform(-1.0, 1.0), self.rng.uniform(-1.0, 1.0), 0.0], [0.0, 0.0, 0.0])
+        self.state.invalidate()
+        return self.observe()
+
+    def observe(self):
+        return np.concatenate([self.state.position(self.ball_id), self.state.velocity(self.ball_id)]).astype(np.float32)
+
+    def step(self, action):
+        self.previous_x = self.state.position(self.ball_id)[0]
+        self._p.applyExternalForce(self.ball_id, -1, [40.0 * float(action[0]), 40.0 * float(action[1]), 0.0], [0.0, 0.0, 0.0], self._p.LINK_FRAME)
+        self._p.stepSimulation()
+        self.steps += 1
+        self.state.invalidate()
+        rewards = self.get_task_rewards(action)
+        terminated = self.get_terminated(action)
+        return self.observe(), sum(rewards.values()), terminated, False, {'success': self.get_success(), 'rewards': rewards}
+
+    def distance(self):
+        position = self.state.position(self.ball_id)
+        return float(np.hypot(position[0] - self.goal[0], position[1] - self.goal[1]))
+
+    def get_task_rewards(self, action):
+        return {'progress': self.state.position(self.ball_id)[0] - self.previous_x, 'near_goal': 1.0 if self.distance() < 1.0 else 0.0}
+
+    def get_terminated(self, action):
+        return self.distance() < 0.5 or self.steps >= self.max_steps
+
+    def get_success(self):
+        return self.distance() < 0.5
+
+    def close(self):
+        self._p.disconnect()
+'''
+
+
+@pytest.fixture
+def ball_task(tmp_path):
+    """Path of a small pybullet-only task: a ball pushed towards a goal, with scalar and batched reward terms."""
+    path = tmp_path / 'task_ball.py'
+    path.write_text(BALL_TASK)
+    return str(path)
+
+
+R2D2_BASE = '''
+import types
+
+import numpy as np
+import pybullet
+import pybullet_data
+from pybullet_utils import bullet_client
+
+
+class Link:
+    def __init__(self, p, body_id):
+        self._p = p
+        self.body_id = body_id
+        self.position_init = np.array([0.0, 0.0, 0.5])
+        self.orientation_init = np.array([0.0, 0.0, 0.0, 1.0])
+
+    @property
+    def position(self):
+        return np.asarray(self._p.getBasePositionAndOrientation(self.body_id)[0])
+
+    @property
+    def orientation(self):
+        return np.asarray(self._p.getBasePositionAndOrientation(self.body_id)[1])
+
+
+class R2D2Env:
+    """Base pose and velocity controlled R2D2: enough of the real base class to build and step the long_run tasks."""
+
+    def __init__(self):
+        self._p = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+        self._p.setGravity(0.0, 0.0, -9.81)
+        self.dt = 1.0 / 60.0
+        self._p.setTimeStep(self.dt)
+        self._p.setAdditionalSearchPath(pybullet_data.getDataPath())
+        robot_id = self._p.loadURDF('r2d2.urdf', [0.0, 0.0, 0.5])
+        self.robot = types.SimpleNamespace(robot_id=robot_id, links={'base': Link(self._p, robot_id)})
+        self.action_space = types.SimpleNamespace(shape=(3,), dtype=np.float32, low=-np.ones(3, dtype=np.float32), high=np.ones(3, dtype=np.float32))
+
+    def observe(self):
+        position, orientation = self._p.getBasePositionAndOrientation(self.robot.robot_id)
+        return np.array(position + orientation, dtype=np.float32)
+
+    def reset(self):
+        self._p.resetBasePositionAndOrientation(self.robot.robot_id, [0.0, 0.0, 0.5], [0.0, 0.0, 0.0, 1.0])
+        return self.observe()
+
+    def step(self, action):
+        self._p.resetBaseVelocity(self.robot.robot_id, [2.0 * float(action[0]), 2.0 * float(action[1]), 3.0 * float(action[2])], [0.0, 0.0, 0.0])
+        self._p.stepSimulation()
+        rewards = self.get_task_rewards(action)
+        terminated = self.get_terminated(action)
+        return self.observe(), sum(rewards.values()), terminated, False, {'success': self.get_success(), 'rewards': rewards}
+
+    def close(self):
+        self._p.disconnect()
+'''
+
+
+@pytest.fixture
+def r2d2_env(monkeypatch):
+    """Makes the long_run tasks importable: oped itself if it is installed, otherwise a stand-in oped.envs.r2d2.base."""
+    if importlib.util.find_spec('oped') is not None:
+        return
+    for name in ('oped', 'oped.envs', 'oped.envs.r2d2', 'oped.envs.r2d2.base'):
+        monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+    exec(R2D2_BASE, vars(sys.modules['oped.envs.r2d2.base']))
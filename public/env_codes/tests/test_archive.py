@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+
+from envkit.archive import TaskArchive, hashed_embedding
+
+WORDS = ['ball', 'ramp', 'carry', 'push', 'box', 'goal', 'maze', 'door', 'key', 'stack', 'tower', 'robot', 'jump', 'gap', 'bridge', 'climb', 'stairs', 'slide', 'coin', 'collect']
+
+
+def write_task(directory, index, description):
+    path = os.path.join(directory, 'task_{}.py'.format(index))
+    with open(path, 'w') as f:
+        f.write('class Env:\n    """{}"""\n'.format(description))
+    return path
+
+
+def brute_force(descriptions, vector, exclude=None):
+    return {name: float(hashed_embedding(text) @ vector) for name, text in descriptions.items() if name != exclude}
+
+
+def assert_top(found, scores, k):
+    # Tasks with equal scores may come back in any order.
+    best = sorted(scores.values(), reverse=True)[:k]
+    np.testing.assert_allclose([score for _, score in found], best, atol=1e-5)
+    for name, score in found:
+        assert abs(scores[name] - score) < 1e-5
+    assert {name for name, score in scores.items() if score > best[-1] + 1e-5} <= {name for name, _ in found}
+
+
+def check_similar(archive, descriptions, rng):
+    for query in ['carry a ball up a ramp', 'stack boxes into a tower', 'unknown words only']:
+        assert_top(archive.similar(query, k=7), brute_force(descriptions, hashed_embedding(query)), 7)
+    for name in rng.choice(sorted(descriptions), size=5, replace=False):
+        assert_top(archive.similar(name, k=4), brute_force(descriptions, hashed_embedding(descriptions[name]), exclude=name), 4)
+    assert len(archive.similar('ball', k=1000)) == len(descriptions)
+    assert len(archive.similar('task_0', k=1000)) == len(descriptions) - 1
+
+
+def test_similar_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(0)
+    tasks = tmp_path / 'tasks'
+    tasks.mkdir()
+    descriptions, paths = {}, []
+    for index in range(100):
+        descriptions['task_{}'.format(index)] = ' '.join(rng.choice(WORDS, size=rng.integers(3, 10)))
+        paths.append(write_task(str(tasks), index, descriptions['task_{}'.format(index)]))
+    archive = TaskArchive(str(tmp_path / 'archive'))
+    assert sorted(archive.sync(paths)) == sorted(descriptions)
+    check_similar(archive, descriptions, rng)
+
+    descriptions['task_3'] = 'carry a ball up a ramp'
+    write_task(str(tasks), 3, descriptions['task_3'])
+    os.utime(paths[3], ns=(0, 0))
+    assert archive.sync(paths) == ['task_3']
+    assert archive.similar('carry a ball up a ramp', k=1)[0][0] == 'task_3'
+    archive.close()
+
+    archive = TaskArchive(str(tmp_path / 'archive'))
+    assert archive.sync(paths) == []
+    check_similar(archive, descriptions, rng)
+    archive.close()
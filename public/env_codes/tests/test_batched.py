@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from conftest import task_path
+from envkit.batched import BatchedRewards
+from envkit.loader import load_env_class
+from envkit.vec_env import VecEnv
+
+
+def compare(env_class, steps=200, num_envs=3):
+    scalar = [env_class(seed=i) for i in range(num_envs)]
+    attached = [env_class(seed=i) for i in range(num_envs)]
+    for env in scalar + attached:
+        env.reset()
+    batched = BatchedRewards(attached)
+    actions = np.random.default_rng(0).uniform(-1.0, 1.0, (steps, num_envs) + tuple(scalar[0].action_space.shape)).astype(np.float32)
+    ends = 0
+    for t in range(steps):
+        expected = [env.step(action) for env, action in zip(scalar, actions[t])]
+        for i, (want, got) in enumerate(zip(expected, batched.step(actions[t]))):
+            np.testing.assert_array_equal(got[0], want[0])
+            assert got[1] == pytest.approx(want[1], abs=1e-9)
+            assert got[2:4] == want[2:4]
+            assert got[4]['success'] == want[4]['success']
+            assert list(got[4]['rewards']) == list(want[4]['rewards'])
+            assert list(got[4]['rewards'].values()) == pytest.approx(list(want[4]['rewards'].values()), abs=1e-9)
+            if want[2] or want[3]:
+                ends += 1
+                scalar[i].reset()
+                attached[i].reset()
+    with pytest.raises(RuntimeError):
+        attached[0].step(actions[0, 0])
+    batched.detach()
+    attached[0].step(actions[0, 0])
+    for env in scalar + attached:
+        getattr(env, 'close', lambda: None)()
+    return ends
+
+
+def test_batched_rewards_match_scalar_rewards(ball_task):
+    assert compare(load_env_class(ball_task)) > 0
+
+
+def test_batched_vec_env_matches_scalar_vec_env(ball_task):
+    actions = np.random.default_rng(1).uniform(-1.0, 1.0, (80, 2, 2)).astype(np.float32)
+    results = []
+    for batched_rewards in (False, True):
+        vec = VecEnv(ball_task, num_workers=1, envs_per_worker=2, seed=0, batched_rewards=batched_rewards)
+        try:
+            results.append([tuple(np.array(array) for array in vec.step(action)[:3]) for action in actions])
+        finally:
+            vec.close()
+    for scalar, batched in zip(*results):
+        np.testing.assert_array_equal(batched[0], scalar[0])
+        np.testing.assert_allclose(batched[1], scalar[1], atol=1e-6)
+        np.testing.assert_array_equal(batched[2], scalar[2])
+
+
+@pytest.mark.parametrize('name', ['task_60', 'task_84', 'task_90', 'task_197'])
+def test_long_run_batched_rewards_match_scalar_rewards(r2d2_env, name):
+    compare(load_env_class(task_path(name)), steps=300)
@@ -0,0 +1,37 @@
+import time
+
+from envkit.benchmark import compare, run_isolated
+
+CRASHING_TASK = '''
+import os
+import signal
+
+
+class Env:
+    def __init__(self, seed=None):
+        {crash}
+'''
+
+
+def entry(task, steps_per_sec=100.0, **values):
+    return dict({'task': task, 'steps_per_sec': steps_per_sec, 'reset_s': 0.01, 'construction_s': 0.1}, **values)
+
+
+def test_crashes_are_reported_with_their_exit_status(tmp_path):
+    for name, crash, error in [('task_1', 'os.kill(os.getpid(), signal.SIGKILL)', 'killed by SIGKILL'), ('task_2', 'os._exit(3)', 'exited with code 3 before reporting')]:
+        path = tmp_path / (name + '.py')
+        path.write_text(CRASHING_TASK.format(crash=crash))
+        start = time.monotonic()
+        assert run_isolated(str(path), 10, 10, 0, timeout=60.0) == {'task': name, 'error': error}
+        assert time.monotonic() - start < 30.0
+
+
+def test_runs_a_task(ball_task):
+    result = run_isolated(ball_task, 30, 20, 0, timeout=60.0)
+    assert 'error' not in result and (result['task'], result['steps'], result['episodes']) == ('task_ball', 30, 2)
+
+
+def test_compare_flags_new_failures():
+    baseline = {'results': [entry('task_1'), entry('task_2'), entry('task_3', error='old failure'), entry('task_4')]}
+    results = {'results': [entry('task_1', steps_per_sec=50.0), {'task': 'task_2', 'error': 'Traceback\nValueError: broken\n'}, {'task': 'task_3', 'error': 'still broken'}, entry('task_4'), {'task': 'task_5', 'error': 'new task broken'}]}
+    assert compare(results, baseline, 0.2) == ['task_1: steps/sec 100.0 -> 50.0', 'task_2: failed: ValueError: broken', 'task_5: failed: new task broken']
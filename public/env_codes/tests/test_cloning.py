@@ -0,0 +1,70 @@
+import numpy as np
+import pybullet
+import pybullet_data
+from pybullet_utils import bullet_client
+
+from envkit.cloning import ClonePool
+
+
+class RobotInPile:
+    """An r2d2 driven through a dense pile of balls, so contact pairs appear and vanish every step."""
+
+    clone_state_attributes = ('steps',)
+
+    def __init__(self):
+        self._p = p = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+        p.setGravity(0.0, 0.0, -9.81)
+        p.setTimeStep(1.0 / 60)
+        p.setAdditionalSearchPath(pybullet_data.getDataPath())
+        p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_BOX, halfExtents=[10.0, 10.0, 0.1]), basePosition=[0.0, 0.0, -0.1])
+        self.robot_id = p.loadURDF('r2d2.urdf', [0.0, 0.0, 0.5])
+        ball = p.createCollisionShape(p.GEOM_SPHERE, radius=0.25)
+        rng = np.random.default_rng(0)
+        self.ball_ids = [p.createMultiBody(1.0, ball, basePosition=[rng.uniform(-1.0, 1.0), rng.uniform(-1.0, 1.0), 0.25]) for _ in range(20)]
+        self.rng = np.random.default_rng(1)
+        self.steps = 0
+
+    def step(self, action):
+        self._p.resetBaseVelocity(self.robot_id, [action[0], action[1], 3.0 * action[2]], [0.0, 0.0, 0.0])
+        self._p.stepSimulation()
+        self.steps += 1
+        return np.array([self._p.getBasePositionAndOrientation(body_id)[0] for body_id in [self.robot_id] + self.ball_ids]), self.rng.random()
+
+    def close(self):
+        self._p.disconnect()
+
+
+def run(env, actions):
+    positions, draws = zip(*(env.step(action) for action in actions))
+    return np.array(positions), np.array(draws), env.steps
+
+
+def test_restores_of_one_handle_repeat_the_unrestored_run():
+    actions = np.random.default_rng(1).uniform(-1.0, 1.0, (600, 3))
+    env = RobotInPile()
+    pool = ClonePool(env)
+    run(env, actions[:40])
+    root = pool.clone()
+    first = run(env, actions[40:200])
+    other = pool.clone()
+    second = run(env, actions[200:])
+    reference = np.concatenate([first[0], second[0]]), np.concatenate([first[1], second[1]]), second[2]
+    for handle in (root, other, root, other):
+        pool.restore(handle)
+        pool.restore(root)
+        positions, draws, steps = run(env, actions[40:])
+        np.testing.assert_array_equal(positions, reference[0])
+        np.testing.assert_array_equal(draws, reference[1])
+        assert steps == reference[2]
+    env.close()
+
+
+def test_evicted_handles_are_released():
+    env = RobotInPile()
+    pool = ClonePool(env, capacity=2)
+    handles = [pool.clone() for _ in range(3)]
+    assert len(pool) == 2 and pool.evictions == 1
+    assert handles[0] not in pool
+    pool.release(handles[1])
+    assert len(pool) == 1
+    env.close()
@@ -0,0 +1,44 @@
+import pybullet
+from pybullet_utils import bullet_client
+
+from envkit.compaction import StaticScenery
+from envkit.contacts import ContactCache
+from envkit.shapes import ShapeFactory
+
+TILTED = [0.0, 0.0, 0.3826834, 0.9238795]
+# (x, y) of the spheres: on single boxes, on a rotated box, on the cylinders, and across the seam of two touching boxes.
+DROPS = [(-3.0, 0.0), (-1.0, 0.4), (1.0, -0.4), (3.0, 3.0), (-3.0, 3.0), (0.0, -3.0), (2.0, -3.0), (-2.0, 0.0)]
+
+
+def build(enabled):
+    p = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+    p.setGravity(0.0, 0.0, -9.81)
+    shapes = ShapeFactory(p)
+    scenery_ids = shapes.create_boxes(0.0, [1.0, 1.0, 0.1], [[x, 0.0, 0.0] for x in (-3.0, -1.0, 1.0)], [0.5, 0.5, 0.5, 1.0])
+    scenery_ids.append(shapes.create_box(0.0, [1.0, 1.0, 0.1], [3.0, 3.0, 0.0], [0.5, 0.5, 0.5, 1.0], orientation=TILTED))
+    scenery_ids.append(shapes.create_box(0.0, [1.0, 1.0, 0.1], [-3.0, 3.0, 0.0], [0.2, 0.2, 0.2, 1.0]))
+    shapes.change_dynamics(scenery_ids[-1], lateralFriction=0.2)
+    scenery_ids.extend(shapes.create_cylinders(0.0, 0.8, 0.2, [[x, -3.0, 0.0] for x in (0.0, 2.0)], [0.8, 0.8, 0.8, 1.0]))
+    ball_ids = [shapes.create_sphere(1.0, 0.2, [x, y, 0.35], [1.0, 1.0, 1.0, 1.0]) for x, y in DROPS]
+    scenery = StaticScenery(p, shapes, scenery_ids, enabled=enabled)
+    return p, ball_ids, scenery.remap(scenery_ids), ContactCache(p, scenery)
+
+
+def test_compacted_contacts_resolve_to_the_same_bodies():
+    worlds = [build(enabled) for enabled in (False, True)]
+    try:
+        plain, compact = worlds
+        assert all(body_id < 0 for body_id in compact[2]) and all(body_id >= 0 for body_id in plain[2])
+        touched = []
+        for p, ball_ids, scenery_ids, contacts in worlds:
+            for _ in range(60):
+                p.stepSimulation()
+            contacts.invalidate()
+            names = dict(zip(scenery_ids, range(len(scenery_ids))))
+            touched.append([sorted(names[body_id] for body_id in contacts.touching(ball_id)) for ball_id in ball_ids])
+            assert all(contacts.in_contact(ball_id, scenery_ids[index]) for ball_id, indices in zip(ball_ids, touched[-1]) for index in indices)
+        assert touched[0] == touched[1]
+        assert touched[0] == [[0], [1], [2], [3], [4], [5], [6], [0, 1]]
+    finally:
+        for p, _, _, _ in worlds:
+            p.disconnect()
@@ -0,0 +1,56 @@
+import pybullet_data
+
+from envkit.contacts import ContactCache
+
+
+def build_scene(p):
+    ground = p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_BOX, halfExtents=[5.0, 5.0, 0.1]), -1, [0.0, 0.0, -0.1])
+    box = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.2, 0.2, 0.2])
+    sphere = p.createCollisionShape(p.GEOM_SPHERE, radius=0.15)
+    p.setAdditionalSearchPath(pybullet_data.getDataPath())
+    robot = p.loadURDF('r2d2.urdf', [0.0, 0.0, 0.5])
+    bodies = [ground, robot]
+    bodies += [p.createMultiBody(1.0, box, -1, [2.0, 0.0, 0.2 + 0.41 * level]) for level in range(3)]
+    bodies += [p.createMultiBody(0.5, sphere, -1, position) for position in ([0.35, 0.0, 1.4], [-2.0, -2.0, 0.15], [3.0, 3.0, 2.0])]
+    return bodies
+
+
+def check(p, contacts, bodies):
+    for body_a in bodies:
+        points = p.getContactPoints(bodyA=body_a)
+        assert contacts.touching(body_a) == {point[2] for point in points}
+        assert contacts.in_contact(body_a) == (len(points) > 0)
+        for body_b in bodies:
+            points = p.getContactPoints(bodyA=body_a, bodyB=body_b)
+            assert contacts.links(body_a, body_b) == {(point[3], point[4]) for point in points}
+            assert contacts.in_contact(body_a, body_b) == (len(points) > 0)
+            for link_a in range(-1, p.getNumJoints(body_a)):
+                assert contacts.in_contact(body_a, body_b, link_a=link_a) == (len(p.getContactPoints(bodyA=body_a, bodyB=body_b, linkIndexA=link_a)) > 0)
+        for link_a in range(-1, p.getNumJoints(body_a)):
+            assert contacts.in_contact(body_a, link_a=link_a) == (len(p.getContactPoints(bodyA=body_a, linkIndexA=link_a)) > 0)
+
+
+def test_cached_contacts_match_direct_queries(p):
+    bodies = build_scene(p)
+    contacts = ContactCache(p)
+    seen = set()
+    for step in range(240):
+        p.stepSimulation()
+        contacts.invalidate()
+        if step % 20 == 0:
+            check(p, contacts, bodies)
+            seen.update((body_a, body_b) for body_a in bodies for body_b in contacts.touching(body_a))
+    robot_links = {link_a for body_b in bodies for link_a, _ in contacts.links(bodies[1], body_b)}
+    assert len(seen) >= 10 and len(robot_links) >= 2
+
+
+def test_reads_hold_until_invalidated(p):
+    bodies = build_scene(p)
+    contacts = ContactCache(p)
+    p.stepSimulation()
+    assert not contacts.touching(bodies[-1])
+    for _ in range(240):
+        p.stepSimulation()
+    assert not contacts.touching(bodies[-1])
+    contacts.invalidate()
+    assert contacts.touching(bodies[-1]) == {bodies[0]}
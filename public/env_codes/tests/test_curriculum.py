@@ -0,0 +1,53 @@
+from envkit.curriculum import IMPOSSIBLE, LEARNING, MASTERED, NEW, Curriculum, run_curriculum
+
+
+def make_curriculum(**kwargs):
+    curriculum = Curriculum(seed=0, **kwargs)
+    for name in ('a', 'b', 'c'):
+        curriculum.add('{}.py'.format(name), name)
+    return curriculum
+
+
+def test_status_follows_success_statistics():
+    curriculum = make_curriculum(fast=0.5, min_episodes=2, give_up_after=4)
+    for _ in range(4):
+        curriculum.report('a', True)
+        curriculum.report('b', False)
+    curriculum.report('c', True)
+    curriculum.report('c', False)
+    assert [curriculum.status(name) for name in 'abc'] == [MASTERED, IMPOSSIBLE, LEARNING]
+    curriculum.report('b', True)
+    assert curriculum.status('b') == LEARNING
+
+
+def test_new_tasks_first_then_by_learning_progress():
+    curriculum = make_curriculum(fast=0.5, min_episodes=1, explore=0.0, revisit=0.0)
+    assert sorted(curriculum.next_task() for _ in range(3)) == ['a', 'b', 'c']
+    assert curriculum.status('a') == NEW
+    for name, success in (('a', True), ('b', False), ('c', True)):
+        curriculum.report(name, success)
+    for _ in range(20):
+        curriculum.report('a', True)
+    curriculum.report('c', False)
+    # a is mastered and b has made no progress; only c's success rate is changing.
+    assert {curriculum.next_task() for _ in range(20)} == {'c'}
+
+
+def test_failing_task_is_dropped_after_max_failures():
+    curriculum = make_curriculum(max_failures=2)
+    assert not curriculum.fail('a')
+    curriculum.report('a', False)
+    assert not curriculum.fail('a')
+    assert curriculum.fail('a')
+    assert 'a' not in curriculum.tasks
+    assert not curriculum.fail('a')
+
+
+def test_run_curriculum_counts_every_episode(ball_task):
+    curriculum = Curriculum([ball_task], seed=0)
+    results = []
+    summary = run_curriculum(curriculum, num_workers=2, episodes=5, max_steps=20, on_episode=results.append)
+    assert len(results) == 5
+    assert all(result['error'] is None for result in results)
+    assert [row['episodes'] for row in summary] == [5]
+    assert curriculum.tasks[summary[0]['task']].running == 0
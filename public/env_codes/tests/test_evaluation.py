@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from envkit.contacts import ContactCache
+from envkit.evaluation import StepContext, in_box_xy, is_upright, up_alignment
+from envkit.state import StateSnapshot
+
+
+def test_up_alignment_is_the_z_z_rotation_term(p):
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        orientation = p.getQuaternionFromEuler(rng.uniform(-np.pi, np.pi, 3).tolist())
+        expected = p.getMatrixFromQuaternion(orientation)[8]
+        assert up_alignment(orientation) == pytest.approx(expected, abs=1e-12)
+        assert is_upright(orientation, 0.3) == (expected >= 0.3)
+    assert up_alignment([0.0, 0.0, 0.0, 1.0]) == 1.0 and up_alignment([1.0, 0.0, 0.0, 0.0]) == -1.0
+
+
+def test_in_box_xy():
+    assert in_box_xy([0.9, -0.4, 5.0], [0.5, 0.0], [1.0, 1.0])
+    assert not in_box_xy([1.0, 0.0], [0.5, 0.0], [1.0, 1.0])
+    assert not in_box_xy([0.5, -0.6], [0.5, 0.0], [1.0, 1.0])
+
+
+def test_memo_is_cleared_every_step(p):
+    body_id = p.createMultiBody(1.0, p.createCollisionShape(p.GEOM_SPHERE, radius=0.1), -1, [0.0, 0.0, 1.0])
+    state, contacts = StateSnapshot(p, [body_id]), ContactCache(p)
+    context = StepContext(state, contacts)
+    calls = []
+
+    def height():
+        calls.append(1)
+        return state.position(body_id)[2]
+    heights = []
+    for _ in range(5):
+        p.stepSimulation()
+        context.invalidate()
+        heights.append(context.get('height', height))
+        assert context.get('height', height) == heights[-1] == p.getBasePositionAndOrientation(body_id)[0][2]
+    assert len(calls) == 5 and all(np.diff(heights) < 0.0)
+    p.stepSimulation()
+    assert context.get('height', height) == heights[-1] and len(calls) == 5
+    context.invalidate()
+    assert context.get('height', height) == p.getBasePositionAndOrientation(body_id)[0][2] < heights[-1]
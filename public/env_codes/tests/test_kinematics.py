@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from envkit.kinematics import ChaseTrack, KinematicTracks, PingPongTrack, RotationTrack, Track
+
+
+def box(p, position):
+    return p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.1, 0.5, 0.5]), -1, position)
+
+
+def test_track_requires_advance():
+    with pytest.raises(TypeError):
+        Track([[0.0, 0.0, 0.0]])
+
+
+def test_ping_pong_reverses_past_its_extent(p):
+    dt = 0.05
+    kinematics = KinematicTracks(p)
+    track = kinematics.add(PingPongTrack([[0.0, 0.0, 1.0], [2.0, 0.0, 1.0]], axis=[0.0, 2.0, 0.0], speeds=[3.0, -1.5], extents=5.0))
+    left, right = box(p, [0.0, -0.5, 1.0]), box(p, [0.0, 0.5, 1.0])
+    track.attach(0, left, [0.0, -0.5, 0.0])
+    track.attach(0, right, [0.0, 0.5, 0.0])
+    displacements, directions = [], np.sign(track.speeds)
+    for step in range(1, 400):
+        previous = track.displacements.copy()
+        kinematics.update(step * dt, dt)
+        moved = np.sign(track.displacements - previous)
+        # The direction flips exactly on the steps that start beyond the extent.
+        np.testing.assert_array_equal(moved != directions, np.abs(previous) > 5.0)
+        directions = moved
+        displacements.append(track.displacements.copy())
+        np.testing.assert_allclose(p.getBasePositionAndOrientation(left)[0], track.positions[0] + [0.0, -0.5, 0.0], atol=1e-9)
+        np.testing.assert_allclose(p.getBasePositionAndOrientation(right)[0], track.positions[0] + [0.0, 0.5, 0.0], atol=1e-9)
+    displacements = np.array(displacements)
+    np.testing.assert_allclose(np.abs(displacements).max(axis=0), 5.0 + np.array([3.0, 1.5]) * dt, atol=0.06)
+    assert (displacements.min(axis=0) < -5.0).all()
+    np.testing.assert_allclose(track.positions[:, 1], displacements[-1])
+    np.testing.assert_allclose(track.positions[:, [0, 2]], [[0.0, 1.0], [2.0, 1.0]])
+    track.reset()
+    assert not track.displacements.any() and (track.positions == track.positions_init).all()
+
+
+def test_rotation_yaw_is_angular_velocity_times_time(p):
+    kinematics = KinematicTracks(p)
+    omegas = np.array([0.5, -1.25, 2.0])
+    track = kinematics.add(RotationTrack([[0.0, 0.0, 1.0], [3.0, 0.0, 1.0], [6.0, 0.0, 1.0]], omegas))
+    body_id = track.attach(1, box(p, [3.0, 0.0, 1.0]))
+    for step in range(1, 50):
+        time = step * 0.1
+        kinematics.update(time, 0.1)
+        np.testing.assert_allclose(track.yaws, omegas * time)
+        assert p.getEulerFromQuaternion(p.getBasePositionAndOrientation(body_id)[1])[2] == pytest.approx(np.arctan2(np.sin(-1.25 * time), np.cos(-1.25 * time)), abs=1e-6)
+        np.testing.assert_allclose(p.getBasePositionAndOrientation(body_id)[0], [3.0, 0.0, 1.0], atol=1e-9)
+
+
+def test_chase_stops_short_of_the_target(p):
+    target = p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_SPHERE, radius=0.2), -1, [4.0, 3.0, 0.5])
+    kinematics = KinematicTracks(p)
+    track = kinematics.add(ChaseTrack(p, [[0.0, 0.0, 0.5]], [target], speeds=1.0, stop_distance=1.0))
+    chaser = track.attach(0, box(p, [0.0, 0.0, 0.5]))
+    for step in range(1, 101):
+        kinematics.update(step * 0.1, 0.1)
+        distance = np.linalg.norm(track.positions[0, :2] - [4.0, 3.0])
+        assert distance == pytest.approx(max(5.0 - 0.1 * step, 1.0))
+    assert track.yaws[0] == pytest.approx(np.arctan2(3.0, 4.0))
+    np.testing.assert_allclose(track.velocities, 0.0, atol=1e-9)
+    np.testing.assert_allclose(p.getBasePositionAndOrientation(chaser)[0], track.positions[0], atol=1e-9)
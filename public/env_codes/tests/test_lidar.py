@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pytest
+
+from envkit.lidar import MAX_RAYS_PER_BATCH, Lidar
+
+
+def build_scene(p):
+    p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_BOX, halfExtents=[10.0, 10.0, 0.1]), -1, [0.0, 0.0, -0.1])
+    for x, y, half in [(3.0, 0.0, 0.5), (-2.0, 2.0, 0.3), (0.0, -4.0, 1.0), (1.5, 1.5, 0.2)]:
+        p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_BOX, halfExtents=[half, half, 1.0]), -1, [x, y, 1.0])
+    p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_SPHERE, radius=0.6), -1, [-3.0, -1.0, 0.6])
+
+
+def reference_scan(p, position, orientation, num_rays, fov, num_layers, vertical_fov, min_range, max_range, height, yaw_only):
+    if yaw_only:
+        yaw = p.getEulerFromQuaternion(orientation)[2]
+        rotation = np.array([[math.cos(yaw), -math.sin(yaw), 0.0], [math.sin(yaw), math.cos(yaw), 0.0], [0.0, 0.0, 1.0]])
+    else:
+        rotation = np.reshape(p.getMatrixFromQuaternion(orientation), (3, 3))
+    full_circle = fov >= 2 * math.pi - 1e-9
+    ranges = []
+    for layer in range(num_layers):
+        elevation = -vertical_fov / 2 + vertical_fov * layer / (num_layers - 1) if num_layers > 1 else 0.0
+        for ray in range(num_rays):
+            azimuth = -fov / 2 + fov * ray / (num_rays if full_circle else num_rays - 1)
+            direction = rotation @ [math.cos(elevation) * math.cos(azimuth), math.cos(elevation) * math.sin(azimuth), math.sin(elevation)]
+            origin = np.asarray(position) + rotation @ [0.0, 0.0, height]
+            fraction = p.rayTest((origin + min_range * direction).tolist(), (origin + max_range * direction).tolist())[0][2]
+            ranges.append(min_range + (max_range - min_range) * fraction)
+    return np.array(ranges)
+
+
+@pytest.mark.parametrize('settings', [
+    dict(num_rays=64),
+    dict(num_rays=48, fov=math.pi, min_range=0.2, max_range=6.0, height=0.4),
+    dict(num_rays=32, num_layers=5, vertical_fov=0.8, height=0.5),
+    dict(num_rays=32, num_layers=3, vertical_fov=0.6, height=0.5, yaw_only=False),
+])
+def test_scan_matches_single_rays(p, settings):
+    build_scene(p)
+    lidar = Lidar(p, **settings)
+    arguments = dict(num_rays=32, fov=2 * math.pi, num_layers=1, vertical_fov=0.0, min_range=0.3, max_range=10.0, height=0.0, yaw_only=True)
+    arguments.update(settings)
+    hits = 0
+    for position, euler in [([0.0, 0.0, 0.3], [0.0, 0.0, 0.0]), ([0.5, -1.0, 0.3], [0.0, 0.0, 2.1]), ([-1.0, 0.5, 0.6], [0.2, -0.15, -1.3])]:
+        orientation = p.getQuaternionFromEuler(euler)
+        ranges = lidar.scan(position, orientation)
+        assert ranges.dtype == np.float32 and ranges.shape == (len(lidar),)
+        expected = reference_scan(p, position, orientation, **arguments)
+        np.testing.assert_allclose(ranges, expected, rtol=0, atol=1e-4)
+        hits += int(np.sum(expected < arguments['max_range']))
+    assert 0 < hits < 3 * len(lidar)
+
+
+def test_rejects_scans_larger_than_one_batch(p):
+    with pytest.raises(ValueError):
+        Lidar(p, num_rays=MAX_RAYS_PER_BATCH, num_layers=2)
@@ -0,0 +1,43 @@
+import math
+
+import numpy as np
+
+from envkit.memory import format_table, measure_footprint, memory_usage
+from envkit.state import StepValues
+
+
+def test_memory_usage_sees_allocations():
+    before = memory_usage()
+    assert 0.0 < before['private_mb'] <= before['rss_mb'] and 0.0 < before['pss_mb'] <= before['rss_mb']
+    block = np.ones(64 * 2 ** 20 // 8)
+    after = memory_usage()
+    assert after['rss_mb'] - before['rss_mb'] > 48.0
+    assert after['private_mb'] - before['private_mb'] > 48.0
+    del block
+
+
+def test_footprint_report(ball_task):
+    result = measure_footprint(ball_task, num_envs=3, steps=5)
+    assert (result['task'], result['envs']) == ('task_ball', 3)
+    assert result['process_mb'] > 0.0 and result['python_kb_per_env'] > 0.0
+    assert all(math.isfinite(result[key]) for key in ('rss_mb_per_env', 'pss_mb_per_env'))
+    lines = format_table([result, {'task': 'task_broken', 'error': 'Traceback (most recent call last):\nValueError: no robot\n'}]).splitlines()
+    assert len(lines) == 3 and lines[1].split()[0] == 'task_ball'
+    assert lines[2] == 'task_broken  FAILED: ValueError: no robot'
+
+
+class Task:
+    step_values = StepValues(position=3, distance=1)
+
+
+def test_step_values_live_in_one_array_per_instance():
+    first, second = Task(), Task()
+    assert math.isnan(first.distance) and np.isnan(first.position).all()
+    first.position = [1.0, 2.0, 3.0]
+    first.distance = 0.5
+    position = first.position
+    first.position = [4.0, 5.0, 6.0]
+    np.testing.assert_array_equal(position, [1.0, 2.0, 3.0])
+    assert isinstance(first.distance, float) and first.distance == 0.5
+    np.testing.assert_array_equal(first.step_values, [4.0, 5.0, 6.0, 0.5])
+    assert 'position' not in vars(first) and np.isnan(second.step_values).all()
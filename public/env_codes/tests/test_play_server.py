@@ -0,0 +1,139 @@
+import asyncio
+
+from envkit.play_server import PlayServer
+
+LEVEL = '''
+class Env:
+    """{doc}"""
+
+    def __init__(self, seed=None):
+        {init}
+
+    def reset(self):
+        return None
+
+    def step(self, action):
+        {step}
+        return None, 1.0, False, False, {{'success': True}}
+'''
+
+
+class FakeSocketServer:
+    def __init__(self):
+        self.emitted = []
+
+    def on(self, event, handler):
+        pass
+
+    async def emit(self, event, data=None, to=None, callback=None):
+        self.emitted.append((event, data, to))
+
+    def events(self, sid, event):
+        return [data for name, data, to in self.emitted if name == event and to == sid]
+
+
+def write_level(tmp_path, name, init='pass', step='pass'):
+    path = tmp_path / (name + '.py')
+    path.write_text(LEVEL.format(doc=name, init=init, step=step))
+    return str(path)
+
+
+def test_failing_session_is_paused_and_told_while_others_keep_playing(tmp_path):
+    levels = [write_level(tmp_path, 'task_1'), write_level(tmp_path, 'task_2', step="raise RuntimeError('broken level')"), write_level(tmp_path, 'task_3', init="raise RuntimeError('cannot build')")]
+    sio = FakeSocketServer()
+    server = PlayServer(sio, levels=levels, num_workers=1, tick_rate=50.0, prefetch=False, access_codes={'letmein'})
+
+    async def play():
+        await server.start()
+        try:
+            await server.on_connect('a', {})
+            await server.on_connect('b', {})
+            await server.on_next_level('b')
+            await asyncio.sleep(0.3)
+            assert server.sessions['b'].ready is False
+            assert sio.events('b', 'env_error')
+            completed = len(sio.events('a', 'level_complete'))
+            await asyncio.sleep(0.2)
+            assert len(sio.events('a', 'level_complete')) > completed
+            assert not sio.events('a', 'env_error')
+            assert not any(task.done() for task in server._tasks)
+            errors = len(sio.events('b', 'env_error'))
+            await server.on_next_level('b')
+            assert len(sio.events('b', 'env_error')) == errors + 1
+            assert len(sio.events('b', 'next_level')) == 1
+        finally:
+            await server.stop()
+
+    asyncio.run(play())
+
+
+def test_sessions_recover_after_their_worker_dies(tmp_path):
+    sio = FakeSocketServer()
+    server = PlayServer(sio, levels=[write_level(tmp_path, 'task_1')], num_workers=1, tick_rate=50.0, prefetch=False, open_access=True)
+
+    async def play():
+        await server.start()
+        try:
+            await server.on_connect('a', {})
+            server.workers[0]._process.kill()
+            await asyncio.sleep(0.3)
+            assert sio.events('a', 'env_error') and server.sessions['a'].ready is False
+            await server.on_reset('a')
+            assert server.sessions['a'].ready is True
+            completed = len(sio.events('a', 'level_complete'))
+            await asyncio.sleep(0.2)
+            assert len(sio.events('a', 'level_complete')) > completed
+        finally:
+            await server.stop()
+
+    asyncio.run(play())
+
+
+def test_actions_need_a_valid_access_code(tmp_path):
+    sio = FakeSocketServer()
+    server = PlayServer(sio, levels=[write_level(tmp_path, 'task_1')], num_workers=1, prefetch=False, access_codes={'letmein'})
+
+    async def play():
+        await server.start()
+        try:
+            await server.on_connect('a', {})
+            session = server.sessions['a']
+            await server.on_action('a', {'action': 1})
+            assert session.hold == 0
+            await server.on_access_code('a', 'guess')
+            await server.on_action('a', {'action': 1})
+            assert session.hold == 0
+            await server.on_access_code('a', 'letmein')
+            await server.on_action('a', {'action': 1})
+            assert session.action == 1 and session.hold == server.hold_ticks
+            assert sio.events('a', 'access_granted') == [{'granted': False}, {'granted': True}]
+        finally:
+            await server.stop()
+
+    asyncio.run(play())
+
+
+def test_next_level_moves_to_the_worker_that_prefetched_it(tmp_path):
+    levels = [write_level(tmp_path, 'task_1'), write_level(tmp_path, 'task_2'), write_level(tmp_path, 'task_3', init='import time; time.sleep(1.0)')]
+    sio = FakeSocketServer()
+    server = PlayServer(sio, levels=levels, num_workers=1, spare_workers=1, tick_rate=50.0, open_access=True)
+
+    async def play():
+        await server.start()
+        try:
+            await server.on_connect('a', {})
+            session = server.sessions['a']
+            first_worker, spare = session.worker, session.prefetch[0]
+            assert spare is not first_worker and len(server.workers) == 2
+            await asyncio.wait([session.prefetch[3]])
+            await server.on_next_level('a')
+            assert session.worker is spare and 'a' not in first_worker.sessions
+            assert server.prefetch_hits == 1 and session.ready
+            assert session.prefetch[0] is first_worker
+            await server.on_next_level('a')
+            assert server.prefetch_misses == 1 and session.worker is spare and session.ready
+            assert [data['description'] for data in sio.events('a', 'env_description')] == ['task_1', 'task_2', 'task_3']
+        finally:
+            await server.stop()
+
+    asyncio.run(play())
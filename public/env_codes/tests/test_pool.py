@@ -0,0 +1,68 @@
+import numpy as np
+
+from envkit.pool import BodyPool
+from envkit.shapes import ShapeFactory
+
+
+def is_parked(p, body_id):
+    return p.getDynamicsInfo(body_id, -1)[0] == 0.0 and p.getBasePositionAndOrientation(body_id)[0][2] < -50.0
+
+
+def make_pool(p, size=4, grow=0):
+    return BodyPool(p, ShapeFactory(p), p.GEOM_BOX, [0.25, 0.25, 0.25], mass=1.0, size=size, grow=grow)
+
+
+def test_acquire_release_and_growth(p):
+    pool = make_pool(p, size=16, grow=16)
+    assert (pool.capacity, len(pool)) == (16, 0) and all(is_parked(p, body_id) for body_id in pool.body_ids)
+    acquired = [pool.acquire([0.6 * i, 0.0, 1.0], color=[1.0, 0.0, 0.0, 1.0]) for i in range(20)]
+    assert len(set(acquired)) == 20 and (pool.capacity, pool.grown, len(pool)) == (32, 1, 20)
+    assert pool.active == acquired and set(acquired[:16]) == set(pool.body_ids[:16])
+    for body_id in acquired:
+        assert p.getDynamicsInfo(body_id, -1)[0] == 1.0
+        assert p.getVisualShapeData(body_id)[0][7] == (1.0, 0.0, 0.0, 1.0)
+    pool.release(acquired[3])
+    assert is_parked(p, acquired[3]) and not pool.is_active(acquired[3])
+    assert pool.acquire([0.0, 5.0, 1.0]) == acquired[3]
+    pool.release_all()
+    assert len(pool) == 0 and all(is_parked(p, body_id) for body_id in pool.body_ids)
+    assert make_pool(p, size=1).acquire([0.0, 0.0, 1.0]) is not None
+
+
+def test_exhausted_pool_without_growth(p):
+    pool = make_pool(p, size=2)
+    assert None not in (pool.acquire([0.0, 0.0, 1.0]), pool.acquire([1.0, 0.0, 1.0]))
+    assert pool.acquire([2.0, 0.0, 1.0]) is None and pool.capacity == 2
+
+
+def test_parked_bodies_do_not_collide(p):
+    pool = make_pool(p)
+    parked = pool.body_ids[0]
+    x, y, z = p.getBasePositionAndOrientation(parked)[0]
+    ball = p.createMultiBody(1.0, p.createCollisionShape(p.GEOM_SPHERE, radius=0.2), -1, [x, y, z + 1.0])
+    for _ in range(240):
+        p.stepSimulation()
+    assert not p.getContactPoints(bodyA=parked)
+    assert p.getBasePositionAndOrientation(ball)[0][2] < z - 1.0
+    assert p.getBasePositionAndOrientation(parked)[0] == (x, y, z)
+    active = pool.acquire([0.0, 0.0, 3.0])
+    p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_BOX, halfExtents=[2.0, 2.0, 0.1]), -1, [0.0, 0.0, -0.1])
+    for _ in range(240):
+        p.stepSimulation()
+    assert abs(p.getBasePositionAndOrientation(active)[0][2] - 0.25) < 0.01
+
+
+def test_clone_and_restore_state(p):
+    pool = make_pool(p)
+    first = pool.acquire([0.0, 0.0, 1.0], color=[0.0, 1.0, 0.0, 1.0])
+    second = pool.acquire([1.0, 0.0, 1.0])
+    saved = pool.clone_state()
+    active = pool.active
+    third = pool.acquire([2.0, 0.0, 1.0], color=[0.0, 0.0, 1.0, 1.0])
+    pool.release(first)
+    pool.restore_state(saved)
+    assert pool.active is active and pool.active == [first, second]
+    assert p.getDynamicsInfo(first, -1)[0] == 1.0 and p.getDynamicsInfo(third, -1)[0] == 0.0
+    assert pool.colors == {first: [0.0, 1.0, 0.0, 1.0]}
+    assert pool.acquire([3.0, 0.0, 1.0]) == third
+    assert np.allclose(p.getVisualShapeData(first)[0][7], [0.0, 1.0, 0.0, 1.0])
@@ -0,0 +1,63 @@
+from envkit.prefetch import LevelPrefetcher, build_env
+
+LEVEL = '''
+class Env:
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.closed = False
+
+    def reset(self):
+        return None
+
+    def close(self):
+        self.closed = True
+'''
+
+
+def write_level(tmp_path, name):
+    path = tmp_path / (name + '.py')
+    path.write_text(LEVEL)
+    return str(path)
+
+
+def test_take_hands_over_only_a_matching_build(tmp_path):
+    first, second = write_level(tmp_path, 'task_1'), write_level(tmp_path, 'task_2')
+    prefetcher = LevelPrefetcher()
+    prefetcher.prefetch('a', first, seed=3)
+    env = prefetcher.take('a', first, seed=3)
+    assert env is not None and env.seed == 3 and 'a' not in prefetcher
+    assert prefetcher.take('a', first, seed=3) is None
+    prefetcher.prefetch('a', first, seed=3)
+    prebuilt = prefetcher._envs['a'][2]
+    assert prefetcher.take('a', second, seed=3) is None and prebuilt.closed
+    prefetcher.prefetch('a', first, seed=3)
+    prebuilt = prefetcher._envs['a'][2]
+    assert prefetcher.take('a', first, seed=4) is None and prebuilt.closed
+    assert (prefetcher.hits, prefetcher.misses) == (1, 3)
+
+
+def test_an_edited_task_is_rebuilt(tmp_path):
+    path = write_level(tmp_path, 'task_1')
+    builds = []
+
+    def build(path, seed=None):
+        builds.append(path)
+        return build_env(path, seed)
+
+    prefetcher = LevelPrefetcher(build)
+    prefetcher.prefetch('a', path)
+    prefetcher.prefetch('a', path)
+    assert len(builds) == 1
+    stale = prefetcher._envs['a'][2]
+    with open(path, 'a') as f:
+        f.write('# edited\n')
+    assert prefetcher.take('a', path) is None and stale.closed
+    prefetcher.prefetch('a', path)
+    prefetcher.prefetch('a', path)
+    assert len(builds) == 2
+    prefetcher.prefetch('a', str(tmp_path / 'missing.py'))
+    assert 'a' not in prefetcher
+    prefetcher.prefetch('b', path)
+    prebuilt = prefetcher._envs['b'][2]
+    prefetcher.close()
+    assert prebuilt.closed and 'b' not in prefetcher
@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+
+from envkit.loader import load_env_class
+from envkit.profiling import Profiler
+
+
+def run(env, profiler, steps):
+    env.reset()
+    for action in np.zeros((steps, 2)):
+        observation, reward, terminated, truncated, info = env.step(action)
+    return profiler.end_episode()
+
+
+def test_sections_count_calls_per_episode(ball_task, tmp_path):
+    env = load_env_class(ball_task)(seed=0)
+    try:
+        profiler = Profiler(env)
+        first = run(env, profiler, 5)
+        second = run(env, profiler, 3)
+        assert [first['sections']['step']['calls'], second['sections']['step']['calls']] == [5, 3]
+        for name in ('get_task_rewards', 'get_terminated', 'stepSimulation'):
+            assert second['sections'][name]['calls'] == 3
+        assert second['sections']['get_success']['calls'] == 3
+        assert second['sections']['step']['total_ns'] >= second['sections']['stepSimulation']['total_ns'] > 0
+        assert all(section['api_calls'] == 0 for section in second['sections'].values())
+        summary = profiler.summary()
+        assert summary['episodes'] == 2 and summary['sections']['step']['calls'] == 8
+        profiler.dump(str(tmp_path / 'profile.json'))
+        assert json.loads((tmp_path / 'profile.json').read_text())['summary'] == summary
+    finally:
+        env.close()
+
+
+def test_api_calls_are_counted_against_every_active_section(ball_task):
+    env = load_env_class(ball_task)(seed=0)
+    try:
+        profiler = Profiler(env, count_api_calls=True)
+        sections = run(env, profiler, 4)['sections']
+        assert sections['stepSimulation']['api_calls'] == 4
+        assert sections['get_task_rewards']['api_calls'] > 0
+        assert sections['step']['api_calls'] >= sections['stepSimulation']['api_calls'] + sections['get_task_rewards']['api_calls'] + sections['get_terminated']['api_calls']
+    finally:
+        env.close()
+
+
+def test_detach_restores_the_methods(ball_task):
+    env = load_env_class(ball_task)(seed=0)
+    try:
+        profiler = Profiler(env, count_api_calls=True)
+        assert 'step' in vars(env)
+        run(env, profiler, 2)
+        profiler.detach()
+        assert not {'step', 'reset', 'get_task_rewards', 'get_terminated', 'get_success'} & set(vars(env))
+        assert not {'stepSimulation', 'getBasePositionAndOrientation'} & set(vars(env._p))
+        assert len(profiler.episodes) == 1
+        env.step(np.zeros(2))
+        assert profiler.summary()['sections']['step']['calls'] == 2
+    finally:
+        env.close()
@@ -0,0 +1,39 @@
+import types
+
+import numpy as np
+
+from envkit.loader import load_env_class
+from envkit.recorder import TrajectoryReader, TrajectoryRecorder
+
+
+def test_recording_round_trips(ball_task, tmp_path):
+    env = load_env_class(ball_task)(seed=0)
+    env.robot = types.SimpleNamespace(robot_id=env.ground_id)
+    recorder = TrajectoryRecorder(env, str(tmp_path / 'run'), chunk_size=16)
+    actions = np.random.default_rng(0).uniform(-1.0, 1.0, (3, 50, 2)).astype(np.float32)
+    expected = []
+    try:
+        for episode, lengths in enumerate((37, 5, 50)):
+            env.reset()
+            rows = []
+            for step, action in enumerate(actions[episode][:lengths]):
+                observation, reward, terminated, truncated, info = env.step(action)
+                rows.append({'episode': episode, 'step': step, 'terminated': terminated, 'truncated': truncated, 'success': info['success'], 'action': action, 'reward': reward, 'rewards': [info['rewards'][name] for name in sorted(info['rewards'])], 'object_poses': [np.concatenate(env._p.getBasePositionAndOrientation(env.ball_id))]})
+                if terminated:
+                    break
+            expected.append(rows)
+    finally:
+        recorder.close()
+    assert 'step' not in vars(env) and 'reset' not in vars(env)
+    reader = TrajectoryReader(str(tmp_path / 'run'))
+    assert len(reader) == 3 and len(reader.shards) > 3
+    assert reader.reward_names == ['near_goal', 'progress']
+    for index, rows in enumerate(expected):
+        episode = reader.episode(index)
+        assert len(episode['step']) == len(rows)
+        for name in ('episode', 'step', 'terminated', 'truncated', 'success'):
+            np.testing.assert_array_equal(episode[name], [row[name] for row in rows])
+        for name in ('action', 'reward', 'rewards', 'object_poses'):
+            np.testing.assert_allclose(episode[name], np.array([row[name] for row in rows], dtype=np.float32), rtol=1e-6)
+        np.testing.assert_allclose(episode['robot_pose'], np.tile(np.array([0.0, 0.0, -0.1, 0.0, 0.0, 0.0, 1.0], dtype=np.float32), (len(rows), 1)))
+    env.close()
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from envkit.loader import load_env_class
+from envkit.replay import EpisodeLog, replay, run_episode
+
+
+def test_reset_seed_fixes_the_episode(ball_task):
+    env = load_env_class(ball_task)(seed=0)
+    try:
+        first = env.reset(seed=5)
+        env.reset()
+        np.testing.assert_array_equal(env.reset(seed=5), first)
+        assert not np.array_equal(env.reset(), first)
+    finally:
+        env.close()
+
+
+def test_logged_episodes_replay_exactly(ball_task, tmp_path):
+    actions = np.random.default_rng(1).uniform(-1.0, 1.0, (60, 2))
+    log = run_episode(ball_task, actions, seed=3, reset_seed=7)
+    assert 0 < len(log) <= 40 and log.terminated[-1]
+    log.save(str(tmp_path / 'episode.npz'))
+    loaded = EpisodeLog.load(str(tmp_path / 'episode.npz'))
+    assert (loaded.task, loaded.seed, loaded.reset_seed) == ('task_ball', 3, 7)
+    assert replay(loaded, ball_task) == {'matches': True, 'steps': len(log), 'first_mismatch': None}
+    loaded.rewards[5] += 1e-9
+    assert replay(loaded, ball_task)['first_mismatch'] == 5
+    with pytest.raises(ValueError):
+        run_episode(ball_task, actions, seed=None, reset_seed=7)
+    with open(ball_task, 'a') as f:
+        f.write('\n# edited\n')
+    with pytest.raises(ValueError):
+        replay(loaded, ball_task)
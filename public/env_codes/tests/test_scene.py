@@ -0,0 +1,40 @@
+import types
+
+from envkit.scene import SceneCache
+from envkit.shapes import ShapeFactory
+
+
+def build_scene(owner, shapes):
+    owner.builds += 1
+    owner.floor_id = shapes.create_box(0.0, [5.0, 5.0, 0.1], [0.0, 0.0, 0.0], [0.5, 0.5, 0.5, 1.0])
+    shapes.change_dynamics(owner.floor_id, lateralFriction=0.3)
+    owner.post_ids = shapes.create_cylinders(0.0, 0.1, 1.0, [[x, 2.0, 0.5] for x in range(4)], [1.0, 0.0, 0.0, 1.0])
+    owner.tilted_id = shapes.create_box(1.0, [0.2, 0.2, 0.2], [0.0, -2.0, 1.0], [0.0, 0.0, 1.0, 1.0], orientation=[0.0, 0.0, 0.3826834, 0.9238795])
+
+
+def construct(p, source, directory):
+    owner = types.SimpleNamespace(builds=0)
+    shapes = ShapeFactory(p)
+    cache = SceneCache(shapes, str(source), directory=str(directory))
+    cache.build(owner, lambda: build_scene(owner, shapes), ('floor_id', 'post_ids', 'tilted_id'))
+    return owner
+
+
+def layout(p, owner):
+    body_ids = [owner.floor_id] + owner.post_ids + [owner.tilted_id]
+    return [(p.getBasePositionAndOrientation(body_id), p.getDynamicsInfo(body_id, -1)[:2], p.getVisualShapeData(body_id)[0][3:5]) for body_id in body_ids]
+
+
+def test_cached_scene_skips_the_build(p, tmp_path):
+    source = tmp_path / 'task_1.py'
+    source.write_text('# task\n')
+    built = construct(p, source, tmp_path / 'scenes')
+    expected = layout(p, built)
+    p.resetSimulation()
+    loaded = construct(p, source, tmp_path / 'scenes')
+    assert (built.builds, loaded.builds) == (1, 0)
+    assert (loaded.floor_id, loaded.post_ids, loaded.tilted_id) == (built.floor_id, built.post_ids, built.tilted_id)
+    assert layout(p, loaded) == expected
+    source.write_text('# edited task\n')
+    p.resetSimulation()
+    assert construct(p, source, tmp_path / 'scenes').builds == 1
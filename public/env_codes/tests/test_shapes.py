@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from envkit.shapes import ShapeFactory
+
+
+def test_shapes_are_shared_by_geometry_and_color(p):
+    shapes = ShapeFactory(p)
+    red, blue = [1, 0, 0, 1], [0, 0, 1, 1]
+    first = shapes.get_shapes(p.GEOM_BOX, [0.5, 0.5, 0.5], red)
+    assert shapes.get_shapes(p.GEOM_BOX, (0.5, 0.5, 0.5), red) == first
+    recolored = shapes.get_shapes(p.GEOM_BOX, [0.5, 0.5, 0.5], blue)
+    assert recolored[0] == first[0] and recolored[1] != first[1]
+    resized = shapes.get_shapes(p.GEOM_BOX, [0.5, 0.5, 1.0], red)
+    assert resized[0] != first[0] and resized[1] != first[1]
+
+
+def test_bodies_match_their_geometry(p):
+    shapes = ShapeFactory(p)
+    box = shapes.create_box(1.0, [0.5, 0.25, 0.1], [1.0, 2.0, 3.0], [1, 0, 0, 1])
+    sphere = shapes.create_sphere(0.0, 0.3, [0.0, 0.0, 1.0], [0, 1, 0, 1])
+    cylinder = shapes.create_cylinder(0.0, 0.2, 0.8, [2.0, 0.0, 0.4], [0, 0, 1, 1])
+    assert np.allclose(p.getBasePositionAndOrientation(box)[0], [1.0, 2.0, 3.0])
+    assert p.getDynamicsInfo(box, -1)[0] == 1.0
+    assert np.allclose(np.subtract(*p.getAABB(box)[::-1]), [1.0, 0.5, 0.2], atol=0.05)
+    assert np.allclose(np.subtract(*p.getAABB(sphere)[::-1]), [0.6, 0.6, 0.6], atol=0.05)
+    assert np.allclose(np.subtract(*p.getAABB(cylinder)[::-1]), [0.4, 0.4, 0.8], atol=0.05)
+    with pytest.raises(ValueError):
+        shapes.create_body(p.GEOM_CAPSULE, [0.1, 0.2], 0.0, [0, 0, 0], [1, 1, 1, 1])
+
+
+def test_batched_bodies_share_one_shape(p):
+    shapes = ShapeFactory(p)
+    positions = [[float(i), 0.0, 0.5] for i in range(5)]
+    body_ids = shapes.create_boxes(0.0, [0.5, 0.5, 0.5], positions, [1, 1, 1, 1])
+    assert len(body_ids) == 5 and len(set(body_ids)) == 5
+    for body_id, position in zip(body_ids, positions):
+        assert np.allclose(p.getBasePositionAndOrientation(body_id)[0], position)
+    assert len(shapes._collision_shapes) == 1 and len(shapes._visual_shapes) == 1
+    assert shapes.create_boxes(0.0, [0.5, 0.5, 0.5], [], [1, 1, 1, 1]) == []
+    assert len(shapes.create_cylinders(0.0, 0.1, 0.5, [[0.0, 5.0, 0.25]], [1, 1, 1, 1])) == 1
@@ -0,0 +1,29 @@
+import numpy as np
+
+from envkit.loader import load_env_class
+
+
+def rollout(env_class, fast_reset, episodes=4, steps=60):
+    env_class.fast_reset = fast_reset
+    env = env_class(seed=0)
+    actions = np.random.default_rng(2).uniform(-1.0, 1.0, (episodes, steps, 2))
+    observations = []
+    try:
+        for episode in range(episodes):
+            observations.append(env.reset())
+            for action in actions[episode]:
+                observation, reward, terminated, truncated, info = env.step(action)
+                observations.append(observation)
+                if terminated or truncated:
+                    break
+        return np.array(observations), env.reset_snapshot.state_id is not None
+    finally:
+        env.close()
+
+
+def test_fast_reset_matches_a_normal_reset(ball_task):
+    env_class = load_env_class(ball_task)
+    normal, normal_captured = rollout(env_class, False)
+    fast, fast_captured = rollout(env_class, True)
+    assert (normal_captured, fast_captured) == (False, True)
+    np.testing.assert_array_equal(fast, normal)
@@ -0,0 +1,75 @@
+import math
+
+import numpy as np
+import pytest
+
+from envkit.spatial import SpatialHash
+from envkit.state import StateSnapshot
+
+
+def brute_force(grid, entries, position, label=None):
+    distances = {}
+    for key, (x, y, radius) in entries.items():
+        if label is None or grid.labels[key] == label:
+            distances[key] = grid.distance(key, position)
+            assert distances[key] == pytest.approx(max(math.hypot(x - position[0], y - position[1]) - radius, 0.0))
+    return distances
+
+
+def check_queries(grid, entries, rng, queries=200):
+    for _ in range(queries):
+        position = rng.uniform(-8.0, 8.0, size=2)
+        radius = rng.uniform(0.0, 4.0)
+        label = [None, 'ball', 'post', 'marker'][rng.integers(4)]
+        distances = brute_force(grid, entries, position, label)
+        found = grid.within(position, radius, label)
+        assert set(found) == {key for key, distance in distances.items() if distance < radius}
+        assert [distances[key] for key in found] == sorted(distances[key] for key in found)
+        key, distance = grid.nearest(position, label)
+        if distances:
+            assert distance == min(distances.values()) and distances[key] == distance
+        else:
+            assert (key, distance) == (None, np.inf)
+        key, distance = grid.nearest(position, label, max_distance=radius)
+        if distances and min(distances.values()) <= radius:
+            assert distance == min(distances.values())
+        else:
+            assert (key, distance) == (None, np.inf)
+
+
+def test_queries_match_brute_force(p):
+    rng = np.random.default_rng(0)
+    state = StateSnapshot(p)
+    grid = SpatialHash(state, cell_size=1.5)
+    entries = {}
+    sphere = p.createCollisionShape(p.GEOM_SPHERE, radius=0.1)
+    for _ in range(12):
+        x, y = rng.uniform(-6.0, 6.0, size=2)
+        body_id = p.createMultiBody(1.0, sphere, -1, [x, y, 0.1])
+        grid.track(body_id, 'ball')
+        entries[body_id] = (x, y, 0.0)
+    for index in range(8):
+        x, y = rng.uniform(-6.0, 6.0, size=2)
+        radius = rng.uniform(0.0, 2.0)
+        grid.add_fixed(('post', index), [x, y], 'post', radius)
+        entries[('post', index)] = (x, y, radius)
+    marker = [3.0, -2.0, 0.0]
+    grid.track('marker', 'marker', position=lambda: marker)
+    entries['marker'] = (3.0, -2.0, 0.0)
+    check_queries(grid, entries, rng)
+
+    for body_id in [key for key in entries if isinstance(key, int)][:6]:
+        x, y = rng.uniform(-9.0, 9.0, size=2)
+        p.resetBasePositionAndOrientation(body_id, [x, y, 0.1], [0.0, 0.0, 0.0, 1.0])
+        entries[body_id] = (x, y, 0.0)
+    marker[:2] = [-7.5, 7.5]
+    entries['marker'] = (-7.5, 7.5, 0.0)
+    state.invalidate()
+    grid.invalidate()
+    check_queries(grid, entries, rng)
+
+    for key in [('post', 0), ('post', 3), 'marker']:
+        grid.remove(key)
+        del entries[key]
+    assert all(key in grid for key in entries) and ('post', 0) not in grid and 'marker' not in grid
+    check_queries(grid, entries, rng)
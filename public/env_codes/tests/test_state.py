@@ -0,0 +1,59 @@
+import numpy as np
+
+from envkit.state import StateSnapshot
+
+
+def direct(p, body_id):
+    position, orientation = p.getBasePositionAndOrientation(body_id)
+    linear_velocity, angular_velocity = p.getBaseVelocity(body_id)
+    return position, orientation, linear_velocity, angular_velocity
+
+
+def check(p, state, body_ids):
+    for body_id in body_ids:
+        position, orientation, linear_velocity, angular_velocity = direct(p, body_id)
+        np.testing.assert_array_equal(state.position(body_id), position)
+        np.testing.assert_array_equal(state.orientation(body_id), orientation)
+        np.testing.assert_array_equal(state.velocity(body_id), linear_velocity)
+        np.testing.assert_array_equal(state.angular_velocity(body_id), angular_velocity)
+    np.testing.assert_array_equal(state.data, [np.concatenate(direct(p, body_id)) for body_id in state.body_ids])
+
+
+def test_cached_reads_match_the_client(p):
+    rng = np.random.default_rng(0)
+    p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_BOX, halfExtents=[5.0, 5.0, 0.1]), -1, [0.0, 0.0, -0.1])
+    box = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.2, 0.1, 0.1])
+    body_ids = [p.createMultiBody(1.0, box, -1, [x, 0.0, 0.5]) for x in np.linspace(-3.0, 3.0, 6)]
+    state = StateSnapshot(p, body_ids[:2], capacity=2)
+    for body_id in body_ids[2:]:
+        state.track(body_id)
+    assert state.body_ids == body_ids
+    for step in range(60):
+        for body_id in body_ids:
+            p.applyExternalForce(body_id, -1, rng.uniform(-20.0, 20.0, 3).tolist(), [0.1, 0.0, 0.0], p.LINK_FRAME)
+        p.stepSimulation()
+        state.invalidate()
+        check(p, state, body_ids)
+        if step == 20:
+            state.untrack(body_ids[1])
+            state.untrack(body_ids[4])
+            assert sorted(state.body_ids) == sorted(body_ids[:1] + body_ids[2:4] + body_ids[5:])
+            check(p, state, body_ids)
+        if step == 40:
+            saved = state.clone_state()
+            state.untrack(body_ids[0])
+            state.track(body_ids[1])
+            state.restore_state(saved)
+            assert state.body_ids == saved
+            check(p, state, body_ids)
+
+
+def test_reads_hold_until_invalidated(p):
+    body_id = p.createMultiBody(1.0, p.createCollisionShape(p.GEOM_SPHERE, radius=0.1), -1, [0.0, 0.0, 1.0])
+    state = StateSnapshot(p, [body_id])
+    before = state.position(body_id)
+    p.stepSimulation()
+    np.testing.assert_array_equal(state.position(body_id), before)
+    state.invalidate()
+    np.testing.assert_array_equal(state.position(body_id), direct(p, body_id)[0])
+    assert state.position(body_id)[2] < before[2]
@@ -0,0 +1,51 @@
+import numpy as np
+
+from envkit.terrain import HeightfieldTerrain
+
+
+def make_terrain(tmp_path):
+    terrain = HeightfieldTerrain([20.0, 12.0], cell_size=0.5, base_friction=0.8, cache_dir=str(tmp_path))
+    terrain.add_box([4.0, 2.0, 0.0], [2.0, 1.0, 0.5], yaw=0.3, friction=0.3)
+    terrain.add_cylinder([-5.0, -2.0, 0.0], 2.0, 0.1, friction=1.2)
+    terrain.add_box([-4.0, -1.0, 0.0], [1.0, 1.0, 1.0], friction=0.3)
+    terrain.add_cylinder([9.5, 5.5, 0.0], 1.0, 2.0)
+    return terrain
+
+
+def cast_down(p, xs, ys):
+    return p.rayTestBatch([[x, y, 10.0] for x, y in zip(xs, ys)], [[x, y, -10.0] for x, y in zip(xs, ys)])
+
+
+def test_material_bodies_form_the_rasterized_surface(p, tmp_path):
+    terrain = make_terrain(tmp_path)
+    terrain.build(p)
+    assert sorted(terrain.body_friction.values()) == [0.3, 0.5, 0.8, 1.2]
+    heights, _ = terrain.rasterize()
+    reference = p.createMultiBody(0.0, p.createCollisionShape(p.GEOM_HEIGHTFIELD, meshScale=[0.5, 0.5, 1.0], heightfieldData=heights.ravel().tolist(), numHeightfieldRows=terrain.num_x, numHeightfieldColumns=terrain.num_y), basePosition=[0.0, 0.0, (heights.min() + heights.max()) / 2])
+    rng = np.random.default_rng(0)
+    xs, ys = rng.uniform(-9.9, 9.9, 2000), rng.uniform(-5.9, 5.9, 2000)
+    p.resetBasePositionAndOrientation(reference, [0.0, 0.0, -100.0], [0.0, 0.0, 0.0, 1.0])
+    split = cast_down(p, xs, ys)
+    for body_id in terrain.body_ids:
+        p.resetBasePositionAndOrientation(body_id, [0.0, 0.0, -100.0], [0.0, 0.0, 0.0, 1.0])
+    p.resetBasePositionAndOrientation(reference, [0.0, 0.0, (heights.min() + heights.max()) / 2], [0.0, 0.0, 0.0, 1.0])
+    single = cast_down(p, xs, ys)
+    np.testing.assert_allclose([hit[3][2] for hit in split], [hit[3][2] for hit in single], atol=1e-6)
+
+
+def test_each_cell_is_covered_by_a_body_of_its_friction(p, tmp_path):
+    terrain = make_terrain(tmp_path)
+    terrain.build(p)
+    _, friction = terrain.rasterize()
+    rng = np.random.default_rng(1)
+    xs, ys = rng.uniform(-9.9, 9.9, 2000), rng.uniform(-5.9, 5.9, 2000)
+    checked = 0
+    for x, y, hit in zip(xs, ys, cast_down(p, xs, ys)):
+        j, i = terrain.cell([x, y])
+        block = friction[max(j - 1, 0):j + 2, max(i - 1, 0):i + 2]
+        # Within one cell of a material boundary both materials are at full height.
+        if (block == block.flat[0]).all():
+            assert terrain.body_friction[hit[0]] == terrain.friction_at([x, y])
+            assert p.getDynamicsInfo(hit[0], -1)[1] == terrain.friction_at([x, y])
+            checked += 1
+    assert checked > 1000
@@ -0,0 +1,52 @@
+import textwrap
+
+from envkit.validation import SmokeTest, VerdictCache, validate
+
+TASK = '''
+import time
+import numpy as np
+
+
+class Space:
+    shape = (2,)
+    dtype = np.float32
+    low = -np.ones(2)
+    high = np.ones(2)
+
+
+class Env:
+    action_space = Space()
+
+    def __init__(self, seed=None):
+        pass
+
+    def reset(self):
+        return np.zeros(2)
+
+    def step(self, action):
+        {step}
+        return np.zeros(2), 0.0, False, False, {{}}
+'''
+
+
+def write_task(tmp_path, name, step):
+    path = tmp_path / (name + '.py')
+    path.write_text(TASK.format(step=textwrap.dedent(step)))
+    return str(path)
+
+
+def test_only_deterministic_verdicts_are_cached(tmp_path):
+    paths = [write_task(tmp_path, 'task_1', 'pass'), write_task(tmp_path, 'task_2', "raise ValueError('broken')"), write_task(tmp_path, 'task_3', 'time.sleep(0.05)'), write_task(tmp_path, 'task_4', 'time.sleep(10.0)')]
+    test = SmokeTest(steps=20, episode_steps=10, min_steps_per_sec=100.0, timeout=2.0)
+    cache = VerdictCache(str(tmp_path / 'cache'))
+    first = validate(paths, test, num_workers=4, cache=cache)
+    assert [verdict['passed'] for verdict in first] == [True, False, False, False]
+    assert [verdict['transient'] for verdict in first] == [False, False, True, True]
+    assert 'Too slow' in first[2]['error'] and 'timed out' in first[3]['error']
+    second = validate(paths[:3], test, num_workers=4, cache=cache)
+    assert [verdict['cached'] for verdict in second] == [True, True, False]
+
+
+def test_key_depends_on_settings():
+    assert SmokeTest(steps=10).key('abc') != SmokeTest(steps=20).key('abc')
+    assert SmokeTest().key('abc') != SmokeTest().key('abd')
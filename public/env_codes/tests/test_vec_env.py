@@ -0,0 +1,40 @@
+import numpy as np
+
+from envkit.loader import load_env_class
+from envkit.vec_env import VecEnv
+
+
+def test_vec_env_matches_scalar_stepping(ball_task):
+    num_envs, steps = 4, 120
+    actions = np.random.default_rng(0).uniform(-1.0, 1.0, (steps, num_envs, 2)).astype(np.float32)
+    env_class = load_env_class(ball_task)
+    envs = [env_class(seed=3 + i) for i in range(num_envs)]
+    for env in envs:
+        env.reset()  # the reset every VecEnv worker does when it starts
+    expected = [[env.reset() for env in envs]]
+    expected_rewards, expected_done = [], []
+    for t in range(steps):
+        observations, rewards, dones = [], [], []
+        for env, action in zip(envs, actions[t]):
+            observation, reward, terminated, truncated, info = env.step(action)
+            if terminated or truncated:
+                observation = env.reset()
+            observations.append(observation)
+            rewards.append(reward)
+            dones.append(terminated)
+        expected.append(observations)
+        expected_rewards.append(rewards)
+        expected_done.append(dones)
+    for env in envs:
+        env.close()
+    assert any(any(dones) for dones in expected_done)
+    vec = VecEnv(ball_task, num_workers=2, envs_per_worker=2, seed=3)
+    try:
+        np.testing.assert_array_equal(vec.reset(), expected[0])
+        for t in range(steps):
+            observations, rewards, terminated, truncated, infos = vec.step(actions[t])
+            np.testing.assert_array_equal(observations, expected[t + 1])
+            np.testing.assert_array_equal(rewards, np.asarray(expected_rewards[t], dtype=rewards.dtype))
+            np.testing.assert_array_equal(terminated, expected_done[t])
+    finally:
+        vec.close()